@@ -0,0 +1,109 @@
+"""Vectorized anomaly scoring of many sales series at once.
+
+``score_series`` takes a ``(series, days)`` array and, in one NumPy pass,
+scores every series' last day against the ``window`` days before it:
+
+- z-score against the window's mean / standard deviation (as ``monitor_agent``), and
+- a robust score against the window's median / MAD, which one outlier in the
+  baseline cannot mask.
+
+A series is flagged when either score exceeds its threshold. Only flagged
+series go through the full agent workflow (``run_batch``), with their
+baseline passed in so the monitor node does not look it up again.
+"""
+import os
+
+import numpy as np
+
+import rolling_stats
+from agents.monitor_agent import ANOMALY_Z, BASELINE_WINDOW
+
+# |robust score| above which a series is flagged (Iglewicz & Hoaglin's 3.5)
+MAD_THRESHOLD = float(os.getenv("MONITOR_MAD_THRESHOLD", "3.5"))
+# MAD -> standard deviation for normal data; mean absolute deviation -> std
+# where more than half the window is identical (MAD of 0, e.g. sparse series)
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+RESULT_DTYPE = np.dtype([
+    ("series", "<i4"),
+    ("latest", "<f8"),
+    ("mean", "<f8"),
+    ("std", "<f8"),
+    ("median", "<f8"),
+    ("z", "<f4"),
+    ("mad_score", "<f4"),
+    ("anomaly", "?"),
+])
+
+
+def score_series(series, window=BASELINE_WINDOW, z_threshold=ANOMALY_Z, mad_threshold=MAD_THRESHOLD):
+    """Score the last column of each row against the ``window`` columns before it.
+
+    Returns a ``RESULT_DTYPE`` record array with one entry per series.
+    """
+    values = np.asarray(series, dtype=np.float64)
+    if values.ndim != 2 or values.shape[1] < 3:
+        raise ValueError(f"Expected a (series, days) array with at least 3 days, got shape {values.shape}")
+    latest = values[:, -1]
+    history = values[:, -window - 1:-1]
+    mean = history.mean(axis=1)
+    std = history.std(axis=1, ddof=1)
+    median = np.median(history, axis=1)
+    deviation = np.abs(history - median[:, None])
+    scale = MAD_SCALE * np.median(deviation, axis=1)
+    flat = scale == 0
+    scale[flat] = MEAN_AD_SCALE * deviation[flat].mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 0, (latest - mean) / std, 0.0)
+        mad_score = np.where(scale > 0, (latest - median) / scale, 0.0)
+
+    result = np.empty(len(values), dtype=RESULT_DTYPE)
+    result["series"] = np.arange(len(values))
+    result["latest"] = latest
+    result["mean"] = mean
+    result["std"] = std
+    result["median"] = median
+    result["z"] = z
+    result["mad_score"] = mad_score
+    result["anomaly"] = (np.abs(z) > z_threshold) | (np.abs(mad_score) > mad_threshold)
+    return result
+
+
+def snapshot_series(snapshot, window=BASELINE_WINDOW, by=("product", "region", "salesperson")):
+    """``(segments, values)`` of the last ``window + 1`` days of a ``SalesSnapshot``.
+
+    ``by=None`` scores the snapshot's precomputed segments ("all", product,
+    region, salesperson, product x region) straight from its daily matrix.
+    """
+    if by is None:
+        segments = [rolling_stats.parse_segment_key(key) for key in snapshot.segments]
+        return segments, np.ascontiguousarray(snapshot.daily[-window - 1:].T)
+    return snapshot.matrix(by, last_days=window + 1)
+
+
+def workflow_state(row, segment, window=BASELINE_WINDOW):
+    """Workflow input for one flagged series, carrying its baseline for the monitor."""
+    return {
+        "latest_sales": float(row["latest"]),
+        **segment,
+        "baseline_window": window,
+        "baseline_mean": float(row["mean"]),
+        "baseline_std": float(row["std"]),
+        "baseline_segment": rolling_stats.segment_key(**segment),
+    }
+
+
+def run_batch(series, segments, window=BASELINE_WINDOW, invoke=None):
+    """Score every series and run the agent workflow for the flagged ones.
+
+    Returns ``(result, outputs)``: the full score array and one workflow
+    output per flagged series, in series order.
+    """
+    result = score_series(series, window)
+    if invoke is None:
+        # Imported here: the workflow module imports the agents
+        from workflow import app_workflow
+        invoke = app_workflow.invoke
+    outputs = [invoke(workflow_state(row, segments[row["series"]], window)) for row in result[result["anomaly"]]]
+    return result, outputs
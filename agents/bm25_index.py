@@ -0,0 +1,230 @@
+"""Compact in-process inverted index with BM25 scoring.
+
+Each term maps to two growable posting arrays (document slots and term
+frequencies) that are viewed as NumPy arrays at query time, so scoring a query
+touches only the postings of its terms. Documents are added incrementally;
+deletes leave a tombstone and the postings are compacted once a quarter of the
+slots are dead. The whole index is persisted as one ``.npz`` file in CSR
+layout next to the vector index.
+"""
+import os
+import re
+import json
+import math
+from array import array
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+INDEX_FILE = "bm25.npz"
+K1 = 1.2
+B = 0.75
+COMPACT_RATIO = 0.25
+
+# Product codes, policy IDs and region names stay whole ("px-42", "emea_2"),
+# their parts are indexed as well so partial matches still score.
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text):
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in ENGLISH_STOP_WORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-_./]", token) if part)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunk IDs."""
+
+    def __init__(self, k1=K1, b=B):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_ids = []
+        self._doc_len = array("f")
+        self._alive = array("b")
+        self._slots = {}
+        self._total_len = 0.0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._slots
+
+    def add(self, doc_ids, texts):
+        for doc_id, text in zip(doc_ids, texts):
+            if doc_id in self._slots:
+                self.delete([doc_id])
+            tokens = tokenize(text)
+            slot = len(self._doc_ids)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("i"), array("f"))
+                postings[0].append(slot)
+                postings[1].append(tf)
+            self._doc_ids.append(doc_id)
+            self._doc_len.append(len(tokens))
+            self._alive.append(1)
+            self._slots[doc_id] = slot
+            self._total_len += len(tokens)
+
+    def extend(self, other):
+        """Append all live documents of ``other`` (e.g. an index built by a worker process)."""
+        other.compact()
+        duplicates = self._slots.keys() & set(other._doc_ids)
+        if duplicates:
+            raise ValueError(f"Documents already indexed: {sorted(duplicates)[:5]}")
+        offset = len(self._doc_ids)
+        for term, (slots, tfs) in other._postings.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("f"))
+            postings[0].frombytes((np.frombuffer(slots, dtype=np.int32) + np.int32(offset)).tobytes())
+            postings[1].extend(tfs)
+        for doc_id in other._doc_ids:
+            self._slots[doc_id] = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+        self._doc_len.extend(other._doc_len)
+        self._alive.extend(other._alive)
+        self._total_len += other._total_len
+
+    def delete(self, doc_ids):
+        for doc_id in doc_ids:
+            slot = self._slots.pop(doc_id, None)
+            if slot is not None:
+                self._alive[slot] = 0
+                self._total_len -= self._doc_len[slot]
+        if len(self._doc_ids) - len(self._slots) > COMPACT_RATIO * max(len(self._doc_ids), 1):
+            self.compact()
+
+    def compact(self):
+        """Drop tombstoned slots and renumber the survivors."""
+        alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+        remap = np.full(len(alive), -1, dtype=np.int32)
+        remap[alive] = np.arange(int(alive.sum()), dtype=np.int32)
+        postings = {}
+        for term, (slots, tfs) in self._postings.items():
+            slots = np.frombuffer(slots, dtype=np.int32)
+            keep = alive[slots]
+            if keep.any():
+                postings[term] = (array("i", remap[slots[keep]].tobytes()),
+                                  array("f", np.frombuffer(tfs, dtype=np.float32)[keep].tobytes()))
+        self._postings = postings
+        self._doc_ids = [doc_id for doc_id, live in zip(self._doc_ids, alive) if live]
+        self._doc_len = array("f", np.frombuffer(self._doc_len, dtype=np.float32)[alive].tobytes())
+        self._alive = array("b", b"\x01" * len(self._doc_ids))
+        self._slots = {doc_id: slot for slot, doc_id in enumerate(self._doc_ids)}
+
+    def search(self, query, k=10):
+        """Return ``[(doc_id, score), ...]`` for the ``k`` best-scoring live documents."""
+        n_docs = len(self._slots)
+        if not n_docs or k <= 0:
+            return []
+        alive = np.frombuffer(self._alive, dtype=np.int8)
+        doc_len = np.frombuffer(self._doc_len, dtype=np.float32)
+        avg_len = self._total_len / n_docs or 1.0
+
+        has_tombstones = len(self._doc_ids) != n_docs
+
+        slot_parts, weight_parts = [], []
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            slots = np.frombuffer(postings[0], dtype=np.int32)
+            tfs = np.frombuffer(postings[1], dtype=np.float32)
+            if has_tombstones:
+                live = alive[slots].astype(bool)
+                slots, tfs = slots[live], tfs[live]
+            df = len(slots)
+            if not df:
+                continue
+            idf = np.float32(math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)))
+            norm = doc_len[slots]
+            norm *= np.float32(self.k1 * self.b / avg_len)
+            norm += np.float32(self.k1 * (1.0 - self.b))
+            norm += tfs
+            weights = tfs * np.float32(idf * (self.k1 + 1.0))
+            weights /= norm
+            slot_parts.append(slots)
+            weight_parts.append(weights)
+        if not slot_parts:
+            return []
+
+        if sum(len(slots) for slots in slot_parts) > len(self._doc_ids) // 8:
+            # Common terms: accumulate into a dense score vector (slots are unique per term)
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            for slots, weights in zip(slot_parts, weight_parts):
+                scores[slots] += weights
+            candidates = None
+        else:
+            candidates, inverse = np.unique(np.concatenate(slot_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+        k = min(k, len(scores))
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[scores[top] > 0]
+        slots = top if candidates is None else candidates[top]
+        return [(self._doc_ids[slot], float(score)) for slot, score in zip(slots, scores[top])]
+
+    def save(self, folder_path):
+        self.compact()
+        terms = list(self._postings)
+        lengths = np.fromiter((len(self._postings[t][0]) for t in terms), dtype=np.int64, count=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        slots = b"".join(self._postings[t][0].tobytes() for t in terms)
+        tfs = b"".join(self._postings[t][1].tobytes() for t in terms)
+        os.makedirs(folder_path, exist_ok=True)
+        tmp_path = os.path.join(folder_path, INDEX_FILE + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            params=np.array([self.k1, self.b]),
+            terms=np.array(json.dumps(terms)),
+            doc_ids=np.array(json.dumps(self._doc_ids)),
+            offsets=offsets,
+            slots=np.frombuffer(slots, dtype=np.int32),
+            tfs=np.frombuffer(tfs, dtype=np.float32),
+            doc_len=np.frombuffer(self._doc_len, dtype=np.float32),
+        )
+        os.replace(tmp_path, os.path.join(folder_path, INDEX_FILE))
+
+    @classmethod
+    def load(cls, folder_path):
+        """Load a saved index, or return ``None`` if there is none."""
+        path = os.path.join(folder_path, INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            k1, b = data["params"]
+            index = cls(float(k1), float(b))
+            terms = json.loads(str(data["terms"]))
+            offsets, slots, tfs = data["offsets"], data["slots"], data["tfs"]
+            for i, term in enumerate(terms):
+                start, end = offsets[i], offsets[i + 1]
+                index._postings[term] = (array("i", slots[start:end].tobytes()),
+                                         array("f", tfs[start:end].tobytes()))
+            index._doc_ids = json.loads(str(data["doc_ids"]))
+            index._doc_len = array("f", data["doc_len"].tobytes())
+        index._alive = array("b", b"\x01" * len(index._doc_ids))
+        index._slots = {doc_id: slot for slot, doc_id in enumerate(index._doc_ids)}
+        index._total_len = float(sum(index._doc_len))
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked ID lists: each ID scores ``sum(1 / (k + rank))`` over the lists it appears in."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,166 @@
+"""Table-driven decision rules shared by the decision and action agents.
+
+``RULES`` lists, in priority order, when each ``DecisionCode`` applies: the
+anomaly flag it belongs to and one threshold test, either on the z-score or
+on the latest sales against a multiple of the historical average. The last
+rule of each group has no test and catches the rest. The table is compiled
+once at import into per-group lists (single states) and condition arrays
+(``evaluate_batch``, NumPy).
+
+The decision agent writes the code and its text into the state; the action
+agent looks the action up by code instead of re-parsing the decision text.
+"""
+import operator
+from enum import IntEnum
+
+import numpy as np
+
+
+class DecisionCode(IntEnum):
+    CRITICAL_SPIKE = 1
+    SIGNIFICANT_INCREASE = 2
+    MODERATE_UPLIFT = 3
+    CRITICAL_DECLINE = 4
+    SEVERE_DROP = 5
+    DOWNWARD_TREND = 6
+    MINOR_VARIANCE = 7
+    WELL_ABOVE_AVERAGE = 8
+    HEALTHY = 9
+    NEAR_AVERAGE = 10
+    BELOW_AVERAGE = 11
+    UNDERPERFORMING = 12
+
+
+# (code, anomaly, metric, operator, bound): metric is "z_score", or
+# "latest_sales" compared with bound x sql_avg_sales; None matches everything
+RULES = (
+    (DecisionCode.CRITICAL_SPIKE, True, "z_score", ">", 3),
+    (DecisionCode.SIGNIFICANT_INCREASE, True, "z_score", ">", 2),
+    (DecisionCode.MODERATE_UPLIFT, True, "z_score", ">", 1.5),
+    (DecisionCode.CRITICAL_DECLINE, True, "z_score", "<", -3),
+    (DecisionCode.SEVERE_DROP, True, "z_score", "<", -2),
+    (DecisionCode.DOWNWARD_TREND, True, "z_score", "<", -1.5),
+    (DecisionCode.MINOR_VARIANCE, True, None, None, None),
+    (DecisionCode.WELL_ABOVE_AVERAGE, False, "latest_sales", ">", 1.3),
+    (DecisionCode.HEALTHY, False, "latest_sales", ">", 1.1),
+    (DecisionCode.NEAR_AVERAGE, False, "latest_sales", ">", 0.9),
+    (DecisionCode.BELOW_AVERAGE, False, "latest_sales", ">", 0.7),
+    (DecisionCode.UNDERPERFORMING, False, None, None, None),
+)
+
+# Fields: latest_sales, sql_avg_sales, increase, decrease, below_pct
+DECISIONS = {
+    DecisionCode.CRITICAL_SPIKE: "Critical sales spike detected (Z>3). Immediate action required: investigate market opportunity, optimize inventory, prepare scaling resources.",
+    DecisionCode.SIGNIFICANT_INCREASE: "Significant sales increase (+${increase:,.0f}). Capitalize on opportunity: expand marketing budget, enhance customer support, analyze campaign drivers.",
+    DecisionCode.MODERATE_UPLIFT: "Moderate sales uplift detected. Monitor trends closely and prepare marketing campaigns to sustain momentum.",
+    DecisionCode.CRITICAL_DECLINE: "Critical sales decline (Z<-3). URGENT: Execute emergency retention protocol, contact top customers, review pricing strategy.",
+    DecisionCode.SEVERE_DROP: "Severe sales drop (-${decrease:,.0f}). Launch customer recovery campaigns, review product quality, analyze competitor activity.",
+    DecisionCode.DOWNWARD_TREND: "Downward trend detected. Activate preventive retention strategies, increase customer engagement, conduct competitive analysis.",
+    DecisionCode.MINOR_VARIANCE: "Minor sales variance. Conduct root cause analysis to prevent further decline.",
+    DecisionCode.WELL_ABOVE_AVERAGE: "Sales performing well above average. Focus on maintaining quality while scaling operations cautiously.",
+    DecisionCode.HEALTHY: "Sales performance is healthy at ${latest_sales:,.0f}. Continue current strategy with incremental optimization.",
+    DecisionCode.NEAR_AVERAGE: "Sales near historical average. Maintain current operations while exploring new market segments.",
+    DecisionCode.BELOW_AVERAGE: "Sales below average by {below_pct:.0f}%. Implement gradual improvement plan without major disruption.",
+    DecisionCode.UNDERPERFORMING: "Sales significantly underperforming. Review pricing, product fit, and marketing effectiveness.",
+}
+
+# Field: forecast
+ACTIONS = {
+    DecisionCode.CRITICAL_SPIKE: "[URGENT] Market Opportunity Response: 1) Temporarily increase production by 40%, 2) Launch premium tier marketing campaign, 3) Expected revenue: ${forecast:,.0f}, 4) Assign team to analyze campaign drivers",
+    DecisionCode.SIGNIFICANT_INCREASE: "[HIGH PRIORITY] Growth Acceleration: 1) Scale marketing spend by 25%, 2) Hire additional sales team (4-6 reps), 3) Optimize fulfillment, 4) Target revenue: ${forecast:,.0f}",
+    DecisionCode.MODERATE_UPLIFT: "Sustained Growth Plan: 1) Increase marketing by 15%, 2) Launch email nurture campaigns, 3) Monitor conversion metrics, 4) Projected Q1 revenue: ${forecast:,.0f}",
+    DecisionCode.CRITICAL_DECLINE: "[EMERGENCY] Crisis Management: 1) Contact top 50 customers within 24hrs, 2) Offer loyalty incentives, 3) Review pricing/features, 4) Activate backup vendors, 5) Recovery target: ${forecast:,.0f}",
+    DecisionCode.SEVERE_DROP: "[HIGH PRIORITY] Recovery Protocol: 1) Customer retention campaign (personalized offers), 2) Product quality review, 3) Competitive analysis, 4) Expected recovery: ${forecast:,.0f}",
+    DecisionCode.DOWNWARD_TREND: "Retention & Stabilization: 1) Increase customer touchpoints by 50%, 2) Run re-engagement campaigns, 3) Launch referral incentives, 4) Stabilize at ${forecast:,.0f}",
+    DecisionCode.MINOR_VARIANCE: "Analysis & Monitoring: 1) Deep-dive into recent changes, 2) Review customer feedback, 3) Analyze traffic sources, 4) Prepare contingency plans",
+    DecisionCode.WELL_ABOVE_AVERAGE: "Quality Scaling: 1) Maintain service levels while growing carefully, 2) Expand to adjacent markets (10% budget), 3) Build strategic partnerships, 4) Target sustained revenue: ${forecast:,.0f}",
+    DecisionCode.HEALTHY: "Steady State Operations: 1) Optimize margins by 5%, 2) Launch customer satisfaction survey, 3) Test new channels (5% budget), 4) Maintain revenue at ${forecast:,.0f}",
+    DecisionCode.NEAR_AVERAGE: "Growth Exploration: 1) Identify underutilized market segments, 2) Run A/B tests for new messaging, 3) Develop adjacent product features, 4) Target growth to ${forecast:,.0f}",
+    DecisionCode.BELOW_AVERAGE: "Improvement Plan: 1) Analyze 5 recent lost deals, 2) Adjust pricing strategically, 3) Enhance value proposition, 4) Recovery timeline: 2-3 months, Target: ${forecast:,.0f}",
+    DecisionCode.UNDERPERFORMING: "Strategic Overhaul: 1) Complete market assessment, 2) Revise product positioning, 3) Restructure sales approach, 4) 90-day turnaround target: ${forecast:,.0f}",
+}
+DEFAULT_ACTION = "Monitor & Adapt: Closely track performance metrics. Target: ${forecast:,.0f}"
+
+# Decision texts written by other callers (no code in the state): first
+# matching keyword group, checked against the lower-cased text
+TEXT_KEYWORDS = (
+    (("critical sales spike",), ("immediate action required",), DecisionCode.CRITICAL_SPIKE),
+    (("significant sales increase",), ("capitalize on opportunity",), DecisionCode.SIGNIFICANT_INCREASE),
+    (("moderate sales uplift",), DecisionCode.MODERATE_UPLIFT),
+    (("critical sales decline",), ("urgent: execute emergency",), DecisionCode.CRITICAL_DECLINE),
+    (("severe sales drop",), DecisionCode.SEVERE_DROP),
+    (("downward trend",), ("activate preventive",), DecisionCode.DOWNWARD_TREND),
+    (("minor sales variance",), ("conduct root cause",), DecisionCode.MINOR_VARIANCE),
+    (("performing well above average",), DecisionCode.WELL_ABOVE_AVERAGE),
+    (("healthy", "continue"), DecisionCode.HEALTHY),
+    (("near historical average",), DecisionCode.NEAR_AVERAGE),
+    (("below average",), DecisionCode.BELOW_AVERAGE),
+    (("significantly underperforming",), DecisionCode.UNDERPERFORMING),
+)
+
+# Work on scalars and elementwise on arrays alike
+_OPERATORS = {">": operator.gt, "<": operator.lt}
+
+
+def _compile(rules):
+    """``{anomaly: [(code, metric, compare, bound), ...]}`` in priority order."""
+    compiled = {True: [], False: []}
+    for code, anomaly, metric, op, bound in rules:
+        compiled[anomaly].append((code, metric, _OPERATORS.get(op), bound))
+    return compiled
+
+
+_COMPILED = _compile(RULES)
+
+
+def _matches(metric, compare, bound, z_score, latest_sales, sql_avg_sales):
+    if metric is None:
+        return True
+    if metric == "z_score":
+        return compare(z_score, bound)
+    return compare(latest_sales, sql_avg_sales * bound)
+
+
+def evaluate(anomaly, z_score, latest_sales, sql_avg_sales):
+    """``DecisionCode`` of one state."""
+    for code, metric, compare, bound in _COMPILED[bool(anomaly)]:
+        if _matches(metric, compare, bound, z_score, latest_sales, sql_avg_sales):
+            return code
+    raise ValueError("Decision rules have no catch-all rule")
+
+
+def evaluate_batch(anomaly, z_score, latest_sales, sql_avg_sales):
+    """``DecisionCode`` values (int8 array) of many states given as equal-length arrays."""
+    anomaly = np.asarray(anomaly, dtype=bool)
+    z_score = np.asarray(z_score, dtype=np.float64)
+    latest_sales = np.asarray(latest_sales, dtype=np.float64)
+    sql_avg_sales = np.asarray(sql_avg_sales, dtype=np.float64)
+    codes = np.zeros(anomaly.shape, dtype=np.int8)
+    for flag, group in ((True, anomaly), (False, ~anomaly)):
+        conditions = [group & _matches(metric, compare, bound, z_score, latest_sales, sql_avg_sales)
+                      for _, metric, compare, bound in _COMPILED[flag]]
+        codes = np.select(conditions, [int(code) for code, _, _, _ in _COMPILED[flag]], codes)
+    return codes
+
+
+def decision_text(code, latest_sales, sql_avg_sales):
+    code = DecisionCode(code)
+    fields = {"latest_sales": latest_sales, "sql_avg_sales": sql_avg_sales,
+              "increase": latest_sales - sql_avg_sales, "decrease": sql_avg_sales - latest_sales}
+    if code == DecisionCode.BELOW_AVERAGE:
+        fields["below_pct"] = (1 - latest_sales / sql_avg_sales) * 100
+    return DECISIONS[code].format(**fields)
+
+
+def action_text(code, forecast):
+    template = ACTIONS.get(code, DEFAULT_ACTION) if code is not None else DEFAULT_ACTION
+    return template.format(forecast=forecast)
+
+
+def code_from_text(decision):
+    """``DecisionCode`` of a free-text decision, or ``None`` if it matches no rule."""
+    text = (decision or "").lower()
+    for *groups, code in TEXT_KEYWORDS:
+        if any(all(keyword in text for keyword in group) for group in groups):
+            return code
+    return None
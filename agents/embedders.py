@@ -0,0 +1,123 @@
+"""Embedding backends for the RAG agent.
+
+Every backend implements the LangChain ``Embeddings`` interface, so the index
+code does not care which one it gets. ``RAG_EMBEDDER`` selects the backend:
+
+- ``openai``: ``OpenAIEmbeddings`` (needs ``OPENAI_API_KEY``)
+- ``local``: ``HashingEmbeddings``, fully offline and deterministic
+- ``auto`` (default): ``openai`` when an API key is set, ``local`` otherwise
+
+Remote backends are wrapped in ``CachedEmbeddings`` so chunks embedded once are
+never sent to the API again (set ``RAG_EMBEDDING_CACHE=0`` to disable).
+"""
+import os
+import threading
+
+import numpy as np
+# ========== LANGCHAIN ==========
+# LANGCHAIN: Base interface shared by all embedding backends
+from langchain_core.embeddings import Embeddings
+# ==============================
+
+LOCAL_DIM = int(os.getenv("RAG_LOCAL_DIM", "2048"))
+CACHE_ENABLED = os.getenv("RAG_EMBEDDING_CACHE", "1") != "0"
+
+_lock = threading.Lock()
+_embedders = {}
+
+
+class HashingEmbeddings(Embeddings):
+    """Offline embeddings from a hashing vectorizer.
+
+    Texts are tokenised into word unigrams and bigrams, hashed into ``dim``
+    buckets, weighted with sublinear term frequency and L2-normalised, so the
+    dot product of two vectors is their cosine similarity. Being stateless,
+    it embeds new chunks without refitting anything.
+    """
+
+    # Indexes built from these vectors are searched in-process with NumPy
+    local = True
+
+    def __init__(self, dim=LOCAL_DIM):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+        self._vectorizer = HashingVectorizer(
+            n_features=dim,
+            ngram_range=(1, 2),
+            stop_words="english",
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32,
+        )
+
+    def embed_array(self, texts):
+        """Embed ``texts`` into a contiguous ``(len(texts), dim)`` float32 matrix."""
+        counts = self._vectorizer.transform(texts)
+        counts.data = 1.0 + np.log(counts.data)
+        matrix = np.ascontiguousarray(counts.toarray(), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+    async def aembed_query(self, text):
+        # In-process and fast: no executor hand-off
+        return self.embed_query(text)
+
+
+def _openai_embedder():
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY is required for the openai embedder")
+    # ========== LANGCHAIN ==========
+    # LANGCHAIN: OpenAI embeddings - converts text to vectors
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(api_key=api_key)
+    # ==============================
+
+
+EMBEDDERS = {
+    "openai": _openai_embedder,
+    "local": HashingEmbeddings,
+}
+
+
+def resolve_backend(backend=None):
+    backend = (backend or os.getenv("RAG_EMBEDDER", "auto")).lower()
+    if backend == "auto":
+        backend = "openai" if os.getenv("OPENAI_API_KEY") else "local"
+    if backend not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{backend}', expected one of {sorted(EMBEDDERS)}")
+    return backend
+
+
+def get_embedder(backend=None):
+    """Return the process-wide embedder instance for ``backend``."""
+    backend = resolve_backend(backend)
+    with _lock:
+        if backend not in _embedders:
+            embedder = EMBEDDERS[backend]()
+            # Local embeddings are cheaper to recompute than to read back from disk
+            if CACHE_ENABLED and not getattr(embedder, "local", False):
+                from agents.embedding_cache import CachedEmbeddings
+                embedder = CachedEmbeddings(embedder)
+            _embedders[backend] = embedder
+        return _embedders[backend]
+
+
+def embed_matrix(embeddings, texts):
+    """Embed ``texts`` with any backend into an L2-normalised float32 matrix."""
+    if hasattr(embeddings, "embed_array"):
+        return embeddings.embed_array(texts)
+    matrix = np.asarray(embeddings.embed_documents(list(texts)), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,223 @@
+"""On-disk embedding cache shared by every index build.
+
+Vectors are keyed by (embedding model, SHA-256 of the chunk text). Each model
+gets its own directory holding a memory-mapped float32 matrix
+(``vectors.f32``) and a compact key index (``index.npz``: a 16-byte key digest,
+an occupancy flag and a last-use tick per slot). The cache holds at most ``max_entries`` vectors;
+when it is full the least recently used slots are evicted and reused.
+
+The cache is safe to share between threads of one process, not between
+processes writing concurrently.
+"""
+import os
+import re
+import hashlib
+import threading
+
+import numpy as np
+# ========== LANGCHAIN ==========
+# LANGCHAIN: Base interface shared by all embedding backends
+from langchain_core.embeddings import Embeddings
+# ==============================
+
+CACHE_PATH = os.getenv("RAG_EMBEDDING_CACHE_PATH", "data/embedding_cache")
+MAX_ENTRIES = int(os.getenv("RAG_EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.npz"
+KEY_BYTES = 16
+INITIAL_CAPACITY = 1024
+
+_lock = threading.Lock()
+_stores = {}
+
+
+def text_key(text):
+    """16-byte digest identifying a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).digest()[:KEY_BYTES]
+
+
+class EmbeddingStore:
+    """Size-bounded LRU store of float32 vectors in a memory-mapped file."""
+
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._dim = None
+        self._vectors = None
+        self._keys = np.zeros((0, KEY_BYTES), dtype=np.uint8)
+        self._occupied = np.zeros(0, dtype=bool)
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._slots = {}
+        self._free = []
+        self._clock = 0
+        self._load()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _load(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        with np.load(index_path) as index:
+            self._dim = int(index["dim"])
+            self._keys = index["keys"].copy()
+            self._occupied = index["occupied"].copy()
+            self._last_used = index["last_used"].copy()
+        self._vectors = np.memmap(
+            os.path.join(self.path, VECTORS_FILE), dtype=np.float32, mode="r+",
+            shape=(len(self._keys), self._dim),
+        )
+        for slot in range(len(self._keys)):
+            if self._occupied[slot]:
+                self._slots[self._keys[slot].tobytes()] = slot
+            else:
+                self._free.append(slot)
+        self._clock = int(self._last_used.max(initial=0))
+
+    def _save_index(self):
+        tmp_path = os.path.join(self.path, INDEX_FILE + ".tmp.npz")
+        np.savez(tmp_path, dim=self._dim, keys=self._keys, occupied=self._occupied, last_used=self._last_used)
+        os.replace(tmp_path, os.path.join(self.path, INDEX_FILE))
+
+    def _grow(self, capacity):
+        """Resize the backing file to ``capacity`` slots and re-map it."""
+        os.makedirs(self.path, exist_ok=True)
+        old = len(self._keys)
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(vectors_path, "ab") as f:
+            f.truncate(capacity * self._dim * 4)
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+        self._keys = np.concatenate([self._keys, np.zeros((capacity - old, KEY_BYTES), dtype=np.uint8)])
+        self._occupied = np.concatenate([self._occupied, np.zeros(capacity - old, dtype=bool)])
+        self._last_used = np.concatenate([self._last_used, np.zeros(capacity - old, dtype=np.int64)])
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def _evict(self, count):
+        """Free the ``count`` least recently used slots."""
+        used = np.flatnonzero(self._occupied)
+        count = min(count, len(used))
+        victims = used[np.argpartition(self._last_used[used], count - 1)[:count]]
+        for slot in victims:
+            del self._slots[self._keys[slot].tobytes()]
+            self._occupied[slot] = False
+            self._free.append(int(slot))
+        self.evictions += count
+
+    def _reserve(self, count):
+        if len(self._free) >= count:
+            return
+        capacity = len(self._keys)
+        if capacity < self.max_entries:
+            target = max(INITIAL_CAPACITY, 2 * capacity, capacity + count - len(self._free))
+            self._grow(min(target, self.max_entries))
+        if len(self._free) < count:
+            # Evict in batches of 10% so a full cache does not evict on every insert
+            self._evict(max(count - len(self._free), self.max_entries // 10))
+
+    def get_many(self, keys):
+        """Return a list with a vector (copy) for every cached key and ``None`` for misses."""
+        with self._lock:
+            self._clock += 1
+            found = []
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self.hits += 1
+                    self._last_used[slot] = self._clock
+                    found.append(np.array(self._vectors[slot]))
+            return found
+
+    def put_many(self, keys, vectors):
+        """Store one vector per (unique) key, evicting cold entries if the cache is full."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = list(keys)
+        if len(keys) != len(vectors):
+            raise ValueError("put_many expects one vector per key")
+        keys, vectors = keys[-self.max_entries:], vectors[-self.max_entries:]
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match cache dimension {self._dim}")
+            self._clock += 1
+            new_keys = 0
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    new_keys += 1
+                else:
+                    # Mark as hot so eviction below cannot free it
+                    self._last_used[slot] = self._clock
+            self._reserve(new_keys)
+            for i, key in enumerate(keys):
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._free.pop()
+                    self._slots[key] = slot
+                    self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                    self._occupied[slot] = True
+                self._vectors[slot] = vectors[i]
+                self._last_used[slot] = self._clock
+            self._vectors.flush()
+            self._save_index()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def get_store(model, cache_path=CACHE_PATH, max_entries=MAX_ENTRIES):
+    """Process-wide store for ``model``; each model has its own directory."""
+    path = os.path.join(cache_path, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+    with _lock:
+        if path not in _stores:
+            _stores[path] = EmbeddingStore(path, max_entries)
+        return _stores[path]
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an embeddings backend so documents already embedded are read from disk."""
+
+    def __init__(self, embeddings, store=None):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.store = store if store is not None else get_store(self.model)
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        keys = [text_key(text) for text in texts]
+        found = self.store.get_many(keys)
+        missing = {}
+        for i, vector in enumerate(found):
+            if vector is None:
+                missing.setdefault(keys[i], texts[i])
+        if missing:
+            vectors = np.asarray(self.embeddings.embed_documents(list(missing.values())), dtype=np.float32)
+            self.store.put_many(list(missing), vectors)
+            computed = dict(zip(missing, vectors))
+            found = [computed[key] if vector is None else vector for key, vector in zip(keys, found)]
+        return [vector.tolist() for vector in found]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text):
+        # The backend's own async client (OpenAIEmbeddings: AsyncOpenAI)
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,158 @@
+"""Approximate FAISS index types for large RAG corpora.
+
+``RAG_INDEX_TYPE`` selects how FAISS stores the chunk vectors:
+
+- ``flat``: exact search, query cost linear in the corpus (the default)
+- ``ivf``: inverted file over k-means cells, only ``RAG_NPROBE`` cells are scanned
+- ``ivfpq``: IVF with product-quantised vectors, a fraction of the memory
+- ``hnsw``: graph search, no training, the fastest queries but the largest index
+
+``ApproximateFAISS`` is a drop-in LangChain ``FAISS`` store. Below
+``RAG_ANN_MIN_VECTORS`` it stays flat (approximate search does not pay off on
+small corpora); once a build or update takes it past that, it is trained on a
+sample of its own vectors and converted before it is saved. The number of IVF
+cells is fixed at training time, so a full rebuild retrains a corpus that has
+grown a lot. FAISS cannot renumber IVF ids or remove from HNSW
+graphs, so deletes rebuild the index from its stored vectors, keeping the
+trained quantizer. ``benchmarks/bench_rag_index.py`` compares the types.
+"""
+import os
+import math
+
+import faiss
+import numpy as np
+# ========== LANGCHAIN ==========
+# LANGCHAIN: FAISS vector store wrapper
+from langchain_community.vectorstores import FAISS
+# ==============================
+
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+# Corpora smaller than this stay exact
+MIN_VECTORS = int(os.getenv("RAG_ANN_MIN_VECTORS", "10000"))
+# IVF cells scanned per query / HNSW candidate list size
+NPROBE = int(os.getenv("RAG_NPROBE", "16"))
+EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+# PQ code size in bytes per vector (0 = derived from the dimension)
+PQ_M = int(os.getenv("RAG_PQ_M", "0"))
+HNSW_M = 32
+# Candidate list size while building the HNSW graph; FAISS's default of 40
+# leaves recall below 0.8 on high-dimensional embeddings
+HNSW_EF_CONSTRUCTION = 200
+# Vectors sampled per IVF cell for k-means training
+TRAIN_PER_CELL = 64
+ADD_BLOCK = 65536
+
+
+def pq_subquantizers(dim):
+    """PQ code size (bytes per vector): the largest common size dividing ``dim``
+    into sub-vectors of at least 8 dimensions (smaller ones train very slowly)."""
+    for m in (64, 48, 32, 24, 16, 8, 4, 2):
+        if dim % m == 0 and dim // m >= 8:
+            return m
+    return 1
+
+
+def factory_string(kind, n_vectors, dim):
+    """FAISS ``index_factory`` description for ``kind`` sized for ``n_vectors``."""
+    if kind == "flat":
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{HNSW_M}"
+    # ~4 sqrt(n) cells, with enough training points per cell for k-means
+    nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+    if kind == "ivf":
+        return f"IVF{nlist},Flat"
+    if kind == "ivfpq":
+        return f"IVF{nlist},PQ{PQ_M or pq_subquantizers(dim)}"
+    raise ValueError(f"Unknown index type {kind!r}; expected one of {', '.join(INDEX_TYPES)}")
+
+
+def configure(index):
+    """Apply the query-time search parameters to a (loaded or new) index."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(NPROBE, ivf.nlist)
+    elif hasattr(index, "hnsw"):
+        index.hnsw.efSearch = EF_SEARCH
+    return index
+
+
+def build_faiss_index(kind, vectors, seed=0):
+    """Train an index of type ``kind`` on a sample of ``vectors`` and add them all."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(kind, n, dim), faiss.METRIC_L2)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        ivf = faiss.extract_index_ivf(index)
+        sample_size = min(n, TRAIN_PER_CELL * ivf.nlist)
+        if kind == "ivfpq":
+            # 8-bit PQ codebooks want at least 256 points each
+            sample_size = min(n, max(sample_size, 256 * 39))
+        sample = np.random.default_rng(seed).choice(n, sample_size, replace=False)
+        index.train(vectors[np.sort(sample)])
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # Lets deletes reconstruct the surviving vectors
+        ivf.make_direct_map()
+    for start in range(0, n, ADD_BLOCK):
+        index.add(vectors[start:start + ADD_BLOCK])
+    return configure(index)
+
+
+def index_memory(index):
+    """Bytes needed to hold ``index`` (its serialized size)."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+class ApproximateFAISS(FAISS):
+    """LangChain FAISS store that converts itself to ``RAG_INDEX_TYPE`` once large enough."""
+
+    index_type = INDEX_TYPE
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        configure(self.index)
+
+    def _vectors(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        if not len(positions):
+            return np.zeros((0, self.index.d), dtype=np.float32)
+        return self.index.reconstruct_batch(positions)
+
+    def maybe_convert(self):
+        """Train and switch to ``index_type`` once the flat index holds ``MIN_VECTORS`` vectors.
+
+        Called before the index is saved, so training sees the whole corpus
+        of a build rather than its first batches.
+        """
+        if (self.index_type != "flat" and isinstance(self.index, faiss.IndexFlat)
+                and self.index.ntotal >= MIN_VECTORS):
+            self.index = build_faiss_index(self.index_type, self._vectors(np.arange(self.index.ntotal)))
+            return True
+        return False
+
+    def delete(self, ids=None, **kwargs):
+        if isinstance(self.index, faiss.IndexFlat):
+            return super().delete(ids, **kwargs)
+        if ids is None:
+            raise ValueError("No ids provided to delete.")
+        drop = set(ids)
+        missing = drop.difference(self.index_to_docstore_id.values())
+        if missing:
+            raise ValueError(f"Some specified ids do not exist in the current store. Ids not found: {missing}")
+        keep = [(position, id_) for position, id_ in sorted(self.index_to_docstore_id.items()) if id_ not in drop]
+        vectors = self._vectors([position for position, _ in keep])
+
+        # Re-add the survivors; reset() keeps the trained quantizer
+        self.index.reset()
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        for start in range(0, len(vectors), ADD_BLOCK):
+            self.index.add(vectors[start:start + ADD_BLOCK])
+        self.docstore.delete(list(drop))
+        self.index_to_docstore_id = {position: id_ for position, (_, id_) in enumerate(keep)}
+        return True
@@ -0,0 +1,250 @@
+"""Fitted forecast models per segment, kept current one day at a time.
+
+Refitting a segment's history on every workflow run would dominate the
+forecasting agent's latency. ``ForecastCache`` keeps each segment's fitted
+state (model, smoothing parameters, level / trend / season) and on a lookup
+only folds in the days since it last saw the segment, with
+``FittedModels.update`` (O(1) per day). The latest day with sales may still
+be filling up, so the kept state stops the day before it ("settled") and the
+latest day is applied to a copy for each forecast.
+
+A segment is refitted from its full history only
+
+- on schedule, once ``FORECAST_REFIT_DAYS`` days have settled since its fit, or
+- on drift, when the EWMA of its squared one-step errors, in units of the
+  fit's error variance, exceeds ``FORECAST_DRIFT_RATIO``.
+
+States live in an in-process LRU (``FORECAST_CACHE_SIZE`` segments) over the
+``forecast_models`` table, so they survive restarts and are shared between
+workers. The table keeps at most ``FORECAST_CACHE_MAX_SEGMENTS`` rows and drops
+the least recently updated ones; a segment in use is updated at least daily.
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+
+import database
+import rolling_stats
+from agents import forecast_models
+
+# Daily history (days) a segment's models are fitted on
+HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "365"))
+# Segments kept in memory
+CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "4096"))
+# Segments kept in the forecast_models table
+MAX_SEGMENTS = int(os.getenv("FORECAST_CACHE_MAX_SEGMENTS", "100000"))
+# Settled days after which a segment is refitted from scratch
+REFIT_DAYS = int(os.getenv("FORECAST_REFIT_DAYS", "7"))
+# EWMA of squared one-step errors / fit variance above which a segment is refitted
+DRIFT_RATIO = float(os.getenv("FORECAST_DRIFT_RATIO", "6.0"))
+# Weight of the newest day in that EWMA; one 5-sigma day alone stays below the ratio
+DRIFT_ALPHA = float(os.getenv("FORECAST_DRIFT_ALPHA", "0.2"))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS forecast_models (
+        segment TEXT PRIMARY KEY,
+        settled_day TEXT NOT NULL,
+        fitted_day TEXT NOT NULL,
+        fit_sigma REAL NOT NULL,
+        drift REAL NOT NULL,
+        state TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    ) WITHOUT ROWID
+"""
+
+
+@dataclass
+class CachedModel:
+    """One segment's fitted models, updated through ``settled_day``."""
+    fitted: forecast_models.FittedModels
+    settled_day: date
+    fitted_day: date
+    fit_sigma: float
+    # 1.0 while the one-step errors match the fit's
+    drift: float = 1.0
+
+
+class ForecastCache:
+    """LRU of per-segment fitted forecast models over the ``forecast_models`` table."""
+
+    def __init__(self, maxsize=CACHE_SIZE, max_segments=MAX_SEGMENTS, refit_days=REFIT_DAYS,
+                 drift_ratio=DRIFT_RATIO, history_days=HISTORY_DAYS):
+        self.maxsize = maxsize
+        self.max_segments = max_segments
+        self.refit_days = refit_days
+        self.drift_ratio = drift_ratio
+        self.history_days = history_days
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # segment -> (lock, callers holding or waiting for it)
+        self._segment_locks = {}
+        self._database_url = None
+        self.hits = 0
+        self.loads = 0
+        self.fits = 0
+        self.refits = 0
+        self.drift_refits = 0
+        self.updates = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def forecast(self, segment, horizon=forecast_models.HORIZON):
+        """Next ``horizon`` days of ``segment`` after its latest day with sales.
+
+        Returns ``{"model", "last_day", "point", "lower", "upper"}`` (arrays),
+        or ``None`` when the segment has too little history to fit.
+        """
+        with self._segment_lock(segment):
+            database_url = database.DATABASE_URL
+            if self._database_url != database_url:
+                # DDL may wait on SQLite's busy timeout: outside the cache lock, so other segments are served
+                database.execute(SCHEMA)
+            with self._lock:
+                if self._database_url != database_url:
+                    # States belong to the database they were fitted on
+                    self._data.clear()
+                    self._database_url = database_url
+                entry = self._data.get(segment)
+                if entry is not None:
+                    self.hits += 1
+            # Reads and fits run outside the cache lock; the segment lock keeps them to one per segment
+            loaded = fitted = False
+            if entry is None:
+                entry = self._load(segment)
+                loaded = entry is not None
+
+            changed = False
+            settled = refit = drift_refit = 0
+            totals = []
+            if entry is not None:
+                first_day, totals = rolling_stats.daily_totals(segment, after=entry.settled_day)
+                if totals and first_day == entry.settled_day + timedelta(1):
+                    for value in totals[:-1]:
+                        self._settle(entry, value)
+                    settled = len(totals) - 1
+                    changed = settled > 0
+                    if entry.drift > self.drift_ratio:
+                        drift_refit = 1
+                        entry = None
+                    elif (entry.settled_day - entry.fitted_day).days >= self.refit_days:
+                        refit = 1
+                        entry = None
+                else:
+                    # History changed under the state (deleted days): start over
+                    entry = None
+            if entry is None:
+                entry, totals = self._fit(segment)
+                changed = fitted = entry is not None
+            if changed:
+                self._save(segment, entry)
+
+            with self._lock:
+                self.loads += loaded
+                self.updates += settled
+                self.refits += refit
+                self.drift_refits += drift_refit
+                self.fits += fitted
+                # Unless the database was switched meanwhile: the state is not the new one's
+                if self._database_url == database_url:
+                    if entry is None:
+                        self._data.pop(segment, None)
+                    else:
+                        self._data[segment] = entry
+                        self._data.move_to_end(segment)
+                        while len(self._data) > self.maxsize:
+                            self._data.popitem(last=False)
+                            self.evictions += 1
+            if entry is None:
+                return None
+            latest = entry.fitted.copy()
+            latest.update([totals[-1]])
+            model = latest.model_names[0]
+        point, lower, upper = (values[0] for values in latest.forecast(horizon))
+        return {"model": model, "last_day": entry.settled_day + timedelta(1),
+                "point": point, "lower": lower, "upper": upper}
+
+    @contextmanager
+    def _segment_lock(self, segment):
+        """Held while one segment is read, updated or fitted; dropped when no caller waits on it."""
+        with self._lock:
+            lock, users = self._segment_locks.get(segment, (None, 0))
+            lock = lock or threading.Lock()
+            self._segment_locks[segment] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._segment_locks[segment]
+                if users == 1:
+                    del self._segment_locks[segment]
+                else:
+                    self._segment_locks[segment] = (lock, users - 1)
+
+    def _settle(self, entry, value):
+        error = entry.fitted.update([value])[0]
+        entry.drift += DRIFT_ALPHA * (error ** 2 / max(entry.fit_sigma ** 2, 1e-9) - entry.drift)
+        entry.settled_day += timedelta(1)
+
+    def _fit(self, segment):
+        """Fit the segment's history up to the day before its latest; ``(None, totals)`` if too short."""
+        first_day, totals = rolling_stats.daily_totals(segment, self.history_days)
+        if len(totals) - 1 < forecast_models.min_history():
+            return None, totals
+        fitted = forecast_models.fit(np.array([totals[:-1]]))
+        settled_day = first_day + timedelta(len(totals) - 2)
+        return CachedModel(fitted, settled_day, settled_day, float(fitted.sigma[0])), totals
+
+    def _load(self, segment):
+        row = database.query_one("SELECT settled_day, fitted_day, fit_sigma, drift, state FROM forecast_models "
+                                 "WHERE segment = :segment", {"segment": segment})
+        if row is None:
+            return None
+        settled_day, fitted_day, fit_sigma, drift, state = row
+        fitted = forecast_models.FittedModels(**{name: np.array(value) for name, value in json.loads(state).items()})
+        return CachedModel(fitted, date.fromisoformat(settled_day), date.fromisoformat(fitted_day), fit_sigma, drift)
+
+    def _save(self, segment, entry):
+        state = json.dumps({name: value.tolist() for name, value in entry.fitted.__dict__.items()})
+        with database.transaction() as conn:
+            conn.execute(
+                "INSERT INTO forecast_models (segment, settled_day, fitted_day, fit_sigma, drift, state, updated_at) "
+                "VALUES (:segment, :settled_day, :fitted_day, :fit_sigma, :drift, :state, :updated_at) "
+                "ON CONFLICT (segment) DO UPDATE SET settled_day = excluded.settled_day, "
+                "fitted_day = excluded.fitted_day, fit_sigma = excluded.fit_sigma, drift = excluded.drift, "
+                "state = excluded.state, updated_at = excluded.updated_at",
+                {"segment": segment, "settled_day": entry.settled_day.isoformat(),
+                 "fitted_day": entry.fitted_day.isoformat(), "fit_sigma": entry.fit_sigma, "drift": entry.drift,
+                 "state": state, "updated_at": time.time()})
+            if entry.settled_day == entry.fitted_day:
+                # Fresh fit, possibly a new segment: drop the least recently updated beyond the cap
+                conn.execute("DELETE FROM forecast_models WHERE segment IN (SELECT segment FROM forecast_models "
+                             "ORDER BY updated_at LIMIT MAX(0, (SELECT COUNT(*) FROM forecast_models) - :cap))",
+                             {"cap": self.max_segments})
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "loads": self.loads,
+                "fits": self.fits,
+                "refits": self.refits,
+                "drift_refits": self.drift_refits,
+                "updates": self.updates,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,205 @@
+"""Exponential smoothing forecasts fitted to many daily series at once.
+
+``fit`` takes a ``(series, days)`` array and fits, for every series:
+
+- simple exponential smoothing (level),
+- Holt's linear trend (level + trend),
+- additive Holt-Winters (level + trend + weekly season), and
+- the seasonal-naive baseline (same weekday last week).
+
+SES, Holt and Holt-Winters are one additive recurrence with the trend and/or
+season switched off, so every smoothing-parameter combination of every model
+is a lane of one ``(series, lanes)`` array, advanced a day at a time over all
+series together; the only Python loop is over days. Each series keeps the
+model with the lowest AIC of its one-step-ahead errors.
+
+Prediction intervals use the ETS(A,A,A) variance of the h-step error,
+``sigma^2 * (1 + sum_{j<h} (alpha + beta* j + gamma* [j mod m = 0])^2)``
+(``beta* = alpha beta``, ``gamma* = gamma (1 - alpha)``), and
+``sigma^2 * (floor((h - 1) / m) + 1)`` for seasonal naive.
+"""
+import os
+from dataclasses import dataclass
+from statistics import NormalDist
+
+import numpy as np
+
+SEASON = int(os.getenv("FORECAST_SEASON", "7"))
+HORIZON = int(os.getenv("FORECAST_HORIZON", "7"))
+# Coverage of the prediction intervals
+INTERVAL = float(os.getenv("FORECAST_INTERVAL", "0.95"))
+# Series fitted together; small chunks keep the (series, lanes) state in cache
+CHUNK = int(os.getenv("FORECAST_CHUNK", "128"))
+
+MODELS = ("ses", "holt", "holt_winters", "seasonal_naive")
+ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETAS = (0.01, 0.05, 0.15, 0.3)
+GAMMAS = (0.01, 0.05, 0.15, 0.3)
+
+
+def _lanes():
+    """``(model, alpha, beta, gamma)`` of every lane of the shared recurrence."""
+    lanes = [(0, a, 0.0, 0.0) for a in ALPHAS]
+    lanes += [(1, a, b, 0.0) for a in ALPHAS for b in BETAS]
+    lanes += [(2, a, b, g) for a in ALPHAS for b in BETAS for g in GAMMAS]
+    return np.array([lane[0] for lane in lanes]), np.array([lane[1:] for lane in lanes]).T
+
+
+LANE_MODELS, (LANE_ALPHA, LANE_BETA, LANE_GAMMA) = _lanes()
+# Parameters + initial states, for the AIC
+MODEL_PARAMS = np.array([2, 4, 5 + SEASON - 1, 1])
+
+
+def min_history(season=SEASON):
+    """Days a series needs: two full seasons."""
+    return 2 * season
+
+
+@dataclass
+class FittedModels:
+    """Fitted model and current state of each series, updatable one observation at a time."""
+    model: np.ndarray
+    alpha: np.ndarray
+    beta: np.ndarray
+    gamma: np.ndarray
+    level: np.ndarray
+    trend: np.ndarray
+    season: np.ndarray
+    recent: np.ndarray
+    phase: np.ndarray
+    sse: np.ndarray
+    n: np.ndarray
+
+    def __len__(self):
+        return len(self.model)
+
+    @property
+    def sigma(self):
+        return np.sqrt(self.sse / np.maximum(self.n, 1))
+
+    @property
+    def model_names(self):
+        return [MODELS[code] for code in self.model]
+
+    def rows(self, index):
+        """The fitted models of a subset of series."""
+        return FittedModels(**{name: value[index] for name, value in self.__dict__.items()})
+
+    def copy(self):
+        return FittedModels(**{name: value.copy() for name, value in self.__dict__.items()})
+
+    def forecast(self, horizon=HORIZON, interval=INTERVAL):
+        """``(point, lower, upper)`` arrays of shape ``(series, horizon)``, floored at 0."""
+        m = self.season.shape[1]
+        h = np.arange(1, horizon + 1)
+        slot = (self.phase[:, None] + h - 1) % m
+        rows = np.arange(len(self))[:, None]
+        smoothed = self.level[:, None] + h * self.trend[:, None] + self.season[rows, slot]
+        naive = self.model == MODELS.index("seasonal_naive")
+        point = np.where(naive[:, None], self.recent[rows, slot], smoothed)
+
+        j = np.arange(1, horizon)
+        c = (self.alpha[:, None] + self.alpha[:, None] * self.beta[:, None] * j
+             + self.gamma[:, None] * (1 - self.alpha[:, None]) * (j % m == 0))
+        steps = np.concatenate([np.ones((len(self), 1)), 1 + np.cumsum(c ** 2, axis=1)], axis=1)
+        naive_steps = (h - 1) // m + 1
+        variance = self.sigma[:, None] ** 2 * np.where(naive[:, None], naive_steps, steps)
+        z = NormalDist().inv_cdf(0.5 + interval / 2)
+        spread = z * np.sqrt(variance)
+        return np.maximum(point, 0), np.maximum(point - spread, 0), np.maximum(point + spread, 0)
+
+    def update(self, values):
+        """Add one new observation per series in O(1); returns the one-step-ahead errors."""
+        y = np.asarray(values, dtype=np.float64)
+        rows = np.arange(len(self))
+        slot = self.phase
+        naive = self.model == MODELS.index("seasonal_naive")
+        season = self.season[rows, slot]
+        error = np.where(naive, y - self.recent[rows, slot], y - (self.level + self.trend + season))
+        level = self.alpha * (y - season) + (1 - self.alpha) * (self.level + self.trend)
+        self.trend = self.beta * (level - self.level) + (1 - self.beta) * self.trend
+        self.season[rows, slot] = self.gamma * (y - level) + (1 - self.gamma) * season
+        self.level = level
+        self.recent[rows, slot] = y
+        self.phase = (slot + 1) % self.season.shape[1]
+        self.sse = self.sse + error ** 2
+        self.n = self.n + 1
+        return error
+
+
+def _fit_chunk(y, m):
+    n_series, n_days = y.shape
+    n_lanes = len(LANE_MODELS)
+    trend_lanes = (LANE_MODELS >= 1)[None, :]
+    season_lanes = (LANE_MODELS == 2)[None, None, :]
+    alpha, beta, gamma = LANE_ALPHA[None, :], LANE_BETA[None, :], LANE_GAMMA[None, :]
+
+    first = y[:, :m].mean(axis=1)
+    second = y[:, m:2 * m].mean(axis=1)
+    level = np.repeat(first[:, None], n_lanes, axis=1)
+    trend = np.where(trend_lanes, ((second - first) / m)[:, None], 0.0)
+    # Slot-major, so each day's slot is one contiguous (series, lanes) block
+    season = np.where(season_lanes, (y[:, :m] - first[:, None]).T[:, :, None], 0.0)
+    sse = np.zeros((n_series, n_lanes))
+    error = np.empty_like(sse)
+    step = np.empty_like(sse)
+    # Error-correction form: each state moves by its own multiple of the one-step error
+    trend_gain, season_gain = alpha * beta, gamma * (1 - alpha)
+    for t in range(m, n_days):
+        previous_season = season[t % m]
+        level += trend
+        np.subtract(y[:, t:t + 1], level, out=error)
+        error -= previous_season
+        np.multiply(error, error, out=step)
+        sse += step
+        np.multiply(alpha, error, out=step)
+        level += step
+        np.multiply(trend_gain, error, out=step)
+        trend += step
+        np.multiply(season_gain, error, out=step)
+        previous_season += step
+
+    n = n_days - m
+    naive_sse = ((y[:, m:] - y[:, :-m]) ** 2).sum(axis=1)
+    # Best lane of each smoothing model, then the lowest AIC across models
+    best_lane = np.empty((n_series, 3), dtype=np.int64)
+    model_sse = np.empty((n_series, 4))
+    for code in range(3):
+        lanes = np.flatnonzero(LANE_MODELS == code)
+        pick = lanes[np.argmin(sse[:, lanes], axis=1)]
+        best_lane[:, code] = pick
+        model_sse[:, code] = sse[np.arange(n_series), pick]
+    model_sse[:, 3] = naive_sse
+    aic = n * np.log(np.maximum(model_sse, 1e-12) / n) + 2 * MODEL_PARAMS
+    model = np.argmin(aic, axis=1)
+
+    rows = np.arange(n_series)
+    lane = best_lane[rows, np.minimum(model, 2)]
+    naive = model == 3
+    return FittedModels(
+        model=model.astype(np.int8),
+        alpha=np.where(naive, 0.0, LANE_ALPHA[lane]),
+        beta=np.where(naive, 0.0, LANE_BETA[lane]),
+        gamma=np.where(naive, 0.0, LANE_GAMMA[lane]),
+        level=level[rows, lane],
+        trend=trend[rows, lane],
+        season=season[:, rows, lane].T.copy(),
+        # recent[:, t % m] holds y_t for the last m days
+        recent=np.roll(y[:, -m:], n_days % m, axis=1),
+        phase=np.full(n_series, n_days % m),
+        sse=model_sse[rows, model],
+        n=np.full(n_series, n),
+    )
+
+
+def fit(series, season=SEASON, chunk=CHUNK):
+    """Fit every row of a ``(series, days)`` array of daily totals; returns ``FittedModels``."""
+    y = np.asarray(series, dtype=np.float64)
+    if y.ndim != 2 or y.shape[1] < min_history(season):
+        raise ValueError(f"Expected a (series, days) array with at least {min_history(season)} days, "
+                         f"got shape {y.shape}")
+    parts = [_fit_chunk(y[start:start + chunk], season) for start in range(0, len(y), chunk)]
+    if len(parts) == 1:
+        return parts[0]
+    return FittedModels(**{name: np.concatenate([getattr(part, name) for part in parts])
+                           for name in parts[0].__dict__})
@@ -1,13 +1,55 @@
+from datetime import timedelta
+
+import rolling_stats
+from agents import forecast_models
+from agents.forecast_cache import ForecastCache
+
+# Fitted models per segment, updated incrementally as days settle
+_forecast_cache = ForecastCache()
+
+
+def forecast_cache_stats():
+    """Hit / fit / refit counters of the per-segment model cache."""
+    return _forecast_cache.stats()
+
+
+def get_forecast(product=None, region=None, horizon=forecast_models.HORIZON):
+    """Cached model forecast of the segment's next days, or ``None`` without enough history."""
+    try:
+        return _forecast_cache.forecast(rolling_stats.segment_key(product, region), horizon)
+    except Exception:
+        # Rolling windows not installed
+        return None
+
+
 def forecasting_agent(state):
     """Forecasting agent for predicting future trends."""
     latest_sales = state.get("latest_sales", 100000)
     sql_avg = state.get("sql_avg_sales", 100000)
-    
-    # Simple forecast: if anomaly detected, predict return to average, else slight growth
+    forecast = get_forecast(state.get("product"), state.get("region"))
+
+    if forecast is not None:
+        # SES / Holt / Holt-Winters / seasonal naive on the segment's days, best AIC wins
+        point, lower, upper = forecast["point"], forecast["lower"], forecast["upper"]
+        state["forecast_sales"] = float(point[0])
+        state["forecast_lower"] = float(lower[0])
+        state["forecast_upper"] = float(upper[0])
+        state["forecast_model"] = forecast["model"]
+        state["forecast_path"] = [
+            {"day": (forecast["last_day"] + timedelta(step + 1)).isoformat(), "forecast": float(point[step]),
+             "lower": float(lower[step]), "upper": float(upper[step])}
+            for step in range(len(point))
+        ]
+        return state
+
+    # No history: if anomaly detected, predict return to average, else slight growth
     if state.get("anomaly", False):
         forecast = sql_avg * 1.1  # 10% growth prediction
     else:
         forecast = latest_sales * 1.05  # 5% growth prediction
-    
-    state["forecast_sales"] = forecast
+
+    # No interval without a fitted model: both bounds are the point forecast
+    state["forecast_sales"] = state["forecast_lower"] = state["forecast_upper"] = float(forecast)
+    state["forecast_model"] = "heuristic"
+    state["forecast_path"] = []
     return state
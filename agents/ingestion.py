@@ -0,0 +1,218 @@
+"""Streaming, memory-bounded document ingestion for the RAG index.
+
+Everything here is a generator: files are read in fixed-size blocks, turned
+into text pieces by a per-format loader, merged into chunks on the fly and
+grouped into fixed-size batches for embedding. Peak memory is bounded by the
+batch size and the largest single paragraph, not by the corpus size.
+
+For plain text the chunks are identical to
+``CharacterTextSplitter(separator="\\n\\n", chunk_size, chunk_overlap)``, so
+indexes built before streaming ingestion keep their chunk IDs.
+"""
+import os
+import csv
+import json
+import hashlib
+from collections import deque
+from html.parser import HTMLParser
+from itertools import islice
+
+SEPARATOR = "\n\n"
+BLOCK_SIZE = 64 * 1024
+
+
+def _iter_blocks(path, encoding="utf-8"):
+    with open(path, encoding=encoding, errors="replace") as f:
+        while True:
+            block = f.read(BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+
+def _split_stream(blocks, separator=SEPARATOR):
+    """``str.split(separator)`` over a stream of blocks, dropping empty pieces."""
+    buffer = ""
+    for block in blocks:
+        buffer += block
+        pieces = buffer.split(separator)
+        buffer = pieces.pop()
+        for piece in pieces:
+            if piece:
+                yield piece
+    if buffer:
+        yield buffer
+
+
+def load_text(path):
+    return _split_stream(_iter_blocks(path))
+
+
+def load_csv(path):
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        for row in csv.DictReader(f):
+            yield "; ".join(f"{key}: {value}" for key, value in row.items() if value)
+
+
+def _record_text(record):
+    if isinstance(record, dict):
+        for key in ("text", "content", "body"):
+            if isinstance(record.get(key), str):
+                return record[key]
+        return "; ".join(f"{key}: {value}" for key, value in record.items() if isinstance(value, (str, int, float)))
+    return str(record)
+
+
+def load_jsonl(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield _record_text(json.loads(line))
+
+
+def load_json(path):
+    # JSON documents are not streamable; they are expected to be small
+    with open(path, encoding="utf-8", errors="replace") as f:
+        data = json.load(f)
+    for record in data if isinstance(data, list) else [data]:
+        yield _record_text(record)
+
+
+class _HTMLTextParser(HTMLParser):
+    BLOCK_TAGS = {"p", "div", "li", "tr", "br", "section", "article", "h1", "h2", "h3", "h4", "h5", "h6"}
+    SKIP_TAGS = {"script", "style"}
+
+    def __init__(self):
+        super().__init__()
+        self.pieces = []
+        self._current = []
+        self._skip = 0
+
+    def _flush(self):
+        text = " ".join("".join(self._current).split())
+        if text:
+            self.pieces.append(text)
+        self._current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._current.append(data)
+
+
+def load_html(path):
+    parser = _HTMLTextParser()
+    for block in _iter_blocks(path):
+        parser.feed(block)
+        yield from parser.pieces
+        parser.pieces = []
+    parser.close()
+    parser._flush()
+    yield from parser.pieces
+
+
+def load_pdf(path):
+    from pypdf import PdfReader
+
+    for page in PdfReader(path).pages:
+        yield from _split_stream([page.extract_text() or ""])
+
+
+LOADERS = {
+    ".txt": load_text,
+    ".md": load_text,
+    ".rst": load_text,
+    ".log": load_text,
+    ".csv": load_csv,
+    ".jsonl": load_jsonl,
+    ".json": load_json,
+    ".html": load_html,
+    ".htm": load_html,
+}
+
+try:
+    import pypdf  # noqa: F401
+    LOADERS[".pdf"] = load_pdf
+except ImportError:
+    pass
+
+
+def is_supported(name):
+    return os.path.splitext(name)[1].lower() in LOADERS
+
+
+def iter_pieces(path):
+    """Text pieces (paragraphs, rows, records, ...) of one document, read lazily."""
+    return LOADERS[os.path.splitext(path)[1].lower()](path)
+
+
+def merge_pieces(pieces, chunk_size, chunk_overlap, separator=SEPARATOR):
+    """Streaming port of ``TextSplitter._merge_splits``: yields chunks as soon as they are full."""
+    separator_len = len(separator)
+    current = deque()
+    total = 0
+    for piece in pieces:
+        length = len(piece)
+        if total + length + (separator_len if current else 0) > chunk_size:
+            if current:
+                chunk = separator.join(current).strip()
+                if chunk:
+                    yield chunk
+                while total > chunk_overlap or (
+                    total + length + (separator_len if current else 0) > chunk_size and total > 0
+                ):
+                    total -= len(current[0]) + (separator_len if len(current) > 1 else 0)
+                    current.popleft()
+        current.append(piece)
+        total += length + (separator_len if len(current) > 1 else 0)
+    chunk = separator.join(current).strip()
+    if chunk:
+        yield chunk
+
+
+def iter_chunks(path, chunk_size, chunk_overlap):
+    return merge_pieces(iter_pieces(path), chunk_size, chunk_overlap)
+
+
+def iter_chunk_ids(source, chunks):
+    """Pair each chunk with a stable ID derived from the source name and chunk text.
+
+    Identical text keeps its ID across edits, so only genuinely new chunks are
+    embedded. Repeated chunks within one file get an occurrence suffix.
+    """
+    seen = {}
+    for text in chunks:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        yield f"{source}:{digest}" + (f"-{n}" if n else ""), text
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -1,23 +1,34 @@
+import os
+from datetime import datetime
+
+import rolling_stats
+from agents.log_writer import get_writer
+
+LEARNING_LOG = os.getenv("LEARNING_LOG_PATH", "learning_log.jsonl")
+
+
+def learning_log_stats():
+    """Queue / write / rotation counters of the learning log writer."""
+    return get_writer(LEARNING_LOG).stats()
+
+
 def learning_agent(state):
     """Learning agent for model improvement and feedback."""
-    # Log the workflow execution for continuous improvement
-    import json
-    from datetime import datetime
-    
-    try:
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "latest_sales": state.get("latest_sales"),
-            "anomaly": state.get("anomaly"),
-            "z_score": state.get("z_score"),
-            "forecast_sales": state.get("forecast_sales"),
-            "decision": state.get("decision")
-        }
-        
-        # Append to learning log
-        with open("learning_log.jsonl", "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
-    except Exception as e:
-        pass
-    
+    # Log the workflow execution for continuous improvement; the log writer
+    # thread does the file I/O, this only queues the entry
+    forecast_path = state.get("forecast_path") or []
+    get_writer(LEARNING_LOG).write({
+        "timestamp": datetime.now().isoformat(),
+        "segment": rolling_stats.segment_key(state.get("product"), state.get("region")),
+        "latest_sales": state.get("latest_sales"),
+        "anomaly": state.get("anomaly"),
+        "z_score": state.get("z_score"),
+        "forecast_sales": state.get("forecast_sales"),
+        "forecast_model": state.get("forecast_model"),
+        # Day the forecast is for (model forecasts only), to score it once that day is in
+        "forecast_day": forecast_path[0]["day"] if forecast_path else None,
+        "decision_code": state.get("decision_code"),
+        "workflow_path": state.get("workflow_path"),
+        "decision": state.get("decision")
+    })
     return state
@@ -0,0 +1,271 @@
+"""Background writer for append-only JSON-lines logs.
+
+``LogWriter.write(record)`` puts the record on a bounded queue and returns;
+a dedicated thread drains the queue, encodes the records and appends each
+batch with a single write (group flush), so the caller never opens, writes
+or waits on the file. When the queue is full the record is dropped and
+counted (``LOG_QUEUE_BLOCK=1`` makes writers wait instead).
+
+Durability follows ``LOG_FSYNC``:
+
+- ``always``: fsync after every batch,
+- ``interval``: fsync at most every ``LOG_FSYNC_INTERVAL`` seconds (default),
+- ``never``: leave it to the OS.
+
+The active file is rotated once it reaches ``LOG_MAX_BYTES`` or has been
+open for ``LOG_MAX_AGE`` seconds: it is renamed to
+``<name>.<YYYYmmdd-HHMMSS-ffffff><ext>`` and gzip-compressed in the
+background; ``segments`` lists closed and active files in write order.
+"""
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import threading
+from datetime import datetime
+
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Records appended per write call at most
+BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "512"))
+FSYNC = os.getenv("LOG_FSYNC", "interval")
+FSYNC_INTERVAL = float(os.getenv("LOG_FSYNC_INTERVAL", "1.0"))
+# Rotation thresholds of the active file (0 disables)
+MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(64 * 2**20)))
+MAX_AGE = float(os.getenv("LOG_MAX_AGE", "86400"))
+# Wait for queue space instead of dropping records
+BLOCK = os.getenv("LOG_QUEUE_BLOCK", "0") == "1"
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+_STOP = object()
+_lock = threading.Lock()
+_writers = {}
+
+
+def segments(path):
+    """Closed segments (``.gz`` or not yet compressed) oldest first, then the active file if present."""
+    root, ext = os.path.splitext(path)
+    closed = {}
+    for name in glob.glob(glob.escape(root) + ".*" + ext) + glob.glob(glob.escape(root) + ".*" + ext + ".gz"):
+        stem = name[:-3] if name.endswith(".gz") else name
+        # Prefer the compressed copy once compression finished
+        if stem not in closed or name.endswith(".gz"):
+            closed[stem] = name
+    files = [closed[stem] for stem in sorted(closed)]
+    return files + [path] if os.path.exists(path) else files
+
+
+def _compress(path):
+    with open(path, "rb") as src, gzip.open(path + ".gz.tmp", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(path + ".gz.tmp", path + ".gz")
+    os.remove(path)
+
+
+class LogWriter:
+    """Queue-fed JSON-lines appender with group flush, fsync policy and rotation."""
+
+    def __init__(self, path, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, fsync=FSYNC,
+                 fsync_interval=FSYNC_INTERVAL, max_bytes=MAX_BYTES, max_age=MAX_AGE, block=BLOCK, compress=True):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}; use one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.block = block
+        self.compress = compress
+        self.closed = False
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.rotations = 0
+        self.errors = 0
+        self.last_error = None
+        self._queue = queue.Queue(queue_size)
+        self._counter_lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+        self._compressors = []
+        self._thread = threading.Thread(target=self._run, name=f"log-writer:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        """Queue one JSON-serializable record; ``False`` if the queue was full and it was dropped."""
+        try:
+            if self.block:
+                self._queue.put(record)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every record queued before the call is written (and fsynced unless ``never``)."""
+        if self.closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Write what is queued, close the file and wait for pending compression."""
+        if not self.closed:
+            self.closed = True
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        for compressor in self._compressors:
+            compressor.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "fsyncs": self.fsyncs,
+            "rotations": self.rotations,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval if self.fsync == "interval" else 1.0)
+            except queue.Empty:
+                self._maintain()
+                continue
+            records, waiting = [], []
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiting.append(item)
+                else:
+                    records.append(item)
+                if len(records) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if records:
+                self._write_batch(records)
+            if waiting or stop:
+                self._sync()
+            self._maintain()
+            for event in waiting:
+                event.set()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _error(self, error):
+        self.errors += 1
+        self.last_error = repr(error)
+
+    def _write_batch(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(json.dumps(record, default=str))
+            except (TypeError, ValueError) as e:
+                self._error(e)
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        try:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # Unbuffered: each batch is one write() call
+                self._file = open(self.path, "ab", buffering=0)
+                self._size = os.fstat(self._file.fileno()).st_size
+                self._opened_at = time.monotonic()
+            self._file.write(data)
+        except OSError as e:
+            self._error(e)
+            return
+        self._size += len(data)
+        self._dirty = True
+        self.written += len(lines)
+        self.batches += 1
+        if self.fsync == "always":
+            self._sync()
+
+    def _sync(self):
+        if self._file is None or not self._dirty or self.fsync == "never":
+            return
+        try:
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            self._error(e)
+            return
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+        self.fsyncs += 1
+
+    def _maintain(self):
+        now = time.monotonic()
+        if self._dirty and self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval:
+            self._sync()
+        if self._file is not None and self._size and (
+                (self.max_bytes and self._size >= self.max_bytes)
+                or (self.max_age and now - self._opened_at >= self.max_age)):
+            self._rotate()
+
+    def _rotate(self):
+        self._sync()
+        self._file.close()
+        self._file = None
+        root, ext = os.path.splitext(self.path)
+        closed = f"{root}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{ext}"
+        try:
+            os.replace(self.path, closed)
+        except OSError as e:
+            self._error(e)
+            return
+        self.rotations += 1
+        if self.compress:
+            self._compressors = [compressor for compressor in self._compressors if compressor.is_alive()]
+            compressor = threading.Thread(target=_compress, args=(closed,), name="log-compress", daemon=True)
+            compressor.start()
+            self._compressors.append(compressor)
+
+
+def get_writer(path, **kwargs):
+    """Process-wide writer of ``path``, started on first use."""
+    key = os.path.abspath(path)
+    with _lock:
+        writer = _writers.get(key)
+        if writer is None or writer.closed:
+            writer = _writers[key] = LogWriter(path, **kwargs)
+        return writer
+
+
+def close_all(timeout=5.0):
+    with _lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close(timeout)
+
+
+# Daemon threads die with the interpreter; write out what is queued first
+atexit.register(close_all)
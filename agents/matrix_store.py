@@ -0,0 +1,165 @@
+"""In-process vector store backed by a single contiguous float32 matrix.
+
+Used with local embedders: vectors are L2-normalised, so one matrix-vector
+product gives cosine scores for every chunk and ``np.argpartition`` selects the
+top-k without sorting the whole corpus. Rows are kept densely packed, deletes
+move the last row into the freed slot.
+"""
+import os
+import json
+
+import numpy as np
+# ========== LANGCHAIN ==========
+# LANGCHAIN: Vector store interface and document type
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+# ==============================
+
+from agents.embedders import embed_matrix
+
+VECTORS_FILE = "vectors.npy"
+DOCS_FILE = "docs.json"
+
+
+class MatrixVectorStore(VectorStore):
+    """Exact cosine-similarity search over a dense NumPy matrix."""
+
+    def __init__(self, embedding, dim=None):
+        self.embedding = embedding
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._rows = {}
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    @property
+    def vectors(self):
+        """View of the live rows, shape ``(len(self), dim)``."""
+        return self._matrix[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, extra, dim):
+        if self._matrix.shape[1] != dim:
+            if self._size:
+                raise ValueError(f"Vector dimension {dim} does not match index dimension {self._matrix.shape[1]}")
+            self._matrix = np.zeros((0, dim), dtype=np.float32)
+        needed = self._size + extra
+        if needed > self._matrix.shape[0]:
+            capacity = max(needed, 2 * self._matrix.shape[0], 64)
+            grown = np.zeros((capacity, dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    def add_vectors(self, vectors, texts, metadatas=None, ids=None):
+        """Add pre-computed (normalised) vectors; existing IDs are replaced."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(self._size + i) for i in range(len(texts))]
+        replaced = [id_ for id_ in ids if id_ in self._rows]
+        if replaced:
+            self.delete(replaced)
+
+        self._reserve(len(texts), vectors.shape[1])
+        start = self._size
+        self._matrix[start:start + len(texts)] = vectors
+        for offset, (id_, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            self._rows[id_] = start + offset
+            self._ids.append(id_)
+            self._texts.append(text)
+            self._metadatas.append(metadata)
+        self._size += len(texts)
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(embed_matrix(self.embedding, texts), texts, metadatas, ids)
+
+    def delete(self, ids=None, **kwargs):
+        if ids is None:
+            raise ValueError("No ids provided to delete.")
+        for id_ in ids:
+            row = self._rows.pop(id_)
+            last = self._size - 1
+            if row != last:
+                # Keep rows packed: move the last row into the freed slot
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._texts[row] = self._texts[last]
+                self._metadatas[row] = self._metadatas[last]
+                self._rows[self._ids[row]] = row
+            self._ids.pop()
+            self._texts.pop()
+            self._metadatas.pop()
+            self._size = last
+        return True
+
+    def _query_vector(self, query):
+        return embed_matrix(self.embedding, [query])[0]
+
+    def search_vector(self, vector, k=4):
+        """Return ``(rows, scores)`` of the ``k`` best matches, best first."""
+        if not self._size or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self._matrix[:self._size] @ np.asarray(vector, dtype=np.float32)
+        k = min(k, self._size)
+        if k < self._size:
+            rows = np.argpartition(scores, self._size - k)[self._size - k:]
+        else:
+            rows = np.arange(self._size)
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return rows, scores[rows]
+
+    def _document(self, row):
+        return Document(page_content=self._texts[row], metadata=self._metadatas[row], id=self._ids[row])
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        rows, scores = self.search_vector(self._query_vector(query), k)
+        return [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        """Search with a query vector embedded elsewhere (normalised here)."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        rows, scores = self.search_vector(vector / norm if norm else vector, k)
+        return [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: min(1.0, max(0.0, score))
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def get_by_ids(self, ids):
+        return [self._document(self._rows[id_]) for id_ in ids if id_ in self._rows]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def save_local(self, folder_path):
+        os.makedirs(folder_path, exist_ok=True)
+        np.save(os.path.join(folder_path, VECTORS_FILE), self.vectors)
+        with open(os.path.join(folder_path, DOCS_FILE), "w") as f:
+            json.dump({"ids": self._ids, "texts": self._texts, "metadatas": self._metadatas}, f)
+
+    @classmethod
+    def load_local(cls, folder_path, embeddings, **kwargs):
+        vectors = np.load(os.path.join(folder_path, VECTORS_FILE))
+        with open(os.path.join(folder_path, DOCS_FILE)) as f:
+            docs = json.load(f)
+        store = cls(embeddings, dim=vectors.shape[1])
+        store.add_vectors(vectors, docs["texts"], docs["metadatas"], docs["ids"])
+        return store
@@ -1,14 +1,92 @@
-import numpy as np
+import os
 
-def monitor_agent(state):
-    """Monitor agent for tracking system state and detecting anomalies."""
+import rolling_stats
+
+# Z-score bands, matching the thresholds used by the decision agent
+Z_BANDS = ((3.0, "critical"), (2.0, "significant"), (1.5, "moderate"))
+
+
+def z_score_band(z_score):
+    """Bucket a z-score by magnitude: critical, significant, moderate or normal."""
+    magnitude = abs(z_score or 0)
+    for bound, band in Z_BANDS:
+        if magnitude > bound:
+            return band
+    return "normal"
+
+
+# Rolling window (days) the latest sales are compared against
+BASELINE_WINDOW = int(os.getenv("MONITOR_BASELINE_WINDOW", "30"))
+# |z| above which sales are flagged when a real baseline is available
+ANOMALY_Z = float(os.getenv("MONITOR_ANOMALY_Z", "2.0"))
+# Fallback baseline when sales.db has no history for the segment
+DEFAULT_MEAN = 100000
+DEFAULT_STD = 30000
+
+
+def _usable(baseline):
+    return baseline if baseline and baseline.std > 0 else None
+
+
+def get_baseline(product=None, region=None, window=BASELINE_WINDOW):
+    """Precomputed rolling baseline of the segment, or ``None`` if there is none."""
+    try:
+        baseline = rolling_stats.baseline(rolling_stats.segment_key(product, region), window)
+    except Exception:
+        # Rolling windows not installed
+        return None
+    return _usable(baseline)
+
+
+async def aget_baseline(product=None, region=None, window=BASELINE_WINDOW):
+    """``get_baseline`` for coroutines."""
+    try:
+        baseline = await rolling_stats.abaseline(rolling_stats.segment_key(product, region), window)
+    except Exception:
+        return None
+    return _usable(baseline)
+
+
+def _caller_baseline(state, window):
+    # Baseline supplied by the caller (batch monitor), no lookup
+    if state.get("baseline_std"):
+        return rolling_stats.Baseline(state.get("baseline_segment") or "caller", window, window,
+                                      state.get("baseline_mean", 0), state["baseline_std"])
+    return None
+
+
+def _score(state, baseline):
     latest_sales = state.get("latest_sales", 100000)
-    
-    # Simple anomaly detection: check if sales are significantly different from expected
-    # For demo: flag as anomaly if sales < 50000 or > 200000
-    anomaly = latest_sales < 50000 or latest_sales > 200000
-    z_score = (latest_sales - 100000) / 30000 if latest_sales >= 0 else 0
-    
+    if baseline:
+        # Compare with the segment's rolling daily mean/std (O(1) lookup)
+        z_score = (latest_sales - baseline.mean) / baseline.std if latest_sales >= 0 else 0
+        anomaly = abs(z_score) > state.get("anomaly_threshold", ANOMALY_Z)
+        state["baseline_mean"] = baseline.mean
+        state["baseline_std"] = baseline.std
+        state["baseline_segment"] = f"{baseline.segment}:{baseline.window}d"
+    else:
+        # No history: flag as anomaly if sales < 50000 or > 200000
+        anomaly = latest_sales < 50000 or latest_sales > 200000
+        z_score = (latest_sales - DEFAULT_MEAN) / DEFAULT_STD if latest_sales >= 0 else 0
+        state["baseline_mean"] = DEFAULT_MEAN
+        state["baseline_std"] = DEFAULT_STD
+        state["baseline_segment"] = "default"
+
     state["anomaly"] = anomaly
     state["z_score"] = z_score
     return state
+
+
+def monitor_agent(state):
+    """Monitor agent for tracking system state and detecting anomalies."""
+    window = state.get("baseline_window") or BASELINE_WINDOW
+    baseline = _caller_baseline(state, window) or get_baseline(state.get("product"), state.get("region"), window)
+    return _score(state, baseline)
+
+
+async def amonitor_agent(state):
+    """``monitor_agent`` for the async workflow: the baseline is read without blocking the loop."""
+    window = state.get("baseline_window") or BASELINE_WINDOW
+    baseline = _caller_baseline(state, window) or await aget_baseline(state.get("product"), state.get("region"),
+                                                                      window)
+    return _score(state, baseline)
@@ -1,62 +1,153 @@
 import os
+import asyncio
 from dotenv import load_dotenv
-# ========== LANGCHAIN ==========
-# LANGCHAIN: Vector database for semantic search
-from langchain_community.vectorstores import FAISS
-# LANGCHAIN: OpenAI embeddings - converts text to vectors
-from langchain_openai import OpenAIEmbeddings
-# LANGCHAIN: Text chunking utility
-from langchain_text_splitters import CharacterTextSplitter
-# LANGCHAIN: Document loader for text files
-from langchain_community.document_loaders import TextLoader
-# ==============================
+from agents.bm25_index import reciprocal_rank_fusion
+from agents.embedders import get_embedder
+from agents.monitor_agent import z_score_band
+from agents.rag_index import get_keyword_index, get_vector_store, index_generation
+from agents.retrieval_cache import TTLCache
 
 # Load environment variables from .env file (specify path relative to parent directory)
 from pathlib import Path
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+# "hybrid" fuses BM25 and dense rankings, "dense" uses the vector index only
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL", "hybrid")
+# Candidates taken from each ranking before fusion
+FUSION_CANDIDATES = max(4 * TOP_K, 20)
+
+# Retrieved passages per (normalized query, k, index generation)
+_results_cache = TTLCache(
+    maxsize=int(os.getenv("RAG_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("RAG_CACHE_TTL", "300")),
+)
+
+QUERY_TEMPLATES = {
+    "decline": "{band} sales decline reasons and recovery strategies",
+    "spike": "{band} sales increase drivers and how to capitalize on growth",
+    "steady": "sales performance optimization and customer retention strategies",
+}
+
+
+def build_query(state):
+    """Derive the retrieval query from anomaly direction, z-score band and segment."""
+    z_score = state.get("z_score") or 0
+    band = z_score_band(z_score)
+    if not state.get("anomaly") and band == "normal":
+        direction = "steady"
+    else:
+        direction = "decline" if z_score < 0 else "spike"
+    query = QUERY_TEMPLATES[direction].format(band="" if band == "normal" else band)
+
+    for key in ("product", "region"):
+        if state.get(key):
+            query += f" {key} {state[key]}"
+    return " ".join(query.split())
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def _dense(db, query, k, vector=None):
+    if vector is None:
+        # ========== LANGCHAIN ==========
+        # LANGCHAIN: Perform semantic similarity search
+        return db.similarity_search_with_relevance_scores(query, k=k)
+        # ==============================
+    # Query already embedded (async path): search only, same relevance scale
+    relevance = db._select_relevance_score_fn()
+    return [(doc, relevance(score)) for doc, score in db.similarity_search_with_score_by_vector(vector, k=k)]
+
+
+def retrieve(db, query, k=TOP_K, keywords=None, mode=RETRIEVAL_MODE, vector=None):
+    """Top-k ``(Document, score)`` pairs; hybrid mode fuses dense and BM25 ranks with RRF.
+
+    ``vector`` is the query embedding when the caller computed it already.
+    """
+    if db is None:
+        return []
+    if mode != "hybrid" or keywords is None or not len(keywords):
+        return _dense(db, query, k, vector)
+
+    # Dense candidates from the vector index
+    dense = _dense(db, query, FUSION_CANDIDATES, vector)
+    sparse = keywords.search(query, k=FUSION_CANDIDATES)
+    fused = reciprocal_rank_fusion([[doc.id for doc, _ in dense], [doc_id for doc_id, _ in sparse]])[:k]
+
+    docs = {doc.id: doc for doc, _ in dense}
+    missing = [doc_id for doc_id, _ in fused if doc_id not in docs]
+    if missing:
+        docs.update((doc.id, doc) for doc in db.get_by_ids(missing))
+    return [(docs[doc_id], score) for doc_id, score in fused if doc_id in docs]
+
+
+def rag_cache_stats():
+    """Hit/miss counters of the retrieved-passage cache, for tuning RAG_CACHE_TTL."""
+    return _results_cache.stats()
+
+
+def _set_results(state, query, results):
+    state["rag_query"] = query
+    state["rag_results"] = [dict(result) for result in results]
+    state["rag_insight"] = results[0]["text"] if results else "No specific insights found."
+
+
+def _passages(hits):
+    return [
+        {"text": doc.page_content, "source": doc.metadata.get("source", ""), "score": round(float(score), 4)}
+        for doc, score in hits
+    ]
+
+
 def rag_agent(state):
     docs_path = "data/knowledge_docs"
     if not os.path.isdir(docs_path) or not os.listdir(docs_path):
         state["rag_insight"] = "No knowledge documents found."
         return state
 
-    # Get API key from environment
-    api_key = os.getenv("OPENAI_API_KEY")
+    try:
+        # OpenAI embeddings when OPENAI_API_KEY is set, offline hashing embeddings otherwise
+        embeddings = get_embedder()
+        # Index is loaded from disk once per process and rebuilt only when the corpus changes
+        db = get_vector_store(embeddings, docs_path)
+
+        query = build_query(state)
+        cache_key = (normalize_query(query), TOP_K, RETRIEVAL_MODE, index_generation())
+        results = _results_cache.get(cache_key)
+        if results is None:
+            results = _passages(retrieve(db, query, TOP_K, get_keyword_index()))
+            _results_cache.set(cache_key, results)
+        _set_results(state, query, results)
+    except Exception as e:
+        state["rag_insight"] = f"RAG Search: {str(e)[:200]}"
     
-    if not api_key:
-        state["rag_insight"] = "RAG agent: Searching knowledge base... (API key required for embeddings)"
+    return state
+
+
+async def arag_agent(state):
+    """``rag_agent`` for the async workflow: the query embedding is awaited (async client)."""
+    docs_path = "data/knowledge_docs"
+    if not os.path.isdir(docs_path) or not os.listdir(docs_path):
+        state["rag_insight"] = "No knowledge documents found."
         return state
-    
-    try:
-        # ========== LANGCHAIN ==========
-        # LANGCHAIN: Create embeddings using OpenAI API
-        embeddings = OpenAIEmbeddings(api_key=api_key)
-        # ==============================
-        docs = []
-        
-        for file in os.listdir(docs_path):
-            if file.endswith(".txt"):
-                # ========== LANGCHAIN ==========
-                # LANGCHAIN: Load text files using TextLoader
-                loader = TextLoader(os.path.join(docs_path, file))
-                # ==============================
-                docs.extend(loader.load())
 
-        # ========== LANGCHAIN ==========
-        # LANGCHAIN: Split documents into chunks (500 chars, 50 overlap)
-        splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        chunks = splitter.split_documents(docs)
+    try:
+        embeddings = get_embedder()
+        # Warm calls return the in-memory index; a (re)load reads and embeds files
+        db = await asyncio.to_thread(get_vector_store, embeddings, docs_path)
 
-        # LANGCHAIN: Create FAISS vector database from chunks
-        db = FAISS.from_documents(chunks, embeddings)
-        # LANGCHAIN: Perform semantic similarity search
-        results = db.similarity_search("sales decline reasons", k=1)
-        # ==============================
-        
-        state["rag_insight"] = results[0].page_content if results else "No specific insights found."
+        query = build_query(state)
+        cache_key = (normalize_query(query), TOP_K, RETRIEVAL_MODE, index_generation())
+        results = _results_cache.get(cache_key)
+        if results is None:
+            vector = await embeddings.aembed_query(query)
+            # The search itself is in-process (NumPy / FAISS)
+            results = _passages(retrieve(db, query, TOP_K, get_keyword_index(), vector=vector))
+            _results_cache.set(cache_key, results)
+        _set_results(state, query, results)
     except Exception as e:
         state["rag_insight"] = f"RAG Search: {str(e)[:200]}"
-    
     return state
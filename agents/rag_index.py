@@ -0,0 +1,476 @@
+"""Persistent, incrementally maintained vector index for the RAG agent.
+
+The index is saved to disk together with a manifest that records, for every
+document in ``data/knowledge_docs``, its size, mtime, content hash and the IDs
+of the chunks it produced. ``update_index`` compares the corpus against the
+manifest and only touches what changed: unchanged files are skipped on their
+stat alone, edited files are re-split and only chunks with new text are
+embedded, and chunks of edited or removed files that no longer exist are
+deleted from the index.
+
+Remote embedders are stored in FAISS, local ones in a ``MatrixVectorStore``;
+``RAG_INDEX_TYPE`` switches large corpora to an approximate FAISS index
+(see ``agents.faiss_index``). A BM25 keyword index over the same chunk IDs is maintained and saved next to
+the vector index so the RAG agent can run hybrid retrieval.
+
+Documents are streamed through ``agents.ingestion``: chunks are produced
+lazily and embedded in batches of ``BATCH_SIZE``, so memory stays flat however
+large the corpus is. For large corpora ``build_index`` rebuilds the whole index
+offline, sharding the documents across a process pool.
+"""
+import os
+import json
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+
+import numpy as np
+# ========== LANGCHAIN ==========
+# LANGCHAIN: Vector database for semantic search
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+# ==============================
+
+from agents.bm25_index import BM25Index
+from agents.embedders import embed_matrix
+from agents.faiss_index import INDEX_TYPE, INDEX_TYPES, ApproximateFAISS
+from agents.ingestion import file_digest, is_supported, iter_chunk_ids, iter_chunks
+from agents.matrix_store import MatrixVectorStore
+
+DOCS_PATH = "data/knowledge_docs"
+INDEX_PATH = os.getenv("RAG_INDEX_PATH", "data/vector_store")
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 2
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# Chunks embedded and added to the index per batch
+BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+# How often (seconds) a warm process re-stats the corpus for changes
+CHECK_INTERVAL = float(os.getenv("RAG_INDEX_CHECK_INTERVAL", "5"))
+# Vector store: "auto" (NumPy matrix for local embedders, FAISS otherwise), "faiss" or "matrix".
+# A RAG_INDEX_TYPE other than "flat" makes "auto" pick FAISS as well.
+VECTOR_STORE = os.getenv("RAG_VECTOR_STORE", "auto")
+# Shards per worker in parallel builds, so uneven documents still balance out
+SHARDS_PER_WORKER = 4
+
+_lock = threading.Lock()
+_db = None
+# (docs_path, index_path, embedding model) the cached _db was loaded for
+_key = None
+_signature = None
+_last_check = 0.0
+_generation = 0
+# Keyword index per index directory, kept in step with the vector index
+_keyword_indexes = {}
+
+
+@dataclass
+class IndexUpdate:
+    """Summary of what an ``update_index`` call changed."""
+    added: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    unchanged: int = 0
+    chunks_seen: int = 0
+    chunks_embedded: int = 0
+    chunks_deleted: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def dirty(self):
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def chunks_per_second(self):
+        return self.chunks_seen / self.seconds if self.seconds else 0.0
+
+
+def _list_documents(docs_path):
+    return sorted(
+        (entry for entry in os.scandir(docs_path)
+         if entry.is_file() and is_supported(entry.name)),
+        key=lambda entry: entry.name,
+    )
+
+
+def corpus_signature(docs_path=DOCS_PATH):
+    """Cheap (name, size, mtime) signature used to skip re-hashing unchanged corpora."""
+    signature = []
+    for entry in _list_documents(docs_path):
+        st = entry.stat()
+        signature.append((entry.name, st.st_size, st.st_mtime_ns))
+    return tuple(signature)
+
+
+def _embedding_model(embeddings):
+    return getattr(embeddings, "model", type(embeddings).__name__)
+
+
+def store_class(embeddings):
+    """Local embedders are searched in-process with NumPy, remote ones through FAISS."""
+    if INDEX_TYPE not in INDEX_TYPES:
+        raise ValueError(f"Unknown RAG_INDEX_TYPE {INDEX_TYPE!r}; expected one of {', '.join(INDEX_TYPES)}")
+    faiss_class = FAISS if INDEX_TYPE == "flat" else ApproximateFAISS
+    if VECTOR_STORE == "faiss":
+        return faiss_class
+    if VECTOR_STORE == "matrix":
+        return MatrixVectorStore
+    return MatrixVectorStore if getattr(embeddings, "local", False) and INDEX_TYPE == "flat" else faiss_class
+
+
+def add_vectors(db, embeddings, vectors, texts, metadatas, ids):
+    """Add pre-computed vectors to ``db``, creating the store on first use; returns the store."""
+    if db is None:
+        if store_class(embeddings) is MatrixVectorStore:
+            db = MatrixVectorStore(embeddings, dim=vectors.shape[1])
+        else:
+            import faiss
+
+            # ========== LANGCHAIN ==========
+            # LANGCHAIN: Empty FAISS store, filled below without re-embedding
+            db = store_class(embeddings)(embeddings, faiss.IndexFlatL2(vectors.shape[1]), InMemoryDocstore(), {})
+            # ==============================
+    if isinstance(db, MatrixVectorStore):
+        db.add_vectors(vectors, texts, metadatas, ids)
+    else:
+        # ========== LANGCHAIN ==========
+        # LANGCHAIN: Add (text, vector) pairs under the chunks' stable IDs
+        db.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+        # ==============================
+    return db
+
+
+def _settings(embeddings):
+    settings = {
+        "version": MANIFEST_VERSION,
+        "store": store_class(embeddings).__name__,
+        "embedding_model": _embedding_model(embeddings),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+    if store_class(embeddings) is ApproximateFAISS:
+        settings["index_type"] = INDEX_TYPE
+    return settings
+
+
+def _read_manifest(index_path):
+    try:
+        with open(os.path.join(index_path, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_index(db, manifest, index_path, keywords=None):
+    os.makedirs(index_path, exist_ok=True)
+    if isinstance(db, ApproximateFAISS):
+        db.maybe_convert()
+    if db is not None:
+        db.save_local(index_path)
+    if keywords is not None:
+        keywords.save(index_path)
+    # The manifest is written last so a partially saved index is never trusted
+    tmp_path = os.path.join(index_path, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(index_path, MANIFEST_FILE))
+
+
+def _load_index(embeddings, index_path):
+    """Load the saved index and manifest if they were built with the current settings."""
+    manifest = _read_manifest(index_path)
+    if not manifest or manifest.get("settings") != _settings(embeddings):
+        return None, None
+    if not any(doc["chunk_ids"] for doc in manifest["documents"].values()):
+        return None, manifest
+    try:
+        # ========== LANGCHAIN ==========
+        # LANGCHAIN: Reload the saved index (we wrote the pickle ourselves)
+        db = store_class(embeddings).load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        # ==============================
+    except Exception:
+        return None, None
+    return db, manifest
+
+
+class _BatchWriter:
+    """Buffers new chunks and embeds/adds them to the index BATCH_SIZE at a time."""
+
+    def __init__(self, db, keywords, embeddings, update, batch_size=BATCH_SIZE):
+        self.db = db
+        self.keywords = keywords
+        self.embeddings = embeddings
+        self.update = update
+        self.batch_size = batch_size
+        self._texts, self._metadatas, self._ids = [], [], []
+
+    def add(self, chunk_id, text, metadata):
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        self._ids.append(chunk_id)
+        if len(self._texts) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._texts:
+            return
+        # ========== LANGCHAIN ==========
+        # LANGCHAIN: Embed the batch and add it under the chunks' stable IDs
+        if self.db is None:
+            self.db = store_class(self.embeddings).from_texts(
+                self._texts, self.embeddings, metadatas=self._metadatas, ids=self._ids)
+        else:
+            self.db.add_texts(self._texts, metadatas=self._metadatas, ids=self._ids)
+        # ==============================
+        self.keywords.add(self._ids, self._texts)
+        self.update.chunks_embedded += len(self._texts)
+        self.update.batches += 1
+        self._texts, self._metadatas, self._ids = [], [], []
+
+    def delete(self, ids):
+        if not ids:
+            return
+        if self.db is not None:
+            # ========== LANGCHAIN ==========
+            # LANGCHAIN: Drop vectors of chunks that no longer exist
+            self.db.delete(ids)
+            # ==============================
+        self.keywords.delete(ids)
+        self.update.chunks_deleted += len(ids)
+
+
+def _load_keywords(db, manifest, index_path):
+    """Saved keyword index, rebuilt from the vector store's texts if missing or out of step."""
+    keywords = BM25Index.load(index_path)
+    ids = [chunk_id for doc in manifest["documents"].values() for chunk_id in doc["chunk_ids"]]
+    if keywords is not None and len(keywords) == len(ids) and all(chunk_id in keywords for chunk_id in ids):
+        return keywords
+    keywords = BM25Index()
+    if db is not None and ids:
+        docs = db.get_by_ids(ids)
+        keywords.add([doc.id for doc in docs], [doc.page_content for doc in docs])
+    return keywords
+
+
+def get_keyword_index(index_path=INDEX_PATH):
+    """BM25 index matching the vector index last loaded or updated for ``index_path``."""
+    return _keyword_indexes.get(index_path)
+
+
+_worker_embeddings = None
+
+
+def _init_worker(embeddings):
+    global _worker_embeddings
+    _worker_embeddings = embeddings
+
+
+def _embed_shard(paths, batch_size):
+    """Worker process: chunk, embed and keyword-index one shard of documents."""
+    records = {}
+    ids, texts, metadatas = [], [], []
+    for path in paths:
+        name = os.path.basename(path)
+        st = os.stat(path)
+        chunk_ids = []
+        for chunk_id, text in iter_chunk_ids(name, iter_chunks(path, CHUNK_SIZE, CHUNK_OVERLAP)):
+            chunk_ids.append(chunk_id)
+            ids.append(chunk_id)
+            texts.append(text)
+            metadatas.append({"source": path, "chunk_id": chunk_id})
+        records[name] = {
+            "sha256": file_digest(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "chunk_ids": chunk_ids,
+        }
+    blocks = [embed_matrix(_worker_embeddings, texts[start:start + batch_size])
+              for start in range(0, len(texts), batch_size)]
+    vectors = np.concatenate(blocks) if blocks else None
+    keywords = BM25Index()
+    keywords.add(ids, texts)
+    return records, ids, texts, metadatas, vectors, keywords, len(blocks)
+
+
+def _shards(entries, n_shards):
+    """Split documents (in name order) into contiguous runs of roughly equal size in bytes."""
+    sizes = [entry.stat().st_size for entry in entries]
+    target = max(sum(sizes), 1) / n_shards
+    shards, current, total = [], [], 0
+    for entry, size in zip(entries, sizes):
+        current.append(entry.path)
+        total += size
+        if total >= target * (len(shards) + 1):
+            shards.append(current)
+            current = []
+    if current:
+        shards.append(current)
+    return shards
+
+
+def build_index(embeddings, docs_path=DOCS_PATH, index_path=INDEX_PATH, workers=None, batch_size=BATCH_SIZE):
+    """Rebuild the whole index from scratch with documents sharded across ``workers`` processes.
+
+    Each worker parses, chunks and embeds its shard and builds a partial
+    keyword index; the parent merges the vectors and keyword indexes in
+    document order, so the result matches a sequential ``update_index(full=True)``
+    with the same content-derived chunk IDs. Needs a local embedder, which
+    is re-created in every worker. Returns ``(db, IndexUpdate)``.
+    """
+    if not getattr(embeddings, "local", False):
+        raise ValueError("Parallel builds need a local embedder (RAG_EMBEDDER=local)")
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    update = IndexUpdate()
+    manifest = {"settings": _settings(embeddings), "documents": {}}
+    db, keywords = None, BM25Index()
+    shards = _shards(_list_documents(docs_path), workers * SHARDS_PER_WORKER)
+
+    if workers == 1:
+        _init_worker(embeddings)
+        pool = None
+        results = map(_embed_shard, shards, repeat(batch_size))
+    else:
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(embeddings,))
+        results = pool.map(_embed_shard, shards, repeat(batch_size))
+    try:
+        for records, ids, texts, metadatas, vectors, shard_keywords, batches in results:
+            manifest["documents"].update(records)
+            update.added.extend(records)
+            if ids:
+                db = add_vectors(db, embeddings, vectors, texts, metadatas, ids)
+                keywords.extend(shard_keywords)
+            update.chunks_seen += len(ids)
+            update.chunks_embedded += len(ids)
+            update.batches += batches
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    _save_index(db, manifest, index_path, keywords)
+    _keyword_indexes[index_path] = keywords
+    update.seconds = time.perf_counter() - started
+    return db, update
+
+
+def update_index(embeddings, docs_path=DOCS_PATH, index_path=INDEX_PATH, db=None, full=False,
+                 batch_size=BATCH_SIZE):
+    """Bring the on-disk index in line with ``docs_path`` and return ``(db, IndexUpdate)``.
+
+    ``db`` may be an already loaded index to update in place; otherwise it is
+    loaded from ``index_path``. ``full=True`` discards the saved index and
+    re-embeds everything. The keyword index is updated with the same chunks.
+    """
+    started = time.perf_counter()
+    update = IndexUpdate()
+    manifest = None
+    keywords = None
+    if not full:
+        if db is not None:
+            manifest = _read_manifest(index_path)
+            if not manifest or manifest.get("settings") != _settings(embeddings):
+                db, manifest = None, None
+            else:
+                keywords = _keyword_indexes.get(index_path)
+        else:
+            db, manifest = _load_index(embeddings, index_path)
+    if manifest is None:
+        db = None
+        manifest = {"settings": _settings(embeddings), "documents": {}}
+    if keywords is None:
+        keywords = _load_keywords(db, manifest, index_path)
+
+    known = manifest["documents"]
+    writer = _BatchWriter(db, keywords, embeddings, update, batch_size)
+    current = set()
+    touched = False
+
+    for entry in _list_documents(docs_path):
+        current.add(entry.name)
+        st = entry.stat()
+        record = known.get(entry.name)
+        if record and record["size"] == st.st_size and record["mtime_ns"] == st.st_mtime_ns:
+            update.unchanged += 1
+            continue
+
+        digest = file_digest(entry.path)
+        if record and record["sha256"] == digest:
+            # Touched but not edited: refresh the stat fields only
+            record["size"], record["mtime_ns"] = st.st_size, st.st_mtime_ns
+            update.unchanged += 1
+            touched = True
+            continue
+
+        old_ids = set(record["chunk_ids"]) if record else set()
+        new_ids = []
+        chunks = iter_chunks(entry.path, CHUNK_SIZE, CHUNK_OVERLAP)
+        for chunk_id, text in iter_chunk_ids(entry.name, chunks):
+            new_ids.append(chunk_id)
+            if chunk_id not in old_ids:
+                writer.add(chunk_id, text, {"source": entry.path, "chunk_id": chunk_id})
+        update.chunks_seen += len(new_ids)
+        writer.delete(list(old_ids.difference(new_ids)))
+        (update.changed if record else update.added).append(entry.name)
+        known[entry.name] = {
+            "sha256": digest,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "chunk_ids": new_ids,
+        }
+
+    for name in sorted(set(known) - current):
+        writer.delete(known.pop(name)["chunk_ids"])
+        update.removed.append(name)
+    writer.flush()
+    db = writer.db
+
+    if update.dirty or touched or full or not os.path.exists(os.path.join(index_path, MANIFEST_FILE)):
+        _save_index(db, manifest, index_path, keywords)
+    _keyword_indexes[index_path] = keywords
+    update.seconds = time.perf_counter() - started
+    return db, update
+
+
+def get_vector_store(embeddings, docs_path=DOCS_PATH, index_path=INDEX_PATH):
+    """Process-wide cached index; warm calls only re-stat the corpus every CHECK_INTERVAL seconds.
+
+    The cache holds one index. A call with another corpus, index directory or
+    embedding model loads that index in its place.
+    """
+    global _db, _key, _signature, _last_check, _generation
+
+    key = (docs_path, index_path, _embedding_model(embeddings))
+    now = time.monotonic()
+    if _db is not None and _key == key and now - _last_check < CHECK_INTERVAL:
+        return _db
+
+    with _lock:
+        if _key != key:
+            # Never update an index in place with another corpus's chunks or another model's vectors
+            _db = _signature = None
+            _key = key
+        signature = corpus_signature(docs_path)
+        if _db is None or signature != _signature:
+            loaded = _db is None
+            _db, update = update_index(embeddings, docs_path, index_path, db=_db)
+            if loaded or update.dirty:
+                _generation += 1
+        _signature = signature
+        _last_check = now
+        return _db
+
+
+def index_generation():
+    """Counter bumped whenever the in-process index is (re)loaded or changed."""
+    return _generation
+
+
+def reset_cache():
+    """Drop the in-process index so the next call reloads it from disk."""
+    global _db, _key, _signature, _last_check
+    with _lock:
+        _db = _key = _signature = None
+        _last_check = 0.0
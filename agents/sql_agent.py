@@ -1,19 +1,65 @@
-import sqlite3
+import database
+import sales_aggregates
+import sales_queries
+
+AVG_SALES_SQL = "SELECT AVG(amount) FROM sales"
+
+
+def _set_totals(state, stats):
+    state["sql_avg_sales"] = stats.mean if stats else 0
+    state["sql_std_sales"] = stats.std if stats else 0
+    state["sql_sales_count"] = stats.count if stats else 0
+
+
+def _set_segment(state, filters, stats):
+    state["sql_segment"] = {
+        "filters": filters,
+        "count": stats.count if stats else 0,
+        "mean": stats.mean if stats else 0,
+        "std": stats.std if stats else 0,
+        "total": stats.total if stats else 0,
+    }
+
 
 def sql_agent(state):
     """SQL agent for database queries and historical analysis."""
     try:
-        conn = sqlite3.connect('sales.db')
-        cursor = conn.cursor()
-        
-        # Get average sales from database
-        cursor.execute('SELECT AVG(amount) FROM sales')
-        result = cursor.fetchone()
-        avg_sales = result[0] if result and result[0] else 0
-        
-        state["sql_avg_sales"] = avg_sales
-        conn.close()
-    except Exception as e:
-        state["sql_avg_sales"] = 0
+        # O(1) read of the trigger-maintained aggregates
+        _set_totals(state, sales_aggregates.segment_stats())
+    except Exception:
+        try:
+            # Aggregates not installed yet: fall back to a full scan
+            state["sql_avg_sales"] = database.scalar(AVG_SALES_SQL, default=0)
+        except Exception:
+            state["sql_avg_sales"] = 0
+
+    # Segmented history (date window, product, region, salesperson, industry) via the covering indexes
+    filters = sales_queries.state_filters(state)
+    if filters:
+        try:
+            stats = sales_queries.segment_stats(**filters)
+        except Exception:
+            stats = None
+        _set_segment(state, filters, stats)
     
     return state
+
+
+async def asql_agent(state):
+    """``sql_agent`` for the async workflow: the same queries through the async database API."""
+    try:
+        _set_totals(state, await sales_aggregates.asegment_stats())
+    except Exception:
+        try:
+            state["sql_avg_sales"] = await database.ascalar(AVG_SALES_SQL, default=0)
+        except Exception:
+            state["sql_avg_sales"] = 0
+
+    filters = sales_queries.state_filters(state)
+    if filters:
+        try:
+            stats = await sales_queries.asegment_stats(**filters)
+        except Exception:
+            stats = None
+        _set_segment(state, filters, stats)
+    return state
@@ -0,0 +1,109 @@
+"""Online anomaly detection over a live feed of sales events.
+
+Every event (one sale: amount, product, region, salesperson) updates the
+state of each segment it belongs to ("all", product, region, salesperson,
+product x region, as in ``rolling_stats``) in O(1):
+
+- Welford's running count / mean / M2 over all events, and
+- an exponentially weighted mean and variance (``STREAM_EWMA_ALPHA``),
+  which follow level shifts and seasonality the all-time stats cannot.
+
+An event is scored against its segment's state before it is added: distance
+from the EWMA mean in units of the larger of the EWMA and all-time std. A
+segment triggers when its |z| crosses the threshold and re-arms once it is
+back below, so a sustained shift raises one alert, not one per event. State
+per segment is a handful of numbers; no history is kept.
+"""
+import os
+import math
+from dataclasses import dataclass
+
+import rolling_stats
+
+# Weight of the newest event in the EWMA mean / variance
+EWMA_ALPHA = float(os.getenv("STREAM_EWMA_ALPHA", "0.1"))
+# |z| of a single event against its segment's EWMA state that triggers; single
+# sales are noisier than the daily totals the monitor agent compares
+ANOMALY_Z = float(os.getenv("STREAM_ANOMALY_Z", "3.0"))
+# Events a segment must have seen before it can trigger
+WARMUP = int(os.getenv("STREAM_WARMUP", "20"))
+
+
+@dataclass
+class SegmentState(rolling_stats.RunningStats):
+    """Running and exponentially weighted mean / variance of one segment's events."""
+    ewma: float = 0.0
+    ewvar: float = 0.0
+    alerting: bool = False
+
+    @property
+    def ew_std(self):
+        return math.sqrt(self.ewvar)
+
+    def update(self, x, alpha=EWMA_ALPHA):
+        """Add one event; returns its z-score against the state before it (0 while there is none).
+
+        The z-score is against the EWMA mean and the larger of the EWMA and all-time std.
+        """
+        if self.n == 0:
+            self.ewma = x
+            z = 0.0
+        else:
+            # The all-time std floors the EWMA one, which dips in quiet stretches
+            std = max(self.ew_std, self.std)
+            z = (x - self.ewma) / std if std > 0 else 0.0
+            delta = x - self.ewma
+            increment = alpha * delta
+            self.ewma += increment
+            self.ewvar = (1 - alpha) * (self.ewvar + delta * increment)
+        self.add(x)
+        return z
+
+
+class StreamMonitor:
+    """Per-segment online state for a stream of sales events."""
+
+    def __init__(self, alpha=EWMA_ALPHA, threshold=ANOMALY_Z, warmup=WARMUP):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.segments = {}
+        self.events = 0
+        self.rejected = 0
+        self.triggers = 0
+
+    def observe(self, event):
+        """Update every segment of one event; returns workflow states for segments that just crossed."""
+        try:
+            amount = float(event["amount"])
+        except (KeyError, TypeError, ValueError):
+            self.rejected += 1
+            return []
+        self.events += 1
+        values = {column: event.get(column) or None for column in rolling_stats.SEGMENT_COLUMNS}
+        keys = ["all"] + [rolling_stats.segment_key(**{column: values[column] for column in columns})
+                          for columns in rolling_stats.SEGMENTS if all(values[column] for column in columns)]
+        crossed = []
+        for key in keys:
+            state = self.segments.get(key)
+            if state is None:
+                state = self.segments[key] = SegmentState()
+            mean, std = state.ewma, max(state.ew_std, state.std)
+            z = state.update(amount, self.alpha)
+            anomalous = state.n > self.warmup and abs(z) > self.threshold
+            if anomalous and not state.alerting:
+                self.triggers += 1
+                crossed.append({
+                    "latest_sales": amount,
+                    **rolling_stats.parse_segment_key(key),
+                    "baseline_mean": mean,
+                    "baseline_std": std,
+                    "baseline_segment": f"stream:{key}",
+                    "anomaly_threshold": self.threshold,
+                })
+            state.alerting = anomalous
+        return crossed
+
+    def stats(self):
+        return {"events": self.events, "rejected": self.rejected, "segments": len(self.segments),
+                "triggers": self.triggers, "alerting": sum(state.alerting for state in self.segments.values())}
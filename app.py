@@ -1,4 +1,7 @@
 import os
+import json
+import tempfile
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Load environment variables FIRST before importing anything else
@@ -6,14 +9,32 @@ load_dotenv()
 
 # ========== FASTAPI ==========
 # FastAPI: Web framework for creating REST APIs
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 # =============================
 
-from workflow import app_workflow
+import database
+import load_sales
+import decision_history
+from workflow import async_workflow, route_stats
+from agents.rag_agent import rag_cache_stats
+from agents.forecasting_agent import forecast_cache_stats
+from agents.learning_agent import learning_log_stats
+from agents.stream_monitor import StreamMonitor
+
+# Compacts the learning log into the decision history behind /history
+history_compactor = decision_history.Compactor()
+
+@asynccontextmanager
+async def lifespan(app):
+    await run_in_threadpool(history_compactor.start)
+    yield
+    await run_in_threadpool(history_compactor.stop)
+    await database.aclose()
 
 # ========== FASTAPI ==========
 # FastAPI: Initialize FastAPI application instance
-app = FastAPI(title="AEI-2 Agent System", version="1.0.0")
+app = FastAPI(title="AEI-2 Agent System", version="1.0.0", lifespan=lifespan)
 # =============================
 
 # ========== FASTAPI ==========
@@ -24,19 +45,116 @@ def read_root():
 
 # ========== FASTAPI & LANGGRAPH ==========
 # FastAPI: POST endpoint to execute workflow
-# LANGGRAPH: app_workflow.invoke() executes the multi-agent pipeline
+# LANGGRAPH: async_workflow.ainvoke() executes the multi-agent pipeline
 @app.post("/run-workflow")
-def run_workflow(sales_data: dict):
-    """Run the agent workflow with sales data."""
+async def run_workflow(sales_data: dict):
+    """Run the agent workflow with sales data (async nodes, no threadpool worker held per request)."""
     try:
-        result = app_workflow.invoke(sales_data)  # LANGGRAPH executes here
+        result = await async_workflow.ainvoke(sales_data)  # LANGGRAPH executes here
         return {"status": "success", "result": result}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# ========== FASTAPI ==========
+# FastAPI: POST endpoint for bulk sales ingestion (raw CSV / JSONL / Parquet body)
+BULK_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+
+@app.post("/sales/bulk")
+async def bulk_load_sales(request: Request, fmt: str = Query(None, alias="format")):
+    """Load many sales rows in one request; format from ``?format=`` or the Content-Type."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = fmt or BULK_CONTENT_TYPES.get(content_type)
+    if fmt not in load_sales.READERS:
+        return {"status": "error", "message": f"Unsupported format {fmt or content_type!r}; "
+                                              f"use ?format= one of {', '.join(load_sales.READERS)}"}
+    # Spool the body to disk so large uploads are never held in memory; file I/O stays off the event loop
+    upload = await run_in_threadpool(tempfile.NamedTemporaryFile, suffix=f".{fmt}", delete=False)
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(upload.write, chunk)
+        await run_in_threadpool(upload.close)
+        report = await run_in_threadpool(load_sales.load_file, upload.name, fmt)
+        return {"status": "success", **report.as_dict()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        upload.close()
+        await run_in_threadpool(os.remove, upload.name)
+
+# ========== FASTAPI & LANGGRAPH ==========
+# FastAPI: WebSocket endpoint for a continuous feed of sales events
+# LANGGRAPH: async_workflow.ainvoke() runs only for segments that cross the threshold
+stream_monitor = StreamMonitor()
+
+@app.websocket("/ws/sales")
+async def stream_sales(websocket: WebSocket, workflow: bool = True):
+    """Each message is one sales event or a list of them; replies are sent only for anomalies.
+
+    With ``?workflow=false`` anomalies are reported without running the workflow.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"type": "error", "message": "messages must be JSON"})
+                continue
+            events = message if isinstance(message, list) else [message]
+            for event in events:
+                if not isinstance(event, dict):
+                    await websocket.send_json({"type": "error", "message": "events must be JSON objects"})
+                    continue
+                for state in stream_monitor.observe(event):
+                    reply = {"type": "anomaly", "segment": state["baseline_segment"], "event": event,
+                             "z_score": (state["latest_sales"] - state["baseline_mean"]) / state["baseline_std"]}
+                    if workflow:
+                        try:
+                            # Awaited: other connections keep streaming meanwhile
+                            reply["result"] = await async_workflow.ainvoke(state)
+                        except Exception as e:
+                            reply["error"] = str(e)
+                    await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+
+# ========== FASTAPI ==========
+# FastAPI: GET endpoints over the decision history (read-only; history_compactor ingests the learning log)
+@app.get("/history")
+def history(start: str = None, end: str = None, anomaly: bool = None, decision_code: int = None,
+            z_band: str = None, segment: str = None, limit: int = 100):
+    """Latest workflow runs matching the filters, newest first."""
+    try:
+        runs = decision_history.runs(start, end, anomaly, decision_code, z_band, segment, min(limit, 10000))
+        return {"status": "success", "runs": runs}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/history/daily")
+def history_daily(start: str = None, end: str = None, anomaly: bool = None, decision_code: int = None,
+                  z_band: str = None):
+    """Per-day runs, anomalies, decision counts and forecast error."""
+    try:
+        return {"status": "success", "days": decision_history.daily(start, end, anomaly, decision_code, z_band)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 # ========== FASTAPI ==========
 # FastAPI: GET endpoint for health check
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+# FastAPI: GET endpoint for runtime metrics (cache hit rates for TTL tuning)
+@app.get("/metrics")
+def metrics():
+    return {"rag_cache": rag_cache_stats(), "forecast_cache": forecast_cache_stats(),
+            "learning_log": learning_log_stats(), "stream": stream_monitor.stats(),
+            "workflow": route_stats(), "history": history_compactor.stats()}
 # =============================
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Load test of /run-workflow: sync handler + invoke vs async handler + ainvoke.
+
+Starts one uvicorn worker per mode in a child process, serving the workflow
+with ``--sql-ms`` / ``--rag-ms`` of simulated database and embedding-API
+latency (a blocking sleep in the sync agents, ``asyncio.sleep`` in the
+async variants). Sends ``--requests`` POSTs with ``--concurrency`` in
+flight and reports throughput, latency and the worker's peak thread count.
+
+    python benchmarks/bench_async_workflow.py --requests 2000 --concurrency 200
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAYLOAD = {"latest_sales": 250000, "product": "Laptop", "region": "North"}
+
+
+def delayed(agent, aagent, ms):
+    def run(state):
+        time.sleep(ms / 1000)
+        return agent(state)
+
+    async def arun(state):
+        await asyncio.sleep(ms / 1000)
+        return await aagent(state)
+    return run, arun
+
+
+def serve(mode, port, sql_ms, rag_ms):
+    import uvicorn
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI
+
+    import database
+    import workflow
+
+    agents, async_agents = dict(workflow.AGENTS), dict(workflow.ASYNC_AGENTS)
+    for name, ms in (("sql", sql_ms), ("rag", rag_ms)):
+        agents[name], async_agents[name] = delayed(agents[name], async_agents[name], ms)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await database.aclose()
+
+    app = FastAPI(lifespan=lifespan)
+
+    if mode == "sync":
+        graph = workflow.build_workflow(agents)
+
+        @app.post("/run-workflow")
+        def run_workflow(sales_data: dict):
+            return {"status": "success", "result": graph.invoke(sales_data)}
+    else:
+        graph = workflow.build_workflow(agents, asynchronous=True, async_agents=async_agents)
+
+        @app.post("/run-workflow")
+        async def run_workflow(sales_data: dict):
+            return {"status": "success", "result": await graph.ainvoke(sales_data)}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", workers=1)
+
+
+def threads(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def post(reader, writer, request):
+    """One keep-alive HTTP/1.1 POST; returns the status code (body read and dropped)."""
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = next(int(line.split(b":", 1)[1]) for line in head.split(b"\r\n")
+                  if line.lower().startswith(b"content-length:"))
+    await reader.readexactly(length)
+    return status
+
+
+async def load(port, requests, concurrency, pid):
+    # Plain asyncio streams: the load generator shares the CPU with the server,
+    # so it has to be much cheaper per request than an HTTP client library
+    body = json.dumps(PAYLOAD).encode()
+    request = (f"POST /run-workflow HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+    latencies, errors, peak = [], [], threads(pid)
+    remaining = requests
+
+    async def client():
+        nonlocal remaining
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    status = await post(reader, writer, request)
+                except (OSError, asyncio.IncompleteReadError) as e:
+                    errors.append(repr(e))
+                    return
+                if status != 200:
+                    errors.append(status)
+                    continue
+                latencies.append(time.perf_counter() - started)
+        finally:
+            writer.close()
+
+    async def sample():
+        nonlocal peak
+        while True:
+            peak = max(peak, threads(pid))
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    return elapsed, latencies, errors, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the sync and async /run-workflow handlers")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per mode (default: 2000)")
+    parser.add_argument("--concurrency", type=int, default=200, help="Requests in flight (default: 200)")
+    parser.add_argument("--sql-ms", type=float, default=20, help="Simulated SQL latency (default: 20)")
+    parser.add_argument("--rag-ms", type=float, default=150, help="Simulated embedding latency (default: 150)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--serve", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.port, args.sql_ms, args.rag_ms)
+        return
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, LEARNING_LOG_PATH=os.path.join(workdir, "learning_log.jsonl"))
+    print(f"{args.requests:,} requests, {args.concurrency} in flight, added latency sql {args.sql_ms:g} ms, "
+          f"rag {args.rag_ms:g} ms, one uvicorn worker")
+    try:
+        for mode in args.modes:
+            child = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", mode,
+                                      "--port", str(args.port), "--sql-ms", str(args.sql_ms),
+                                      "--rag-ms", str(args.rag_ms)], env=env)
+            try:
+                # Wait for the server, warming caches and indexes with the first request
+                for _ in range(600):
+                    try:
+                        urllib.request.urlopen(urllib.request.Request(
+                            f"http://127.0.0.1:{args.port}/run-workflow", json.dumps(PAYLOAD).encode(),
+                            {"Content-Type": "application/json"}), timeout=30).read()
+                        break
+                    except OSError:
+                        time.sleep(0.1)
+                elapsed, latencies, errors, peak = asyncio.run(load(args.port, args.requests, args.concurrency,
+                                                                    child.pid))
+            finally:
+                child.terminate()
+                child.wait()
+            latencies.sort()
+            print(f"{mode:<6} {len(latencies) / elapsed:>8.1f} req/s   p50 {statistics.median(latencies) * 1000:>7.1f} ms"
+                  f"   p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:>7.1f} ms   peak threads {peak}"
+                  + (f"   {len(errors)} errors ({errors[0]})" if errors else ""))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Batch anomaly scoring vs one series at a time.
+
+Scores ``--series`` synthetic daily series (``--window`` baseline days plus
+the latest day) with ``agents.batch_monitor.score_series`` and with a Python
+loop doing the same z / MAD arithmetic per series, as calling the monitor
+once per series would.
+
+    python benchmarks/bench_batch_monitor.py --series 100000 --window 30
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.batch_monitor import MAD_SCALE, score_series  # noqa: E402
+
+
+def score_one(values, window):
+    history, latest = values[-window - 1:-1], values[-1]
+    std = history.std(ddof=1)
+    median = np.median(history)
+    mad = MAD_SCALE * np.median(np.abs(history - median))
+    z = (latest - history.mean()) / std if std else 0.0
+    robust = (latest - median) / mad if mad else 0.0
+    return z, robust
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized batch anomaly scoring")
+    parser.add_argument("--series", type=int, default=100_000, help="Number of series (default: 100000)")
+    parser.add_argument("--window", type=int, default=30, help="Baseline days (default: 30)")
+    parser.add_argument("--loop-series", type=int, default=5_000,
+                        help="Series scored by the per-series loop, extrapolated (default: 5000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs of the batch scorer (default: 5)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    series = rng.gamma(2.0, 500.0, size=(args.series, args.window + 1))
+    print(f"{args.series:,} series x {args.window + 1} days")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = score_series(series, args.window)
+        timings.append(time.perf_counter() - started)
+    print(f"batch     {np.median(timings) * 1000:>10.1f} ms   {result['anomaly'].sum():,} flagged, "
+          f"result {result.nbytes / 2**20:.1f} MB")
+
+    sample = series[:args.loop_series]
+    started = time.perf_counter()
+    for values in sample:
+        score_one(values, args.window)
+    per_series = (time.perf_counter() - started) / len(sample)
+    print(f"loop      {per_series * args.series * 1000:>10.1f} ms   (extrapolated from {len(sample):,} series)")
+
+
+if __name__ == "__main__":
+    main()
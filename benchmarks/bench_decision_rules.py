@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Decision rule table: one state at a time vs NumPy batches.
+
+Evaluates ``--states`` random states (anomaly flag, z-score, latest sales,
+historical average) with ``agents.decision_rules.evaluate`` per state, then
+with ``evaluate_batch`` in one call, and times the action lookup by code
+against the keyword parsing of the decision text it replaces.
+
+    python benchmarks/bench_decision_rules.py --states 1000000
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.decision_rules import action_text, code_from_text, decision_text, evaluate, evaluate_batch  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the decision rule table")
+    parser.add_argument("--states", type=int, default=1_000_000, help="Number of states (default: 1000000)")
+    parser.add_argument("--loop-states", type=int, default=100_000,
+                        help="States evaluated one at a time, extrapolated (default: 100000)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    anomaly = rng.random(args.states) < 0.3
+    z_score = rng.normal(0, 2, args.states)
+    sql_avg = rng.uniform(50_000, 150_000, args.states)
+    latest = sql_avg * rng.uniform(0.5, 1.5, args.states)
+    print(f"{args.states:,} states")
+
+    started = time.perf_counter()
+    codes = evaluate_batch(anomaly, z_score, latest, sql_avg)
+    elapsed = time.perf_counter() - started
+    print(f"batch     {elapsed * 1000:>10.1f} ms   {np.bincount(codes).tolist()[1:]}")
+
+    n = min(args.loop_states, args.states)
+    sample = list(zip(anomaly[:n].tolist(), z_score[:n].tolist(), latest[:n].tolist(), sql_avg[:n].tolist()))
+    started = time.perf_counter()
+    single = [evaluate(*state) for state in sample]
+    per_state = (time.perf_counter() - started) / n
+    assert single == codes[:n].tolist()
+    print(f"loop      {per_state * args.states * 1000:>10.1f} ms   (extrapolated from {n:,} states)")
+
+    decisions = [decision_text(code, state[2], state[3]) for code, state in zip(single, sample)]
+    started = time.perf_counter()
+    for code in single:
+        action_text(code, 100_000)
+    by_code = (time.perf_counter() - started) / n
+    started = time.perf_counter()
+    for decision in decisions:
+        action_text(code_from_text(decision), 100_000)
+    by_text = (time.perf_counter() - started) / n
+    print(f"action    {by_code * 1e6:>10.2f} µs by code   {by_text * 1e6:.2f} µs parsing the decision text")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Vectorized multi-series forecast fitting vs one series at a time.
+
+Fits SES / Holt / Holt-Winters / seasonal naive to ``--series`` synthetic
+daily series (``--days`` long) with ``agents.forecast_models.fit`` in one
+call, then to a sample one series per call, as the forecasting agent does
+per segment, and reports series fitted per second.
+
+    python benchmarks/bench_forecasting.py --series 10000 --days 365
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import forecast_models  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized forecast fitting")
+    parser.add_argument("--series", type=int, default=10_000, help="Number of series (default: 10000)")
+    parser.add_argument("--days", type=int, default=365, help="Days per series (default: 365)")
+    parser.add_argument("--loop-series", type=int, default=200,
+                        help="Series fitted one per call (default: 200)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    t = np.arange(args.days)
+    weekly = 1 + 0.3 * np.sin(2 * np.pi * t / 7)
+    trend = rng.uniform(0, 2, (args.series, 1)) * t
+    series = rng.gamma(2.0, 500.0, size=(args.series, args.days)) * weekly + trend
+    lanes = len(forecast_models.LANE_MODELS)
+    print(f"{args.series:,} series x {args.days} days, {lanes} parameter lanes per series")
+
+    started = time.perf_counter()
+    fitted = forecast_models.fit(series)
+    point, lower, upper = fitted.forecast()
+    elapsed = time.perf_counter() - started
+    counts = {name: int((fitted.model == code).sum()) for code, name in enumerate(forecast_models.MODELS)}
+    print(f"batch     {args.series / elapsed:>10,.0f} series/s   ({elapsed:.2f} s, chosen: {counts})")
+
+    sample = series[:args.loop_series]
+    started = time.perf_counter()
+    for values in sample:
+        forecast_models.fit(values[None, :]).forecast()
+    elapsed = time.perf_counter() - started
+    print(f"per call  {len(sample) / elapsed:>10,.0f} series/s   ({len(sample):,} series)")
+
+    started = time.perf_counter()
+    for _ in range(args.days // 7):
+        fitted.update(series[:, -1])
+    elapsed = time.perf_counter() - started
+    print(f"update    {args.series * (args.days // 7) / elapsed:>10,.0f} series/s   (one new day, O(1) state update)")
+
+
+if __name__ == "__main__":
+    main()
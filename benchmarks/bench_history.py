@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Decision history: compaction throughput and query latency.
+
+Writes ``--records`` synthetic learning-log lines spread over ``--days``
+days, compacts them into a scratch database with
+``decision_history.compact`` and times the ``/history`` queries: filtered
+listings (index + limit) and per-day aggregations (rollup only), next to a
+full scan of the history table for the same aggregation.
+
+    python benchmarks/bench_history.py --records 1000000 --days 365
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import decision_history  # noqa: E402
+
+
+def write_log(path, records, days, rng):
+    start = datetime(2026, 1, 1)
+    seconds = np.sort(rng.integers(0, days * 86400, records))
+    z_scores = rng.normal(0, 1.5, records)
+    codes = rng.integers(1, 13, records)
+    with open(path, "w") as f:
+        for i in range(records):
+            moment = start + timedelta(seconds=int(seconds[i]))
+            f.write(json.dumps({
+                "timestamp": moment.isoformat(), "segment": f"product=Product {'ABCD'[i % 4]}|region=North",
+                "latest_sales": 100000.0 + i % 1000, "anomaly": bool(abs(z_scores[i]) > 2),
+                "z_score": float(z_scores[i]), "forecast_sales": 101000.0, "forecast_model": "holt_winters",
+                "forecast_day": (moment + timedelta(1)).date().isoformat(), "decision_code": int(codes[i]),
+                "decision": "Sales near historical average.",
+            }) + "\n")
+
+
+def timed(label, call, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        timings.append(time.perf_counter() - started)
+    print(f"{label:<44} {np.median(timings) * 1000:>9.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the decision history store")
+    parser.add_argument("--records", type=int, default=1_000_000, help="Log lines (default: 1000000)")
+    parser.add_argument("--days", type=int, default=365, help="Days they span (default: 365)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        database.set_database_url(f"sqlite:///{os.path.join(workdir, 'history.db')}")
+        path = os.path.join(workdir, "learning_log.jsonl")
+        write_log(path, args.records, args.days, np.random.default_rng(0))
+        print(f"{args.records:,} records over {args.days} days, {os.path.getsize(path) / 2**20:,.0f} MB of log")
+
+        started = time.perf_counter()
+        report = decision_history.compact(path)
+        elapsed = time.perf_counter() - started
+        print(f"compact                                      {elapsed:>9.2f} s    "
+              f"({report['records'] / elapsed:,.0f} records/s)")
+        timed("compact, nothing new", lambda: decision_history.compact(path))
+
+        timed("runs: latest 100", lambda: decision_history.runs(limit=100))
+        timed("runs: anomalies, code 3, latest 100",
+              lambda: decision_history.runs(anomaly=True, decision_code=3, limit=100))
+        timed("runs: one day, critical band",
+              lambda: decision_history.runs(start="2026-06-01", end="2026-06-01", z_band="critical", limit=1000))
+        timed("daily: whole range", lambda: decision_history.daily())
+        timed("daily: one month, anomalies only",
+              lambda: decision_history.daily(start="2026-06-01", end="2026-06-30", anomaly=True))
+        timed("scan: decision counts per day (no rollup)", lambda: database.query(
+            "SELECT day, decision_code, COUNT(*) FROM decision_history GROUP BY day, decision_code"), repeat=1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Learning-log append: open/write/close per entry vs the background writer.
+
+Writes ``--entries`` learning-log entries from ``--threads`` threads, first
+the way the learning agent used to (open in append mode, write one line,
+close), then through ``agents.log_writer.LogWriter``. Reports the time the
+caller spends per entry, and for the writer the time until everything is on
+disk.
+
+    python benchmarks/bench_log_writer.py --entries 50000 --threads 4
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.log_writer import LogWriter  # noqa: E402
+
+
+def entry(i):
+    return {"timestamp": datetime.now().isoformat(), "latest_sales": 100000 + i, "anomaly": i % 7 == 0,
+            "z_score": 1.25, "forecast_sales": 105000.0, "forecast_model": "holt_winters",
+            "decision": "Sales near historical average. Maintain current operations while exploring new market segments."}
+
+
+def run(threads, per_thread, write):
+    latencies = []
+
+    def produce():
+        started = time.perf_counter()
+        for i in range(per_thread):
+            write(entry(i))
+        latencies.append((time.perf_counter() - started) / per_thread)
+
+    workers = [threading.Thread(target=produce) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(latencies) / len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the background learning-log writer")
+    parser.add_argument("--entries", type=int, default=50_000, help="Entries in total (default: 50000)")
+    parser.add_argument("--threads", type=int, default=4, help="Writing threads (default: 4)")
+    parser.add_argument("--fsync", default="interval", help="Writer fsync policy (default: interval)")
+    args = parser.parse_args()
+    per_thread = args.entries // args.threads
+
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, "direct.jsonl")
+
+        def append(record):
+            with open(path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+        started = time.perf_counter()
+        latency = run(args.threads, per_thread, append)
+        elapsed = time.perf_counter() - started
+        print(f"open/append/close  {latency * 1e6:>8.1f} µs per entry   {elapsed:.2f} s total")
+
+        writer = LogWriter(os.path.join(workdir, "queued.jsonl"), queue_size=args.entries, fsync=args.fsync)
+        started = time.perf_counter()
+        latency = run(args.threads, per_thread, writer.write)
+        writer.flush()
+        elapsed = time.perf_counter() - started
+        stats = writer.stats()
+        writer.close()
+        print(f"LogWriter.write    {latency * 1e6:>8.1f} µs per entry   {elapsed:.2f} s until written "
+              f"({stats['batches']:,} batches, {stats['fsyncs']} fsyncs, {stats['dropped']} dropped)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
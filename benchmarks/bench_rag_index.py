@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Recall vs latency vs memory of the RAG index types on a synthetic corpus.
+
+Builds every ``RAG_INDEX_TYPE`` over the same clustered, L2-normalised vectors
+(the shape real chunk embeddings have) and reports, per index and search
+setting: build time, recall@k against exact flat search, p50/p99 single-query
+latency and index memory.
+
+    python benchmarks/bench_rag_index.py --vectors 1000000 --dim 384 --k 4
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import faiss_index  # noqa: E402
+from agents.faiss_index import build_faiss_index, factory_string, index_memory  # noqa: E402
+from agents.matrix_store import MatrixVectorStore  # noqa: E402
+
+import faiss  # noqa: E402
+
+
+def synthetic_corpus(n_vectors, dim, n_queries, clusters, seed=0):
+    """Normalised vectors drawn around ``clusters`` topics; queries are perturbed corpus rows."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n_vectors)]
+    vectors += 0.6 * rng.standard_normal((n_vectors, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(n_vectors, n_queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def time_queries(search, queries):
+    """Run queries one at a time, as the RAG agent does; returns (results, latencies in ms)."""
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.array(latencies)
+
+
+def recall(results, truth):
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(results, truth))
+    return hits / sum(len(expected) for expected in truth)
+
+
+def report(name, setting, build_seconds, results, truth, latencies, memory):
+    print(f"{name:<8} {setting:<14} {build_seconds:>8.2f} {recall(results, truth):>9.3f} "
+          f"{np.percentile(latencies, 50):>9.3f} {np.percentile(latencies, 99):>9.3f} {memory / 2**20:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flat / IVF / IVF-PQ / HNSW RAG indexes")
+    parser.add_argument("--vectors", type=int, default=200_000, help="Corpus size (default: 200000)")
+    parser.add_argument("--dim", type=int, default=256, help="Vector dimension (default: 256)")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries (default: 500)")
+    parser.add_argument("--clusters", type=int, default=1000, help="Topics in the synthetic corpus")
+    parser.add_argument("--k", type=int, default=4, help="Neighbours per query (default: 4)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64], help="IVF cells scanned")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 64, 128], help="HNSW efSearch")
+    parser.add_argument("--pq-m", type=int, default=faiss_index.PQ_M,
+                        help="IVF-PQ bytes per vector (default: $RAG_PQ_M or derived from --dim)")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads (default: 1)")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    faiss_index.PQ_M = args.pq_m
+    vectors, queries = synthetic_corpus(args.vectors, args.dim, args.queries, args.clusters)
+    print(f"{args.vectors:,} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k} vs flat")
+    print(f"{'index':<8} {'setting':<14} {'build s':>8} {'recall':>9} {'p50 ms':>9} {'p99 ms':>9} {'memory MB':>10}")
+
+    started = time.perf_counter()
+    flat = build_faiss_index("flat", vectors)
+    build_seconds = time.perf_counter() - started
+    results, latencies = time_queries(lambda q: flat.search(q[None], args.k)[1][0], queries)
+    truth = results
+    report("flat", "exact", build_seconds, results, truth, latencies, index_memory(flat))
+
+    # Default store for the local embedder
+    started = time.perf_counter()
+    matrix = MatrixVectorStore(None, dim=args.dim)
+    matrix.add_vectors(vectors, [""] * len(vectors), ids=[str(i) for i in range(len(vectors))])
+    build_seconds = time.perf_counter() - started
+    results, latencies = time_queries(lambda q: matrix.search_vector(q, args.k)[0], queries)
+    report("matrix", "numpy", build_seconds, results, truth, latencies, matrix.vectors.nbytes)
+
+    for kind in ("ivf", "ivfpq"):
+        started = time.perf_counter()
+        index = build_faiss_index(kind, vectors)
+        build_seconds = time.perf_counter() - started
+        ivf = faiss.extract_index_ivf(index)
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            results, latencies = time_queries(lambda q: index.search(q[None], args.k)[1][0], queries)
+            report(kind, f"nprobe={nprobe}", build_seconds, results, truth, latencies, index_memory(index))
+        print(f"{'':<8} ({factory_string(kind, args.vectors, args.dim)})")
+
+    started = time.perf_counter()
+    index = build_faiss_index("hnsw", vectors)
+    build_seconds = time.perf_counter() - started
+    for ef_search in args.ef_search:
+        index.hnsw.efSearch = ef_search
+        results, latencies = time_queries(lambda q: index.search(q[None], args.k)[1][0], queries)
+        report("hnsw", f"ef={ef_search}", build_seconds, results, truth, latencies, index_memory(index))
+
+
+if __name__ == "__main__":
+    main()
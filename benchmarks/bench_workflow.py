@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""End-to-end workflow latency: the old sequential chain vs the routed fan-out graph.
+
+Runs ``--runs`` workflow invocations through both graphs built from the same
+agents: an anomalous input through the sequential chain and through the
+fan-out graph (full path), then a steady-state input through the fan-out
+graph, which routes it past the RAG node (fast path). ``--sql-ms`` /
+``--rag-ms`` / ``--forecast-ms`` add a fixed delay to those nodes to stand
+in for a remote database, the embedding API and a cold model fit; with
+delays the sequential chain costs their sum, the fan-out graph the slowest
+node of each step.
+
+    python benchmarks/bench_workflow.py --runs 50 --sql-ms 40 --rag-ms 120
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workflow  # noqa: E402
+import agents.learning_agent as learning  # noqa: E402
+from langgraph.graph import START, END  # noqa: E402
+from agents.monitor_agent import get_baseline  # noqa: E402
+
+SEQUENTIAL = ("monitor", "sql", "rag", "forecast", "decision", "action", "learning")
+SEQUENTIAL_EDGES = tuple(((source,), target) for source, target in
+                         zip((START,) + SEQUENTIAL, SEQUENTIAL + (END,)))
+
+
+def delayed(agent, ms):
+    if not ms:
+        return agent
+
+    def run(state):
+        time.sleep(ms / 1000)
+        return agent(state)
+    return run
+
+
+def measure(graph, runs, state):
+    graph.invoke(dict(state))  # warm caches and indexes
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        graph.invoke(dict(state))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies), max(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs fan-out workflow latency")
+    parser.add_argument("--runs", type=int, default=50, help="Invocations per graph (default: 50)")
+    parser.add_argument("--sql-ms", type=float, default=0, help="Added SQL node latency (default: 0)")
+    parser.add_argument("--rag-ms", type=float, default=0, help="Added RAG node latency (default: 0)")
+    parser.add_argument("--forecast-ms", type=float, default=0, help="Added forecast node latency (default: 0)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    previous = learning.LEARNING_LOG
+    learning.LEARNING_LOG = os.path.join(workdir, "learning_log.jsonl")
+    try:
+        agents = dict(workflow.AGENTS)
+        agents["sql"] = delayed(agents["sql"], args.sql_ms)
+        agents["rag"] = delayed(agents["rag"], args.rag_ms)
+        agents["forecast"] = delayed(agents["forecast"], args.forecast_ms)
+        segment = {"product": "Laptop", "region": "North"}
+        baseline = get_baseline(**segment)
+        anomalous = dict(segment, latest_sales=250000)
+        steady = dict(segment, latest_sales=baseline.mean if baseline else 100000)
+        sequential = workflow.build_workflow(agents, SEQUENTIAL_EDGES, {})
+        fan_out = workflow.build_workflow(agents)
+        print(f"{args.runs} runs, added latency: sql {args.sql_ms:g} ms, rag {args.rag_ms:g} ms, "
+              f"forecast {args.forecast_ms:g} ms")
+        for label, graph, state in (("sequential", sequential, anomalous), ("fan-out, full path", fan_out, anomalous),
+                                    ("fan-out, fast path", fan_out, steady)):
+            median, worst = measure(graph, args.runs, state)
+            print(f"{label:<18} median {median:>8.2f} ms   max {worst:>8.2f} ms")
+        print(f"paths taken: {workflow.route_stats()['paths']}")
+    finally:
+        learning.LEARNING_LOG = previous
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
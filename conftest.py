@@ -0,0 +1,34 @@
+"""
+Shared pytest fixtures - throwaway sales database and learning log
+"""
+
+import pytest
+
+import database
+import decision_history
+import agents.learning_agent as learning
+from agents.log_writer import get_writer
+
+SALES_TABLE = ("CREATE TABLE sales (id INTEGER PRIMARY KEY, date TEXT, amount REAL, "
+               "product TEXT, region TEXT, salesperson TEXT, customer_id INTEGER)")
+
+
+@pytest.fixture
+def temp_database(tmp_path):
+    """Point ``database`` at an empty ``sales`` table in ``tmp_path``; the previous URL is restored afterwards."""
+    previous = database.DATABASE_URL
+    # set_database_url, not a plain attribute patch: open connections and the engine must be dropped too
+    database.set_database_url(f"sqlite:///{tmp_path / 'sales.db'}")
+    database.execute(SALES_TABLE)
+    yield
+    database.set_database_url(previous)
+
+
+@pytest.fixture
+def learning_log(tmp_path, monkeypatch):
+    """Path of a learning log in ``tmp_path`` that the learning agent and the decision history use."""
+    path = str(tmp_path / "learning_log.jsonl")
+    monkeypatch.setattr(learning, "LEARNING_LOG", path)
+    monkeypatch.setattr(decision_history, "LEARNING_LOG", path)
+    yield path
+    get_writer(path).close()
@@ -1,14 +1,303 @@
-from sqlalchemy import create_engine, Column, Integer, Float
+"""Shared data-access layer for the agents and the API.
+
+``DATABASE_URL`` (default ``sqlite:///sales.db``) selects the database.
+
+- SQLite: every thread keeps one long-lived ``sqlite3`` connection in WAL mode
+  with ``synchronous=NORMAL``, so requests never pay for connection setup, and
+  readers never block on the writer. Each connection caches its prepared
+  statements, so constant SQL strings are parsed once per thread.
+- Server databases (PostgreSQL, MySQL, ...): queries go through the pooled
+  SQLAlchemy ``engine`` below.
+
+Queries are written once with ``:name`` parameters and run on either backend
+through ``query``, ``query_one``, ``scalar``, ``execute`` and ``executemany``.
+
+Async callers (the workflow under ``ainvoke``) read through ``aquery``,
+``aquery_one`` and ``ascalar``: on SQLite with ``aiosqlite`` installed they
+share a small per-event-loop pool of ``aiosqlite`` connections
+(``DB_ASYNC_POOL_SIZE``), otherwise the sync call runs in the loop's default
+worker threads. Either way the thread count stays fixed under load. Await
+``aclose`` before the loop ends (the API does on shutdown): each pooled
+connection owns a thread that keeps the process alive until closed.
+"""
+import os
+import asyncio
+import sqlite3
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+from sqlalchemy import create_engine, text, Column, ForeignKey, Integer, Float, String
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-# Use check_same_thread=False for SQLite + FastAPI compatibility
-engine = create_engine("sqlite:///enterprise.db", connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///sales.db")
+# Prepared statements kept per SQLite connection
+STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+# Milliseconds a SQLite writer waits for a lock before failing
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# aiosqlite connections per event loop (each runs on its own thread)
+ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "4"))
+
+try:
+    import aiosqlite
+except ImportError:  # optional: async reads fall back to worker threads
+    aiosqlite = None
+
+_local = threading.local()
+_lock = threading.Lock()
+# Bumped by set_database_url so threads reopen their connections
+_generation = 0
+engine = None
+SessionLocal = None
 Base = declarative_base()
 
+
 class Sales(Base):
     __tablename__ = "sales"
     id = Column(Integer, primary_key=True, index=True)
-    value = Column(Float)
+    date = Column(String)
+    amount = Column(Float)
+    product = Column(String)
+    region = Column(String)
+    salesperson = Column(String)
+    customer_id = Column(Integer, ForeignKey("customers.id"))
+
+
+class Customer(Base):
+    __tablename__ = "customers"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    email = Column(String)
+    industry = Column(String)
+    lifetime_value = Column(Float)
+    created_date = Column(String)
+
+
+def is_sqlite(url=None):
+    return (url or DATABASE_URL).startswith("sqlite")
+
+
+def sqlite_path(url=None):
+    """File path of a ``sqlite:///path`` URL."""
+    url = url or DATABASE_URL
+    return url.split("///", 1)[1] if "///" in url else ":memory:"
+
+
+def _create_engine(url):
+    if is_sqlite(url):
+        # Use check_same_thread=False for SQLite + FastAPI compatibility
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                         pool_pre_ping=True, pool_recycle=1800)
+
+
+def set_database_url(url):
+    """Point the layer at another database (tests, CLIs); open connections are replaced lazily."""
+    global DATABASE_URL, engine, SessionLocal, _generation
+    with _lock:
+        old_engine = engine
+        DATABASE_URL = url
+        engine = _create_engine(url)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        _generation += 1
+    if old_engine is not None:
+        old_engine.dispose()
+    close_connection()
+
+
+def get_connection():
+    """This thread's SQLite connection, opened and tuned on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+    if conn is not None:
+        conn.close()
+    if not is_sqlite():
+        raise RuntimeError(f"get_connection() is SQLite-only; use engine for {DATABASE_URL}")
+    conn = sqlite3.connect(sqlite_path(), cached_statements=STATEMENT_CACHE, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    _local.conn = conn
+    _local.generation = _generation
+    _local.depth = 0
+    return conn
+
+
+def close_connection():
+    """Close this thread's SQLite connection, if any."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction():
+    """Run the enclosed statements in one transaction; nested blocks join the outer one.
+
+    Yields a connection that accepts ``execute``/``executemany`` with ``:name`` params.
+    """
+    if not is_sqlite():
+        with engine.begin() as conn:
+            yield _ServerConnection(conn)
+        return
+    conn = get_connection()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    _local.depth = 1
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+    finally:
+        _local.depth = 0
+
+
+class _ServerConnection:
+    """Gives a SQLAlchemy connection the ``execute``/``executemany`` shape of ``sqlite3``."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, params=None):
+        return self._conn.execute(text(sql), params or {})
+
+    def executemany(self, sql, rows):
+        return self._conn.execute(text(sql), list(rows))
+
+
+def query(sql, params=None):
+    """All rows of a read query as tuples."""
+    if is_sqlite():
+        return get_connection().execute(sql, params or {}).fetchall()
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(sql), params or {})]
+
+
+def query_one(sql, params=None):
+    """First row of a read query, or ``None``."""
+    if is_sqlite():
+        return get_connection().execute(sql, params or {}).fetchone()
+    with engine.connect() as conn:
+        row = conn.execute(text(sql), params or {}).first()
+        return tuple(row) if row is not None else None
+
+
+def scalar(sql, params=None, default=None):
+    """First column of the first row, or ``default``."""
+    row = query_one(sql, params)
+    return row[0] if row is not None and row[0] is not None else default
+
+
+def execute(sql, params=None):
+    """Run one write statement in its own (or the enclosing) transaction."""
+    with transaction() as conn:
+        conn.execute(sql, params or {})
+
+
+def executemany(sql, rows):
+    """Run one write statement for every parameter set, in one transaction."""
+    with transaction() as conn:
+        conn.executemany(sql, rows)
+
+
+class _AsyncPool:
+    """aiosqlite connections of one event loop, opened on demand up to ``size``."""
+
+    def __init__(self, size, generation):
+        self.size = size
+        self.generation = generation
+        self.opened = 0
+        self.closed = False
+        self.idle = asyncio.Queue()
+
+    async def _open(self):
+        conn = await aiosqlite.connect(sqlite_path(), cached_statements=STATEMENT_CACHE, isolation_level=None)
+        await conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        await conn.execute("PRAGMA journal_mode = WAL")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        if self.idle.empty() and self.opened < self.size:
+            self.opened += 1
+            try:
+                conn = await self._open()
+            except BaseException:
+                self.opened -= 1
+                raise
+        else:
+            conn = await self.idle.get()
+        try:
+            yield conn
+        finally:
+            if self.generation == _generation and not self.closed:
+                self.idle.put_nowait(conn)
+            else:
+                # Database switched, or pool closed, while the connection was out
+                await conn.close()
+
+    async def close(self):
+        self.closed = True
+        while not self.idle.empty():
+            await self.idle.get_nowait().close()
+
+
+_async_pools = weakref.WeakKeyDictionary()
+
+
+async def _async_pool():
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None or pool.generation != _generation:
+        if pool is not None:
+            await pool.close()
+        pool = _async_pools[loop] = _AsyncPool(ASYNC_POOL_SIZE, _generation)
+    return pool
+
+
+async def aclose():
+    """Close the running loop's ``aiosqlite`` connections; the next ``aquery`` reopens them."""
+    pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+async def aquery(sql, params=None):
+    """``query`` for coroutines."""
+    if aiosqlite is None or not is_sqlite():
+        return await asyncio.to_thread(query, sql, params)
+    async with (await _async_pool()).connection() as conn:
+        async with conn.execute(sql, params or {}) as cursor:
+            return await cursor.fetchall()
+
+
+async def aquery_one(sql, params=None):
+    """``query_one`` for coroutines."""
+    if aiosqlite is None or not is_sqlite():
+        return await asyncio.to_thread(query_one, sql, params)
+    async with (await _async_pool()).connection() as conn:
+        async with conn.execute(sql, params or {}) as cursor:
+            return await cursor.fetchone()
+
+
+async def ascalar(sql, params=None, default=None):
+    """``scalar`` for coroutines."""
+    row = await aquery_one(sql, params)
+    return row[0] if row is not None and row[0] is not None else default
+
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+set_database_url(DATABASE_URL)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""Indexed history of workflow decisions, compacted from the learning log.
+
+The learning agent appends one JSON line per workflow run to the learning
+log (the active file plus rotated, gzipped segments, see
+``agents.log_writer``). ``compact`` ingests the lines added since its last
+run into ``decision_history``, one row per run with indexes on time, anomaly
+flag, decision code, z-score band and segment. The same transaction keeps
+``decision_daily`` up to date: a rollup per day x decision code x band x
+anomaly flag. The read position (last closed segment, byte offset into the
+next file) is stored with the rows, so no line is ingested twice or skipped.
+
+Runs with a model forecast log the day the forecast is for. Once that day
+has settled in ``sales_daily``, ``compact`` fills in the actual total and
+adds the forecast error to the rollup.
+
+Listings use the indexes and a limit; per-day aggregations read only the
+rollup, so neither scans the history. Readers never compact: the API
+process runs a ``Compactor`` thread that calls ``compact`` every
+``HISTORY_COMPACT_INTERVAL`` seconds.
+
+    python decision_history.py compact                       # ingest new log lines
+    python decision_history.py daily --start 2026-10-01      # per-day decisions and forecast error
+    python decision_history.py runs --anomaly --code 1       # latest matching runs
+"""
+import os
+import sys
+import gzip
+import json
+import argparse
+import threading
+
+import database
+from agents.decision_rules import DecisionCode, code_from_text
+from agents.learning_agent import LEARNING_LOG
+from agents.log_writer import segments
+from agents.monitor_agent import z_score_band
+
+# Seconds between background compactions (Compactor)
+COMPACT_INTERVAL = float(os.getenv("HISTORY_COMPACT_INTERVAL", "30"))
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS decision_history (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        day TEXT NOT NULL,
+        segment TEXT,
+        anomaly INTEGER NOT NULL,
+        z_score REAL,
+        z_band TEXT NOT NULL,
+        decision_code INTEGER NOT NULL,
+        latest_sales REAL,
+        forecast_sales REAL,
+        forecast_model TEXT,
+        forecast_day TEXT,
+        actual_sales REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS history_by_time ON decision_history (timestamp)",
+    "CREATE INDEX IF NOT EXISTS history_by_anomaly ON decision_history (anomaly, timestamp)",
+    "CREATE INDEX IF NOT EXISTS history_by_code ON decision_history (decision_code, timestamp)",
+    "CREATE INDEX IF NOT EXISTS history_by_band ON decision_history (z_band, timestamp)",
+    "CREATE INDEX IF NOT EXISTS history_by_segment ON decision_history (segment, timestamp)",
+    # Forecasts whose day has not been scored yet
+    "CREATE INDEX IF NOT EXISTS history_pending ON decision_history (forecast_day) "
+    "WHERE actual_sales IS NULL AND forecast_day IS NOT NULL",
+    """
+    CREATE TABLE IF NOT EXISTS decision_daily (
+        day TEXT NOT NULL,
+        decision_code INTEGER NOT NULL,
+        z_band TEXT NOT NULL,
+        anomaly INTEGER NOT NULL,
+        runs INTEGER NOT NULL DEFAULT 0,
+        latest_sum REAL NOT NULL DEFAULT 0,
+        forecast_sum REAL NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0,
+        abs_error_sum REAL NOT NULL DEFAULT 0,
+        pct_errors INTEGER NOT NULL DEFAULT 0,
+        pct_error_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, decision_code, z_band, anomaly)
+    ) WITHOUT ROWID
+    """,
+    "CREATE TABLE IF NOT EXISTS history_meta (name TEXT PRIMARY KEY, value TEXT)",
+)
+
+INSERT_SQL = ("INSERT INTO decision_history (timestamp, day, segment, anomaly, z_score, z_band, decision_code, "
+              "latest_sales, forecast_sales, forecast_model, forecast_day) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+# Rollup of the rows after :first_id, added onto existing days
+ROLLUP_RUNS_SQL = """
+    INSERT INTO decision_daily (day, decision_code, z_band, anomaly, runs, latest_sum, forecast_sum)
+    SELECT day, decision_code, z_band, anomaly, COUNT(*), TOTAL(latest_sales), TOTAL(forecast_sales)
+    FROM decision_history WHERE id > :first_id
+    GROUP BY day, decision_code, z_band, anomaly
+    ON CONFLICT (day, decision_code, z_band, anomaly) DO UPDATE SET
+        runs = runs + excluded.runs,
+        latest_sum = latest_sum + excluded.latest_sum,
+        forecast_sum = forecast_sum + excluded.forecast_sum
+"""
+
+ROLLUP_ERRORS_SQL = """
+    INSERT INTO decision_daily (day, decision_code, z_band, anomaly, errors, abs_error_sum,
+                                pct_errors, pct_error_sum)
+    SELECT day, decision_code, z_band, anomaly, COUNT(*), TOTAL(ABS(forecast_sales - actual)),
+           COUNT(CASE WHEN actual > 0 THEN 1 END),
+           TOTAL(CASE WHEN actual > 0 THEN ABS(forecast_sales - actual) / actual END)
+    FROM temp.history_actuals
+    GROUP BY day, decision_code, z_band, anomaly
+    ON CONFLICT (day, decision_code, z_band, anomaly) DO UPDATE SET
+        errors = errors + excluded.errors,
+        abs_error_sum = abs_error_sum + excluded.abs_error_sum,
+        pct_errors = pct_errors + excluded.pct_errors,
+        pct_error_sum = pct_error_sum + excluded.pct_error_sum
+"""
+
+RUN_COLUMNS = ("id", "timestamp", "segment", "anomaly", "z_score", "z_band", "decision_code", "latest_sales",
+               "forecast_sales", "forecast_model", "forecast_day", "actual_sales")
+
+
+def install(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def _meta(conn, name, default=None):
+    row = conn.execute("SELECT value FROM history_meta WHERE name = :name", {"name": name}).fetchone()
+    return row[0] if row is not None else default
+
+
+def _set_meta(conn, name, value):
+    conn.execute("INSERT INTO history_meta (name, value) VALUES (:name, :value) "
+                 "ON CONFLICT (name) DO UPDATE SET value = excluded.value", {"name": name, "value": str(value)})
+
+
+def _row(line):
+    """``INSERT_SQL`` parameters of one log line, or ``None`` if it is not a run record."""
+    try:
+        record = json.loads(line)
+        timestamp = str(record["timestamp"])
+        z_score = float(record["z_score"]) if record.get("z_score") is not None else None
+        # Lines written before decision codes were logged carry only the text
+        code = int(record.get("decision_code") or code_from_text(record.get("decision")) or 0)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return (timestamp, timestamp[:10], record.get("segment"), int(bool(record.get("anomaly"))), z_score,
+            z_score_band(z_score), code, record.get("latest_sales"), record.get("forecast_sales"),
+            record.get("forecast_model"), record.get("forecast_day"))
+
+
+def _stem(path):
+    name = os.path.basename(path)
+    return name[:-3] if name.endswith(".gz") else name
+
+
+def _read(path, offset, position, report):
+    """Rows of the complete lines of ``path`` from byte ``offset``; ``position["offset"]`` follows."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Being written right now; picked up next time
+                break
+            offset += len(line)
+            position["offset"] = offset
+            row = _row(line)
+            if row is None:
+                report["rejected"] += 1
+                continue
+            report["records"] += 1
+            yield row
+
+
+def _fill_actuals(conn):
+    """Score forecasts whose day has settled; returns how many."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sales_daily'").fetchone():
+        return 0
+    latest = conn.execute("SELECT MAX(day) FROM sales_daily").fetchone()[0]
+    if latest is None:
+        return 0
+    conn.execute("DROP TABLE IF EXISTS temp.history_actuals")
+    # Days without sales in a known segment count as zero, as in sales_daily
+    conn.execute(
+        "CREATE TEMP TABLE history_actuals AS "
+        "SELECT h.id, h.day, h.decision_code, h.z_band, h.anomaly, h.forecast_sales, IFNULL(d.total, 0) AS actual "
+        "FROM decision_history h LEFT JOIN sales_daily d ON d.segment = h.segment AND d.day = h.forecast_day "
+        "WHERE h.actual_sales IS NULL AND h.forecast_day IS NOT NULL AND h.forecast_day < :latest",
+        {"latest": latest})
+    scored = conn.execute("SELECT COUNT(*) FROM temp.history_actuals").fetchone()[0]
+    if scored:
+        conn.execute("UPDATE decision_history SET actual_sales = "
+                     "(SELECT actual FROM temp.history_actuals a WHERE a.id = decision_history.id) "
+                     "WHERE id IN (SELECT id FROM temp.history_actuals)")
+        conn.execute(ROLLUP_ERRORS_SQL)
+    conn.execute("DROP TABLE temp.history_actuals")
+    return scored
+
+
+def compact(path=None):
+    """Ingest the log lines written since the last compaction; returns ``{"records", "rejected", "scored"}``."""
+    path = path or LEARNING_LOG
+    report = {"records": 0, "rejected": 0, "scored": 0}
+    with database.transaction() as conn:
+        install(conn)
+        # Read position, inside the transaction: concurrent compactions queue up behind it
+        last_segment = _meta(conn, "log_segment", "")
+        offset = int(_meta(conn, "log_offset", "0"))
+        first_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM decision_history").fetchone()[0]
+        files = [name for name in segments(path) if name == path or _stem(name) > last_segment]
+        for name in files:
+            try:
+                if name == path and os.path.getsize(name) < offset:
+                    # Replaced or truncated since the last run
+                    offset = 0
+                position = {"offset": offset}
+                conn.executemany(INSERT_SQL, _read(name, offset, position, report))
+            except FileNotFoundError:
+                # Rotated or compressed meanwhile; its new name is read next time
+                break
+            if name == path:
+                offset = position["offset"]
+            else:
+                last_segment, offset = _stem(name), 0
+        _set_meta(conn, "log_segment", last_segment)
+        _set_meta(conn, "log_offset", offset)
+        if report["records"]:
+            conn.execute(ROLLUP_RUNS_SQL, {"first_id": first_id})
+        report["scored"] = _fill_actuals(conn)
+    return report
+
+
+class Compactor:
+    """Background thread running ``compact`` every ``interval`` seconds, off the request path."""
+
+    def __init__(self, path=None, interval=COMPACT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.compactions = 0
+        self.records = 0
+        self.errors = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Tables exist before the first query, even if the first pass is still running
+        with database.transaction() as conn:
+            install(conn)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="history-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop after the running pass (if any), then compact once more."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+            self.run_once()
+
+    def run_once(self):
+        try:
+            self.records += compact(self.path)["records"]
+            self.compactions += 1
+        except Exception as e:
+            self.errors += 1
+            self.last_error = repr(e)
+
+    def _run(self):
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def stats(self):
+        return {"compactions": self.compactions, "records": self.records, "errors": self.errors,
+                "last_error": self.last_error, "interval": self.interval}
+
+
+def _filters(start=None, end=None, anomaly=None, decision_code=None, z_band=None, column="timestamp"):
+    conditions, params = [], {}
+    if start:
+        conditions.append(f"{column} >= :start")
+        params["start"] = start
+    if end:
+        conditions.append(f"{column} <= :end")
+        # A date alone includes the whole day
+        params["end"] = end + "T99" if len(end) == 10 and column == "timestamp" else end
+    if anomaly is not None:
+        conditions.append("anomaly = :anomaly")
+        params["anomaly"] = int(bool(anomaly))
+    if decision_code is not None:
+        conditions.append("decision_code = :decision_code")
+        params["decision_code"] = int(decision_code)
+    if z_band is not None:
+        conditions.append("z_band = :z_band")
+        params["z_band"] = z_band
+    return conditions, params
+
+
+def runs(start=None, end=None, anomaly=None, decision_code=None, z_band=None, segment=None, limit=100):
+    """Latest runs matching the filters, newest first; ``start`` / ``end`` are ISO dates or timestamps."""
+    conditions, params = _filters(start, end, anomaly, decision_code, z_band)
+    if segment is not None:
+        conditions.append("segment = :segment")
+        params["segment"] = segment
+    params["limit"] = limit
+    rows = database.query(f"SELECT {', '.join(RUN_COLUMNS)} FROM decision_history "
+                          f"WHERE {' AND '.join(conditions) or '1'} ORDER BY timestamp DESC LIMIT :limit", params)
+    return [dict(zip(RUN_COLUMNS, row), anomaly=bool(row[3])) for row in rows]
+
+
+def _code_name(code):
+    return DecisionCode(code).name if code in DecisionCode._value2member_map_ else "UNKNOWN"
+
+
+def daily(start=None, end=None, anomaly=None, decision_code=None, z_band=None):
+    """Per-day runs, anomalies, decision counts and forecast error (MAE / MAPE) from the rollup."""
+    conditions, params = _filters(start, end, anomaly, decision_code, z_band, column="day")
+    rows = database.query(
+        "SELECT day, decision_code, SUM(runs), SUM(runs * anomaly), TOTAL(latest_sum), TOTAL(forecast_sum), "
+        "SUM(errors), TOTAL(abs_error_sum), SUM(pct_errors), TOTAL(pct_error_sum) "
+        f"FROM decision_daily WHERE {' AND '.join(conditions) or '1'} GROUP BY day, decision_code ORDER BY day",
+        params)
+    days = {}
+    for day, code, count, anomalies, latest, forecast, errors, abs_error, pct_errors, pct_error in rows:
+        summary = days.setdefault(day, {"day": day, "runs": 0, "anomalies": 0, "decisions": {}, "latest_sum": 0.0,
+                                        "forecast_sum": 0.0, "errors": 0, "abs_error": 0.0, "pct_errors": 0,
+                                        "pct_error": 0.0})
+        summary["decisions"][_code_name(code)] = count
+        for key, value in (("runs", count), ("anomalies", anomalies), ("latest_sum", latest),
+                           ("forecast_sum", forecast), ("errors", errors), ("abs_error", abs_error),
+                           ("pct_errors", pct_errors), ("pct_error", pct_error)):
+            summary[key] += value
+    result = []
+    for summary in days.values():
+        runs_count, errors, pct_errors = summary["runs"], summary.pop("errors"), summary.pop("pct_errors")
+        result.append({
+            "day": summary["day"],
+            "runs": runs_count,
+            "anomalies": summary["anomalies"],
+            "decisions": summary["decisions"],
+            "mean_latest_sales": summary.pop("latest_sum") / runs_count if runs_count else None,
+            "mean_forecast_sales": summary.pop("forecast_sum") / runs_count if runs_count else None,
+            "forecast_errors": errors,
+            "forecast_mae": summary.pop("abs_error") / errors if errors else None,
+            "forecast_mape": summary.pop("pct_error") / pct_errors if pct_errors else None,
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queryable decision history compacted from the learning log")
+    parser.add_argument("command", choices=["compact", "daily", "runs"])
+    parser.add_argument("--log", default=LEARNING_LOG, help=f"Learning log (default: {LEARNING_LOG})")
+    parser.add_argument("--start", default=None, help="ISO date or timestamp")
+    parser.add_argument("--end", default=None, help="ISO date or timestamp (a date includes the whole day)")
+    parser.add_argument("--anomaly", action="store_true", default=None, help="Anomalous runs only")
+    parser.add_argument("--code", type=int, default=None, help="Decision code")
+    parser.add_argument("--band", default=None, help="z-score band (critical, significant, moderate, normal)")
+    parser.add_argument("--segment", default=None, help="Segment key, e.g. product=Product A|region=North")
+    parser.add_argument("--limit", type=int, default=20, help="Runs to list (default: 20)")
+    args = parser.parse_args()
+
+    report = compact(args.log)
+    print(f"✅ {report['records']:,} new runs compacted, {report['rejected']:,} lines rejected, "
+          f"{report['scored']:,} forecasts scored")
+    if args.command == "daily":
+        for day in daily(args.start, args.end, args.anomaly, args.code, args.band):
+            mae = f"${day['forecast_mae']:,.0f}" if day["forecast_mae"] is not None else "-"
+            print(f"   {day['day']}: {day['runs']:,} runs, {day['anomalies']:,} anomalies, forecast MAE {mae}, "
+                  f"{day['decisions']}")
+    elif args.command == "runs":
+        for run in runs(args.start, args.end, args.anomaly, args.code, args.band, args.segment, args.limit):
+            print(f"   {run['timestamp']} {run['segment'] or '-'}: z={run['z_score']}, "
+                  f"{_code_name(run['decision_code'])}, forecast {run['forecast_sales']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
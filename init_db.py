@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 """Initialize database with sample sales data for SQL agent."""
 
-import sqlite3
 from datetime import datetime, timedelta
 import random
 
+import database
+import load_sales
+import rolling_stats
+import sales_aggregates
+import sales_queries
+
 def init_database():
     """Create database and populate with sample data."""
-    conn = sqlite3.connect('sales.db')
+    conn = database.get_connection()
+    conn.execute('BEGIN')
     cursor = conn.cursor()
     
     # Create sales table
@@ -18,7 +24,8 @@ def init_database():
             amount REAL,
             product TEXT,
             region TEXT,
-            salesperson TEXT
+            salesperson TEXT,
+            customer_id INTEGER REFERENCES customers (id)
         )
     ''')
     
@@ -34,31 +41,17 @@ def init_database():
         )
     ''')
     
+    # Databases created before sales.customer_id existed get the column;
+    # covering indexes for segmented queries (date window, product, region, ...)
+    sales_queries.add_customer_column(conn)
+    sales_queries.create_indexes(conn)
+
     # Clear existing data
     cursor.execute('DELETE FROM sales')
     cursor.execute('DELETE FROM customers')
     
-    # Insert sample sales data
-    products = ['Product A', 'Product B', 'Product C', 'Product D']
-    regions = ['North', 'South', 'East', 'West']
-    salespersons = ['John Smith', 'Jane Doe', 'Bob Johnson', 'Alice Brown']
-    
     base_date = datetime.now() - timedelta(days=365)
-    
-    for i in range(365):
-        current_date = base_date + timedelta(days=i)
-        # Generate 2-5 sales per day
-        for _ in range(random.randint(2, 5)):
-            amount = random.uniform(5000, 50000)
-            product = random.choice(products)
-            region = random.choice(regions)
-            salesperson = random.choice(salespersons)
-            
-            cursor.execute('''
-                INSERT INTO sales (date, amount, product, region, salesperson)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (current_date.strftime('%Y-%m-%d'), amount, product, region, salesperson))
-    
+
     # Insert sample customer data
     industries = ['Technology', 'Finance', 'Healthcare', 'Retail', 'Manufacturing']
     
@@ -78,8 +71,33 @@ def init_database():
             VALUES (?, ?, ?, ?, ?)
         ''', (name, email, industry, ltv, base_date.strftime('%Y-%m-%d')))
     
+    customer_ids = [row[0] for row in cursor.execute('SELECT id FROM customers')]
     conn.commit()
-    conn.close()
+
+    # Insert sample sales data (bulk path: batched inserts, aggregates updated in the same pass)
+    products = ['Product A', 'Product B', 'Product C', 'Product D']
+    regions = ['North', 'South', 'East', 'West']
+    salespersons = ['John Smith', 'Jane Doe', 'Bob Johnson', 'Alice Brown']
+
+    sales = []
+    for i in range(365):
+        current_date = base_date + timedelta(days=i)
+        # Generate 2-5 sales per day
+        for _ in range(random.randint(2, 5)):
+            amount = random.uniform(5000, 50000)
+            product = random.choice(products)
+            region = random.choice(regions)
+            salesperson = random.choice(salespersons)
+            customer_id = random.choice(customer_ids)
+            sales.append((current_date.strftime('%Y-%m-%d'), amount, product, region, salesperson, customer_id))
+    load_sales.load_records(sales)
+    # Planner statistics for the segment indexes
+    conn.execute('ANALYZE')
+
+    # Running count/sum/sum-of-squares per segment, kept up to date by triggers
+    sales_aggregates.install()
+    # Daily totals per segment and rolling 7/30/90-day baselines for the monitor
+    rolling_stats.install()
     print("✅ Database initialized successfully with sample data")
 
 if __name__ == '__main__':
@@ -1,9 +1,6 @@
-import json
-import os
+from agents.log_writer import get_writer
 
 def learning_agent(state):
-    os.makedirs("memory", exist_ok=True)
-    with open("memory/decisions.json", "a") as f:
-        json.dump(dict(state), f)
-        f.write("\n")
-    return state
\ No newline at end of file
+    # Queued for the background log writer, which creates memory/ on first write
+    get_writer("memory/decisions.json").write(dict(state))
+    return state
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Bulk-load sales from CSV, JSONL or Parquet files.
+
+    python load_sales.py sales_2024.csv more_sales.parquet
+
+Rows are inserted with ``executemany`` in large transactions (WAL,
+``synchronous=NORMAL``). Inside each transaction the per-row aggregate
+triggers are dropped, the batch is inserted, the inserted id range is grouped
+once and ``sales_agg`` and ``sales_daily`` are updated from that grouping,
+and the triggers are recreated before commit, so other connections never see
+rows without their aggregates. Rolling windows are refreshed once at the end.
+Also used by ``POST /sales/bulk`` in ``app.py``.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from datetime import date
+from dataclasses import dataclass, asdict
+from itertools import islice
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import database
+import rolling_stats
+import sales_aggregates
+
+COLUMNS = ("date", "amount", "product", "region", "salesperson", "customer_id")
+INSERT_SQL = f"INSERT INTO sales ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+# Rows per executemany call, and per transaction
+BATCH_SIZE = int(os.getenv("SALES_LOAD_BATCH_SIZE", "50000"))
+COMMIT_ROWS = int(os.getenv("SALES_LOAD_COMMIT_ROWS", "1000000"))
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+
+
+@dataclass
+class LoadReport:
+    """Outcome of a bulk load."""
+    rows: int = 0
+    rejected: int = 0
+    transactions: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {**asdict(self), "rows_per_second": round(self.rows_per_second)}
+
+
+def detect_format(path):
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell the format of {path}; expected one of {', '.join(sorted(FORMATS))}")
+    return fmt
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [column for column in ("date", "amount") if column not in header]
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+        positions = [header.index(column) if column in header else None for column in COLUMNS]
+        for row in reader:
+            yield tuple(row[i] if i is not None and i < len(row) else None for i in positions)
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield tuple(record.get(column) for column in COLUMNS)
+
+
+def read_parquet(path, batch_size=BATCH_SIZE):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError(f"{path}: reading Parquet needs pyarrow (pip install pyarrow)") from None
+
+    parquet = pq.ParquetFile(path)
+    names = set(parquet.schema_arrow.names)
+    columns = [column for column in COLUMNS if column in names]
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+        values = [batch.column(column).to_pylist() if column in names else None for column in COLUMNS]
+        yield from zip(*(column if column is not None else [None] * batch.num_rows for column in values))
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "parquet": read_parquet}
+
+
+def _convert(values):
+    """A ``COLUMNS`` tuple ready to insert, or ``None`` if unusable."""
+    day, amount, product, region, salesperson, customer_id = values
+    try:
+        amount = float(amount)
+        customer_id = int(customer_id) if customer_id not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+    if not day or amount != amount:
+        return None
+    try:
+        # julianday() of a malformed date is NULL and breaks the rolling windows
+        day = date.fromisoformat(str(day)[:10]).isoformat()
+    except ValueError:
+        return None
+    return (day, amount, product or None, region or None, salesperson or None, customer_id)
+
+
+def _drop_indexes():
+    """Drop the secondary indexes of ``sales``; returns their ``CREATE INDEX`` statements."""
+    with database.transaction() as conn:
+        indexes = conn.execute("SELECT name, sql FROM sqlite_master "
+                               "WHERE type = 'index' AND tbl_name = 'sales' AND sql IS NOT NULL").fetchall()
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX {name}")
+    return [sql for _, sql in indexes]
+
+
+def load_records(records, batch_size=BATCH_SIZE, commit_rows=COMMIT_ROWS, progress=None, defer_indexes=False):
+    """Insert ``(date, amount, product, region, salesperson, customer_id)`` tuples; returns a ``LoadReport``.
+
+    ``progress`` is called with the report after every batch. With
+    ``defer_indexes`` the secondary indexes of ``sales`` are dropped for the
+    load and rebuilt by sorting afterwards, which is much faster than updating
+    them row by row when the load is large relative to the table.
+    """
+    started = time.perf_counter()
+    if defer_indexes:
+        indexes = _drop_indexes()
+        try:
+            report = load_records(records, batch_size, commit_rows, progress)
+        finally:
+            with database.transaction() as conn:
+                for statement in indexes:
+                    conn.execute(statement)
+        report.seconds = time.perf_counter() - started
+        return report
+    report = LoadReport()
+    maintain_aggregates = sales_aggregates.is_installed()
+    maintain_daily = rolling_stats.is_installed()
+
+    def converted():
+        for values in records:
+            row = _convert(values)
+            if row is None:
+                report.rejected += 1
+            else:
+                yield row
+
+    rows = converted()
+    exhausted = False
+    while not exhausted:
+        with database.transaction() as conn:
+            first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0]
+            if maintain_aggregates:
+                sales_aggregates.drop_triggers(conn)
+            if maintain_daily:
+                rolling_stats.drop_triggers(conn)
+            inserted = 0
+            while inserted < commit_rows:
+                batch = list(islice(rows, min(batch_size, commit_rows - inserted)))
+                if not batch:
+                    exhausted = True
+                    break
+                conn.executemany(INSERT_SQL, batch)
+                inserted += len(batch)
+                report.rows += len(batch)
+                if progress:
+                    report.seconds = time.perf_counter() - started
+                    progress(report)
+            if inserted:
+                # One grouped scan of the inserted id range feeds both aggregate tables
+                if maintain_aggregates or maintain_daily:
+                    sales_aggregates.collect_rows(conn, "id > :first_id", {"first_id": first_id})
+                if maintain_aggregates:
+                    sales_aggregates.apply_delta(conn)
+                if maintain_daily:
+                    rolling_stats.apply_delta(conn)
+                conn.execute("DROP TABLE IF EXISTS temp.sales_delta")
+                report.transactions += 1
+            if maintain_aggregates:
+                sales_aggregates.create_triggers(conn)
+            if maintain_daily:
+                rolling_stats.create_triggers(conn)
+
+    if maintain_daily and report.rows:
+        rolling_stats.refresh()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def load_file(path, fmt=None, **kwargs):
+    """Bulk-load one CSV / JSONL / Parquet file; see ``load_records``."""
+    fmt = fmt or detect_format(path)
+    if fmt not in READERS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(READERS)}")
+    return load_records(READERS[fmt](path), **kwargs)
+
+
+def _print_progress(report):
+    print(f"\r  {report.rows:>12,} rows  {report.rows_per_second:>10,.0f} rows/s", end="", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load sales rows from CSV, JSONL or Parquet")
+    parser.add_argument("files", nargs="+", help="Files to load (format from the extension)")
+    parser.add_argument("--format", choices=sorted(READERS), default=None, help="Override format detection")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Rows per executemany (default: {BATCH_SIZE})")
+    parser.add_argument("--commit-rows", type=int, default=COMMIT_ROWS,
+                        help=f"Rows per transaction (default: {COMMIT_ROWS})")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="Drop the sales indexes during the load and rebuild them afterwards")
+    args = parser.parse_args()
+
+    total = LoadReport()
+    for path in args.files:
+        print(f"📥 {path}", file=sys.stderr)
+        try:
+            report = load_file(path, args.format, batch_size=args.batch_size, commit_rows=args.commit_rows,
+                               progress=_print_progress, defer_indexes=args.defer_indexes)
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            return 1
+        print(file=sys.stderr)
+        print(f"✅ {path}: {report.rows:,} rows in {report.seconds:.2f}s "
+              f"({report.rows_per_second:,.0f} rows/s), {report.rejected:,} rejected")
+        total.rows += report.rows
+        total.rejected += report.rejected
+        total.seconds += report.seconds
+    if len(args.files) > 1:
+        print(f"Total: {total.rows:,} rows, {total.rows_per_second:,.0f} rows/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
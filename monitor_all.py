@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Hourly anomaly scan of every product x region x salesperson series.
+
+Refreshes the columnar sales snapshot, scores all series in one vectorized
+pass (``agents.batch_monitor``) and, with ``--run-workflow``, sends only the
+flagged series through the full agent workflow.
+
+    python monitor_all.py                    # score and list flagged series
+    python monitor_all.py --run-workflow     # ... and run the agents on them
+    python monitor_all.py --segments         # score the snapshot's precomputed segments instead
+"""
+import sys
+import time
+import argparse
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import sales_snapshot
+from agents.batch_monitor import run_batch, score_series, snapshot_series
+from agents.monitor_agent import BASELINE_WINDOW
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized anomaly scan over all sales series")
+    parser.add_argument("--window", type=int, default=BASELINE_WINDOW,
+                        help=f"Baseline days before the latest day (default: {BASELINE_WINDOW})")
+    parser.add_argument("--segments", action="store_true",
+                        help="Score the snapshot's segments (all, product, region, ...) instead of "
+                             "product x region x salesperson")
+    parser.add_argument("--snapshot", default=sales_snapshot.SNAPSHOT_DIR, help="Snapshot directory")
+    parser.add_argument("--no-refresh", action="store_true", help="Use the snapshot as it is")
+    parser.add_argument("--run-workflow", action="store_true", help="Run the agent workflow for flagged series")
+    parser.add_argument("--top", type=int, default=20, help="Flagged series to list (default: 20)")
+    args = parser.parse_args()
+
+    if not args.no_refresh:
+        sales_snapshot.refresh(args.snapshot)
+    snapshot = sales_snapshot.open_snapshot(args.snapshot)
+    if snapshot is None or not snapshot.rows:
+        print("❌ No sales in the snapshot")
+        return 1
+
+    started = time.perf_counter()
+    segments, values = snapshot_series(snapshot, args.window, by=None if args.segments else
+                                       ("product", "region", "salesperson"))
+    if not len(segments):
+        print("❌ No series with sales in the window")
+        return 1
+    if args.run_workflow:
+        result, outputs = run_batch(values, segments, args.window)
+    else:
+        result, outputs = score_series(values, args.window), []
+    elapsed = time.perf_counter() - started
+    flagged = result[result["anomaly"]]
+    print(f"✅ {len(result):,} series scored in {elapsed * 1000:.1f} ms "
+          f"(as of {snapshot.days[-1]}), {len(flagged):,} flagged")
+
+    for row in flagged[:args.top]:
+        segment = ", ".join(f"{name}={value}" for name, value in segments[row["series"]].items()) or "all"
+        print(f"   {segment}: ${row['latest']:,.0f} vs mean ${row['mean']:,.0f} "
+              f"(z={row['z']:+.2f}, robust={row['mad_score']:+.2f})")
+    for output in outputs[:args.top]:
+        print(f"   → {output.get('baseline_segment')}: {output.get('decision')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import CharacterTextSplitter
 from langchain_community.document_loaders import TextLoader
 from dotenv import load_dotenv
+from agents.embedding_cache import CachedEmbeddings
 
 load_dotenv()
 
@@ -13,7 +14,8 @@ def rag_agent(state):
         state["rag_insight"] = "No knowledge documents found."
         return state
 
-    embeddings = OpenAIEmbeddings() # Requires OPENAI_API_KEY in .env
+    # Requires OPENAI_API_KEY in .env; chunks embedded before are read from the on-disk cache
+    embeddings = CachedEmbeddings(OpenAIEmbeddings())
     docs = []
     
     for file in os.listdir(docs_path):
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Incrementally re-index the RAG knowledge base after documents change.
+
+With ``--workers N`` the whole index is rebuilt offline instead, with the
+documents sharded across N processes (local embedder only).
+"""
+
+import sys
+import argparse
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from agents.embedders import EMBEDDERS, get_embedder
+from agents.rag_index import BATCH_SIZE, DOCS_PATH, INDEX_PATH, build_index, update_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the FAISS index for data/knowledge_docs")
+    parser.add_argument("--docs", default=DOCS_PATH, help=f"Knowledge docs directory (default: {DOCS_PATH})")
+    parser.add_argument("--index", default=INDEX_PATH, help=f"Index directory (default: {INDEX_PATH})")
+    parser.add_argument("--full", action="store_true", help="Discard the saved index and re-embed everything")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Chunks embedded per batch (default: {BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Rebuild the whole index in N worker processes (0 = one per CPU)")
+    parser.add_argument("--embedder", choices=["auto", *EMBEDDERS], default=None,
+                        help="Embedding backend (default: $RAG_EMBEDDER or auto)")
+    args = parser.parse_args()
+
+    try:
+        embeddings = get_embedder(args.embedder)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    if args.workers is not None:
+        try:
+            _, update = build_index(embeddings, args.docs, args.index, workers=args.workers or None,
+                                    batch_size=args.batch_size)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+    else:
+        _, update = update_index(embeddings, args.docs, args.index, full=args.full, batch_size=args.batch_size)
+
+    print(f"Added:     {', '.join(update.added) or '-'}")
+    print(f"Changed:   {', '.join(update.changed) or '-'}")
+    print(f"Removed:   {', '.join(update.removed) or '-'}")
+    print(f"Unchanged: {update.unchanged} file(s)")
+    print(f"Chunks embedded: {update.chunks_embedded} in {update.batches} batch(es), deleted: {update.chunks_deleted}")
+    print(f"Throughput: {update.chunks_per_second:,.0f} chunks/s ({update.chunks_seen} chunks streamed)")
+    print(f"✅ Index up to date in {update.seconds:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
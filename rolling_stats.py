@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""Rolling 7/30/90-day statistics of daily sales per segment.
+
+Triggers on ``sales`` keep ``sales_daily`` (one total per segment and day) up
+to date. ``rolling_stats`` holds, per segment and window, Welford's running
+count / mean / M2 over the daily totals inside the window. ``refresh`` brings
+it up to date incrementally:
+
+- days that slid out of a window are removed and days that slid in are added
+  (work proportional to the days crossed, never to the history), and
+- daily totals that changed since the last refresh are swapped in place
+  (remove the counted value, add the new one); a partial index finds them.
+
+Days without sales count as zero from a segment's first sale on, so a
+window's mean is the average daily sales. Lookups are a primary-key read.
+
+    python rolling_stats.py install    # create tables + triggers, backfill, refresh
+    python rolling_stats.py refresh    # advance windows to the latest day
+    python rolling_stats.py check      # recompute from sales_daily and compare
+    python rolling_stats.py rebuild    # recompute from scratch
+"""
+import sys
+import math
+import argparse
+from datetime import date, timedelta
+from dataclasses import dataclass
+
+import database
+import sales_aggregates
+
+WINDOWS = (7, 30, 90)
+# Columns of ``sales`` that segments are cut by, in segment-key order
+SEGMENT_COLUMNS = ("product", "region", "salesperson")
+# Segments kept besides "all": each column alone, plus product x region
+SEGMENTS = (("product",), ("region",), ("salesperson",), ("product", "region"))
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        segment TEXT NOT NULL,
+        day TEXT NOT NULL,
+        total REAL NOT NULL,
+        counted REAL,
+        PRIMARY KEY (segment, day)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS sales_daily_day ON sales_daily (day)",
+    # Days whose total changed since the last refresh
+    "CREATE INDEX IF NOT EXISTS sales_daily_dirty ON sales_daily (segment, day) WHERE counted IS NOT total",
+    """
+    CREATE TABLE IF NOT EXISTS rolling_stats (
+        segment TEXT NOT NULL,
+        window INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        mean REAL NOT NULL,
+        m2 REAL NOT NULL,
+        first_day TEXT NOT NULL,
+        PRIMARY KEY (segment, window)
+    ) WITHOUT ROWID
+    """,
+    "CREATE TABLE IF NOT EXISTS rolling_meta (name TEXT PRIMARY KEY, value TEXT)",
+)
+
+
+def segment_key(product=None, region=None, salesperson=None):
+    """``"all"`` or e.g. ``"product=Product A|region=North"``."""
+    values = {"product": product, "region": region, "salesperson": salesperson}
+    parts = [f"{column}={values[column]}" for column in SEGMENT_COLUMNS if values[column]]
+    return "|".join(parts) or "all"
+
+
+def parse_segment_key(key):
+    """Inverse of ``segment_key``: ``{"product": ..., "region": ...}`` (empty for "all")."""
+    if key == "all":
+        return {}
+    return dict(part.split("=", 1) for part in key.split("|"))
+
+
+def _segment_sql(row, columns):
+    return " || '|' || ".join(f"'{column}=' || {row}.{column}" for column in columns)
+
+
+def _daily_upsert(row, sign):
+    values = [f"('all', {row}.date, {sign} * {row}.amount)"]
+    for columns in SEGMENTS:
+        values.append(f"({_segment_sql(row, columns)}, {row}.date, {sign} * {row}.amount)")
+    # Segments with a NULL column have a NULL key and are dropped by the WHERE
+    return (f"INSERT INTO sales_daily (segment, day, total) "
+            f"SELECT * FROM (VALUES {', '.join(values)}) WHERE column1 IS NOT NULL "
+            f"ON CONFLICT (segment, day) DO UPDATE SET total = total + excluded.total;")
+
+
+def create_triggers(conn):
+    triggers = {
+        "sales_daily_insert": ("AFTER INSERT ON sales", "NEW", 1),
+        "sales_daily_delete": ("AFTER DELETE ON sales", "OLD", -1),
+        "sales_daily_update_old": ("AFTER UPDATE OF date, amount, product, region, salesperson ON sales", "OLD", -1),
+        "sales_daily_update_new": ("AFTER UPDATE OF date, amount, product, region, salesperson ON sales", "NEW", 1),
+    }
+    for name, (event, row, sign) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} "
+                     f"WHEN {row}.amount IS NOT NULL AND {row}.date IS NOT NULL BEGIN {_daily_upsert(row, sign)} END")
+
+
+def drop_triggers(conn):
+    for name in ("sales_daily_insert", "sales_daily_delete", "sales_daily_update_old", "sales_daily_update_new"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def apply_delta(conn):
+    """Add ``temp.sales_delta`` (see ``sales_aggregates.collect_rows``) to ``sales_daily``.
+
+    The next ``refresh`` picks the changed days up.
+    """
+    selects = ["SELECT 'all', date, SUM(total) FROM sales_delta WHERE date IS NOT NULL GROUP BY date"]
+    for columns in SEGMENTS:
+        key = " || '|' || ".join(f"'{column}=' || {column}" for column in columns)
+        not_null = " AND ".join(f"{column} IS NOT NULL" for column in columns)
+        selects.append(f"SELECT {key}, date, SUM(total) FROM sales_delta "
+                       f"WHERE date IS NOT NULL AND {not_null} GROUP BY {key}, date")
+    for select in selects:
+        conn.execute(f"INSERT INTO sales_daily (segment, day, total) {select} "
+                     f"ON CONFLICT (segment, day) DO UPDATE SET total = total + excluded.total")
+
+
+def apply_rows(conn, where="1", params=None):
+    """Add the sales rows matching ``where`` to ``sales_daily`` (backfill, bulk loads without triggers)."""
+    sales_aggregates.collect_rows(conn, where, params)
+    apply_delta(conn)
+
+
+def is_installed():
+    return database.scalar("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = :name",
+                           {"name": "sales_daily_insert"}, default=0) > 0
+
+
+def install():
+    """Create the tables and triggers, backfill ``sales_daily`` and compute the windows."""
+    with database.transaction() as conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        if not is_installed():
+            create_triggers(conn)
+            conn.execute("DELETE FROM sales_daily")
+            apply_rows(conn)
+    refresh()
+
+
+@dataclass
+class RunningStats:
+    """Welford's running count / mean / M2, with removal of earlier values."""
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x):
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        old_mean = self.mean
+        self.n -= 1
+        self.mean -= (x - old_mean) / self.n
+        self.m2 = max(self.m2 - (x - old_mean) * (x - self.mean), 0.0)
+
+    def with_zeros(self, zeros):
+        """Stats after adding ``zeros`` observations of 0 (Chan's parallel merge)."""
+        if zeros <= 0:
+            return RunningStats(self.n, self.mean, self.m2)
+        n = self.n + zeros
+        return RunningStats(n, self.mean * self.n / n, self.m2 + self.mean ** 2 * self.n * zeros / n)
+
+    @property
+    def std(self):
+        """Sample standard deviation (0 below two observations)."""
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+
+@dataclass
+class Baseline:
+    """Mean and standard deviation of daily sales over one window."""
+    segment: str
+    window: int
+    days: int
+    mean: float
+    std: float
+
+
+def _day(text):
+    return date.fromisoformat(text)
+
+
+def _as_of():
+    return database.scalar("SELECT value FROM rolling_meta WHERE name = 'as_of'")
+
+
+def refresh(as_of=None):
+    """Advance every window to ``as_of`` (default: the latest day with sales) and apply changed days."""
+    with database.transaction() as conn:
+        as_of = as_of or conn.execute("SELECT MAX(day) FROM sales_daily").fetchone()[0]
+        if as_of is None:
+            return None
+        old = _as_of()
+        stats = {}
+        first_days = {}
+        for segment, window, n, mean, m2, first_day in conn.execute("SELECT * FROM rolling_stats"):
+            stats[segment, window] = RunningStats(n, mean, m2)
+            first_days[segment] = first_day
+
+        end = _day(as_of)
+        if old is not None and as_of < old:
+            raise ValueError(f"Windows are at {old}; refresh cannot move them back to {as_of} (use rebuild)")
+        if old is not None and as_of != old:
+            old_end = _day(old)
+            for window in WINDOWS:
+                # Slide: remove counted days that left the window, add counted days that entered it
+                leaving = (old_end - timedelta(window), min(old_end, end - timedelta(window)))
+                entering = (max(old_end, end - timedelta(window)), end)
+                for (lo, hi), apply in ((leaving, RunningStats.remove), (entering, RunningStats.add)):
+                    if lo >= hi:
+                        continue
+                    for segment, value in conn.execute(
+                            "SELECT segment, counted FROM sales_daily WHERE day > :lo AND day <= :hi "
+                            "AND counted IS NOT NULL", {"lo": lo.isoformat(), "hi": hi.isoformat()}):
+                        apply(stats.setdefault((segment, window), RunningStats()), value)
+
+        # Changed days: swap the counted value for the new total
+        start = {window: (end - timedelta(window)).isoformat() for window in WINDOWS}
+        dirty = conn.execute("SELECT segment, day, total, counted FROM sales_daily "
+                             "WHERE counted IS NOT total").fetchall()
+        for segment, day, total, counted in dirty:
+            if segment not in first_days or day < first_days[segment]:
+                first_days[segment] = day
+            for window in WINDOWS:
+                if start[window] < day <= as_of:
+                    running = stats.setdefault((segment, window), RunningStats())
+                    if counted is not None:
+                        running.remove(counted)
+                    running.add(total)
+        conn.executemany("UPDATE sales_daily SET counted = total WHERE segment = :segment AND day = :day",
+                         [{"segment": segment, "day": day} for segment, day, _, _ in dirty])
+        # Every known segment keeps a row per window, if only to remember its first day
+        for segment in first_days:
+            for window in WINDOWS:
+                stats.setdefault((segment, window), RunningStats())
+
+        conn.execute("DELETE FROM rolling_stats")
+        conn.executemany(
+            "INSERT INTO rolling_stats (segment, window, n, mean, m2, first_day) "
+            "VALUES (:segment, :window, :n, :mean, :m2, :first_day)",
+            [{"segment": segment, "window": window, "n": running.n, "mean": running.mean, "m2": running.m2,
+              "first_day": first_days[segment]}
+             for (segment, window), running in stats.items()],
+        )
+        conn.execute("INSERT INTO rolling_meta (name, value) VALUES ('as_of', :as_of) "
+                     "ON CONFLICT (name) DO UPDATE SET value = excluded.value", {"as_of": as_of})
+    return as_of
+
+
+BASELINE_SQL = ("SELECT n, mean, m2, first_day, (SELECT value FROM rolling_meta WHERE name = 'as_of') "
+                "FROM rolling_stats WHERE segment = :segment AND window = :window")
+
+
+def _baseline(segment, window, row):
+    if row is None:
+        return None
+    n, mean, m2, first_day, as_of = row
+    days = min(window, (_day(as_of) - _day(first_day)).days + 1)
+    if days <= 0:
+        return None
+    stats = RunningStats(n, mean, m2).with_zeros(days - n)
+    return Baseline(segment, window, days, stats.mean, stats.std)
+
+
+def baseline(segment="all", window=30):
+    """O(1) daily-sales baseline of ``segment`` over ``window`` days, or ``None`` without history."""
+    return _baseline(segment, window, database.query_one(BASELINE_SQL, {"segment": segment, "window": window}))
+
+
+async def abaseline(segment="all", window=30):
+    """``baseline`` for coroutines."""
+    return _baseline(segment, window,
+                     await database.aquery_one(BASELINE_SQL, {"segment": segment, "window": window}))
+
+
+def daily_totals(segment="all", days=None, after=None):
+    """``(first_day, totals)`` of ``segment`` up to the latest day with sales, zero-filled.
+
+    ``days`` keeps only the last that many days and ``after`` only the days
+    after that date; ``(None, [])`` without history.
+    """
+    end = database.scalar("SELECT MAX(day) FROM sales_daily")
+    first = database.scalar("SELECT MIN(day) FROM sales_daily WHERE segment = :segment", {"segment": segment})
+    if end is None or first is None:
+        return None, []
+    end_day, first_day = _day(end), _day(first)
+    if days:
+        first_day = max(first_day, end_day - timedelta(days - 1))
+    if after:
+        first_day = max(first_day, after + timedelta(1))
+    totals = [0.0] * max((end_day - first_day).days + 1, 0)
+    for day, total in database.query("SELECT day, total FROM sales_daily WHERE segment = :segment "
+                                     "AND day >= :start ORDER BY day",
+                                     {"segment": segment, "start": first_day.isoformat()}):
+        totals[(_day(day) - first_day).days] = total
+    return first_day, totals
+
+
+def recompute(as_of=None):
+    """Baselines computed directly from ``sales_daily``: ``{(segment, window): (days, mean, std)}``."""
+    as_of = as_of or _as_of()
+    if as_of is None:
+        return {}
+    end = _day(as_of)
+    totals, first_days = {}, {}
+    for segment, day, total in database.query("SELECT segment, day, total FROM sales_daily"):
+        first_days[segment] = min(day, first_days.get(segment, day))
+        totals.setdefault(segment, []).append((day, total))
+    expected = {}
+    for segment, rows in totals.items():
+        for window in WINDOWS:
+            days = min(window, (end - _day(first_days[segment])).days + 1)
+            if days <= 0:
+                continue
+            start = (end - timedelta(window)).isoformat()
+            values = [total for day, total in rows if start < day <= as_of]
+            values += [0.0] * (days - len(values))
+            mean = sum(values) / days
+            std = math.sqrt(sum((v - mean) ** 2 for v in values) / (days - 1)) if days > 1 else 0.0
+            expected[segment, window] = (days, mean, std)
+    return expected
+
+
+def check(rel_tol=1e-6, abs_tol=0.01):
+    """Compare the maintained windows with a recomputation; returns the mismatching ones.
+
+    Removing values from running sums leaves rounding residue, so segments
+    whose window emptied out are compared to the cent rather than exactly.
+    """
+    mismatches = []
+    for (segment, window), (days, mean, std) in sorted(recompute().items()):
+        have = baseline(segment, window)
+        if have is None or have.days != days or not (
+                math.isclose(have.mean, mean, rel_tol=rel_tol, abs_tol=abs_tol)
+                and math.isclose(have.std, std, rel_tol=rel_tol, abs_tol=abs_tol)):
+            mismatches.append(((segment, window), (days, mean, std), have))
+    return mismatches
+
+
+def rebuild(as_of=None):
+    """Forget all window state and recompute it from ``sales_daily``."""
+    with database.transaction() as conn:
+        conn.execute("DELETE FROM rolling_stats")
+        conn.execute("DELETE FROM rolling_meta WHERE name = 'as_of'")
+        conn.execute("UPDATE sales_daily SET counted = NULL")
+        return refresh(as_of)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain rolling daily-sales baselines")
+    parser.add_argument("command", choices=["install", "refresh", "check", "rebuild"])
+    parser.add_argument("--as-of", default=None, help="Window end day (default: latest day with sales)")
+    args = parser.parse_args()
+
+    if args.command == "install":
+        install()
+        print(f"✅ Rolling windows installed (as of {_as_of()})")
+    elif args.command == "refresh":
+        print(f"✅ Rolling windows refreshed to {refresh(args.as_of)}")
+    elif args.command == "rebuild":
+        print(f"✅ Rolling windows rebuilt to {rebuild(args.as_of)}")
+    else:
+        mismatches = check()
+        for (segment, window), want, have in mismatches:
+            print(f"❌ {segment} {window}d: expected {want}, stored {have}")
+        if mismatches:
+            print(f"{len(mismatches)} window(s) out of step; run 'rebuild' to repair")
+            return 1
+        print(f"✅ {len(recompute())} windows consistent with sales_daily")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
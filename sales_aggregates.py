@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Running sales aggregates, maintained by triggers on the ``sales`` table.
+
+``sales_agg`` holds count, sum and sum of squares of ``amount`` overall and per
+day, product, region and salesperson. Triggers keep it in step with every
+insert, update and delete, so mean and standard deviation of any segment are
+a primary-key lookup instead of a scan of ``sales``.
+
+    python sales_aggregates.py install    # create table + triggers, backfill
+    python sales_aggregates.py check      # recompute from raw rows and compare
+    python sales_aggregates.py rebuild    # recompute and overwrite
+
+The triggers use SQLite syntax; on server databases the table must be
+maintained by the equivalent triggers of that database.
+"""
+import sys
+import math
+import argparse
+from dataclasses import dataclass
+
+import database
+
+# Segment columns of ``sales``; "all" is the whole table under the key ""
+DIMENSIONS = ("day", "product", "region", "salesperson")
+_COLUMNS = {"day": "date", "product": "product", "region": "region", "salesperson": "salesperson"}
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS sales_agg (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    total_sq REAL NOT NULL,
+    PRIMARY KEY (dimension, key)
+) WITHOUT ROWID
+"""
+
+_UPSERT = """
+INSERT INTO sales_agg (dimension, key, n, total, total_sq) VALUES
+    ('all', '', {sign}, {sign} * {row}.amount, {sign} * {row}.amount * {row}.amount),
+    ('day', COALESCE({row}.date, ''), {sign}, {sign} * {row}.amount, {sign} * {row}.amount * {row}.amount),
+    ('product', COALESCE({row}.product, ''), {sign}, {sign} * {row}.amount, {sign} * {row}.amount * {row}.amount),
+    ('region', COALESCE({row}.region, ''), {sign}, {sign} * {row}.amount, {sign} * {row}.amount * {row}.amount),
+    ('salesperson', COALESCE({row}.salesperson, ''), {sign}, {sign} * {row}.amount,
+     {sign} * {row}.amount * {row}.amount)
+ON CONFLICT (dimension, key) DO UPDATE SET
+    n = n + excluded.n, total = total + excluded.total, total_sq = total_sq + excluded.total_sq;
+"""
+
+TRIGGERS = {
+    "sales_agg_insert": "AFTER INSERT ON sales WHEN NEW.amount IS NOT NULL",
+    "sales_agg_delete": "AFTER DELETE ON sales WHEN OLD.amount IS NOT NULL",
+    "sales_agg_update_old": "AFTER UPDATE OF date, amount, product, region, salesperson ON sales "
+                            "WHEN OLD.amount IS NOT NULL",
+    "sales_agg_update_new": "AFTER UPDATE OF date, amount, product, region, salesperson ON sales "
+                            "WHEN NEW.amount IS NOT NULL",
+}
+_TRIGGER_ROWS = {
+    "sales_agg_insert": ("NEW", 1),
+    "sales_agg_delete": ("OLD", -1),
+    "sales_agg_update_old": ("OLD", -1),
+    "sales_agg_update_new": ("NEW", 1),
+}
+
+STATS_SQL = "SELECT n, total, total_sq FROM sales_agg WHERE dimension = :dimension AND key = :key"
+
+
+@dataclass
+class SegmentStats:
+    """Running count / sum / sum of squares of one segment."""
+    count: int
+    total: float
+    total_sq: float
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        """Sample standard deviation (0 below two sales)."""
+        if self.count < 2:
+            return 0.0
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+def create_triggers(conn):
+    for name, when in TRIGGERS.items():
+        row, sign = _TRIGGER_ROWS[name]
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {when} BEGIN "
+                     f"{_UPSERT.format(row=row, sign=sign)} END")
+
+
+def drop_triggers(conn):
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def is_installed():
+    return database.scalar("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = :name",
+                           {"name": "sales_agg_insert"}, default=0) > 0
+
+
+def install():
+    """Create the aggregates table and triggers, backfilling from existing sales."""
+    with database.transaction() as conn:
+        conn.execute(CREATE_TABLE)
+        fresh = not is_installed()
+        create_triggers(conn)
+        if fresh:
+            _write(conn, recompute())
+
+
+def recompute():
+    """Aggregates computed from the raw ``sales`` rows: ``{(dimension, key): (n, total, total_sq)}``."""
+    aggregates = {}
+    row = database.query_one("SELECT COUNT(amount), COALESCE(SUM(amount), 0), "
+                             "COALESCE(SUM(amount * amount), 0) FROM sales")
+    if row[0]:
+        aggregates[("all", "")] = tuple(row)
+    for dimension in DIMENSIONS:
+        column = _COLUMNS[dimension]
+        for key, n, total, total_sq in database.query(
+                f"SELECT COALESCE({column}, ''), COUNT(amount), SUM(amount), SUM(amount * amount) "
+                f"FROM sales WHERE amount IS NOT NULL GROUP BY COALESCE({column}, '')"):
+            aggregates[(dimension, key)] = (n, total, total_sq)
+    return aggregates
+
+
+def collect_rows(conn, where="1", params=None):
+    """Group the sales rows matching ``where`` into ``temp.sales_delta``.
+
+    One row per (date, product, region, salesperson) with count, sum and sum
+    of squares. Bulk loads scan the rows they inserted once, then derive every
+    dimension here and in ``rolling_stats`` from this much smaller table.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.sales_delta")
+    # NOT INDEXED keeps id ranges on the rowid instead of a scan of a covering index
+    conn.execute(f"CREATE TEMP TABLE sales_delta AS "
+                 f"SELECT date, product, region, salesperson, COUNT(amount) AS n, SUM(amount) AS total, "
+                 f"SUM(amount * amount) AS total_sq FROM sales NOT INDEXED WHERE amount IS NOT NULL AND {where} "
+                 f"GROUP BY date, product, region, salesperson", params or {})
+
+
+def apply_delta(conn):
+    """Add ``temp.sales_delta`` (see ``collect_rows``) to the aggregates."""
+    selects = ["SELECT 'all', '', SUM(n), SUM(total), SUM(total_sq) FROM sales_delta GROUP BY 1"]
+    for dimension in DIMENSIONS:
+        column = _COLUMNS[dimension]
+        selects.append(f"SELECT '{dimension}', COALESCE({column}, ''), SUM(n), SUM(total), SUM(total_sq) "
+                       f"FROM sales_delta GROUP BY COALESCE({column}, '')")
+    for select in selects:
+        conn.execute(f"INSERT INTO sales_agg (dimension, key, n, total, total_sq) {select} "
+                     f"ON CONFLICT (dimension, key) DO UPDATE SET n = n + excluded.n, "
+                     f"total = total + excluded.total, total_sq = total_sq + excluded.total_sq")
+
+
+def apply_rows(conn, where="1", params=None):
+    """Add the sales rows matching ``where`` to the aggregates in one set-based pass.
+
+    Used by bulk loads, which insert with the triggers dropped.
+    """
+    collect_rows(conn, where, params)
+    apply_delta(conn)
+
+
+def _write(conn, aggregates):
+    conn.execute("DELETE FROM sales_agg")
+    conn.executemany(
+        "INSERT INTO sales_agg (dimension, key, n, total, total_sq) "
+        "VALUES (:dimension, :key, :n, :total, :total_sq)",
+        [{"dimension": dimension, "key": key, "n": n, "total": total, "total_sq": total_sq}
+         for (dimension, key), (n, total, total_sq) in aggregates.items()],
+    )
+
+
+def rebuild():
+    with database.transaction() as conn:
+        _write(conn, recompute())
+
+
+def stored():
+    """Current contents of ``sales_agg``, skipping segments whose sales were all deleted."""
+    return {(dimension, key): (n, total, total_sq)
+            for dimension, key, n, total, total_sq in database.query("SELECT * FROM sales_agg")
+            if n}
+
+
+def check(rel_tol=1e-9):
+    """Compare the maintained aggregates with a recomputation; returns the mismatching segments."""
+    expected, actual = recompute(), stored()
+    mismatches = []
+    for segment in sorted(set(expected) | set(actual)):
+        want, have = expected.get(segment), actual.get(segment)
+        if want is None or have is None or want[0] != have[0] or not all(
+                math.isclose(a, b, rel_tol=rel_tol, abs_tol=1e-6) for a, b in zip(want[1:], have[1:])):
+            mismatches.append((segment, want, have))
+    return mismatches
+
+
+def _segment_stats(row):
+    return SegmentStats(*row) if row is not None and row[0] else None
+
+
+def segment_stats(dimension="all", key=""):
+    """O(1) stats of one segment, or ``None`` if it has no sales."""
+    return _segment_stats(database.query_one(STATS_SQL, {"dimension": dimension, "key": key}))
+
+
+async def asegment_stats(dimension="all", key=""):
+    """``segment_stats`` for coroutines."""
+    return _segment_stats(await database.aquery_one(STATS_SQL, {"dimension": dimension, "key": key}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the running sales aggregates")
+    parser.add_argument("command", choices=["install", "check", "rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "install":
+        install()
+        print("✅ Aggregates installed")
+    elif args.command == "rebuild":
+        rebuild()
+        print("✅ Aggregates rebuilt from raw rows")
+    else:
+        mismatches = check()
+        for (dimension, key), want, have in mismatches:
+            print(f"❌ {dimension}={key!r}: expected {want}, stored {have}")
+        if mismatches:
+            print(f"{len(mismatches)} segment(s) out of step; run 'rebuild' to repair")
+            return 1
+        print(f"✅ {len(stored())} segments consistent with raw rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Segmented historical queries over ``sales``, backed by covering indexes.
+
+A segment is any combination of a date window (``start`` / ``end``,
+inclusive ``YYYY-MM-DD``), product, region, salesperson and customer
+industry (joined in through ``sales.customer_id``). Every index carries
+``date`` and ``amount`` after its key columns, so a segment's count, sum and
+sum of squares are read from the index alone instead of scanning ``sales``.
+
+    python sales_queries.py install                       # add customer_id, create indexes
+    python sales_queries.py stats --product "Product A" --start 2024-01-01
+    python sales_queries.py stats --industry Finance --explain
+"""
+import sys
+import argparse
+
+import database
+from sales_aggregates import SegmentStats
+
+FILTERS = ("start", "end", "product", "region", "salesperson", "industry")
+# State keys the SQL agent reads each filter from
+STATE_KEYS = {"start": "history_start", "end": "history_end", "product": "product", "region": "region",
+              "salesperson": "salesperson", "industry": "industry"}
+
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS sales_by_date ON sales (date, amount, product, region, salesperson)",
+    "CREATE INDEX IF NOT EXISTS sales_by_product ON sales (product, date, amount)",
+    "CREATE INDEX IF NOT EXISTS sales_by_region ON sales (region, date, amount)",
+    "CREATE INDEX IF NOT EXISTS sales_by_salesperson ON sales (salesperson, date, amount)",
+    "CREATE INDEX IF NOT EXISTS sales_by_product_region ON sales (product, region, date, amount)",
+    "CREATE INDEX IF NOT EXISTS sales_by_customer ON sales (customer_id, date, amount)",
+    "CREATE INDEX IF NOT EXISTS customers_by_industry ON customers (industry, id)",
+)
+
+
+def add_customer_column(conn):
+    """Add ``sales.customer_id`` to databases created before it existed."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(sales)")]
+    if "customer_id" not in columns:
+        conn.execute("ALTER TABLE sales ADD COLUMN customer_id INTEGER REFERENCES customers (id)")
+
+
+def create_indexes(conn):
+    for statement in INDEXES:
+        conn.execute(statement)
+
+
+def install():
+    with database.transaction() as conn:
+        add_customer_column(conn)
+        create_indexes(conn)
+        # Planner statistics, so multi-filter segments pick the most selective index
+        conn.execute("ANALYZE")
+
+
+def segment_sql(start=None, end=None, product=None, region=None, salesperson=None, industry=None):
+    """``(sql, params)`` returning ``(count, total, total_sq)`` of the sales in one segment."""
+    conditions, params = ["s.amount IS NOT NULL"], {}
+    for column, value in (("product", product), ("region", region), ("salesperson", salesperson)):
+        if value is not None:
+            conditions.append(f"s.{column} = :{column}")
+            params[column] = value
+    if start is not None:
+        conditions.append("s.date >= :start")
+        params["start"] = start
+    if end is not None:
+        conditions.append("s.date <= :end")
+        params["end"] = end
+    source = "sales AS s"
+    if industry is not None:
+        source += " JOIN customers AS c ON c.id = s.customer_id"
+        conditions.append("c.industry = :industry")
+        params["industry"] = industry
+    sql = (f"SELECT COUNT(s.amount), COALESCE(SUM(s.amount), 0), COALESCE(SUM(s.amount * s.amount), 0) "
+           f"FROM {source} WHERE {' AND '.join(conditions)}")
+    return sql, params
+
+
+def _segment_stats(row):
+    return SegmentStats(*row) if row is not None and row[0] else None
+
+
+def segment_stats(**filters):
+    """Count / mean / std of one segment's sales, or ``None`` if it has none."""
+    return _segment_stats(database.query_one(*segment_sql(**filters)))
+
+
+async def asegment_stats(**filters):
+    """``segment_stats`` for coroutines."""
+    return _segment_stats(await database.aquery_one(*segment_sql(**filters)))
+
+
+def state_filters(state):
+    """The segment filters set in a workflow state, as keyword arguments for ``segment_stats``."""
+    return {name: state[key] for name, key in STATE_KEYS.items() if state.get(key) is not None}
+
+
+def query_plan(sql, params=None):
+    """Detail lines of ``EXPLAIN QUERY PLAN`` (SQLite)."""
+    return [row[-1] for row in database.query(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexed segment queries over the sales table")
+    parser.add_argument("command", choices=["install", "stats"])
+    for name in FILTERS:
+        parser.add_argument(f"--{name}", default=None)
+    parser.add_argument("--explain", action="store_true", help="Print the query plan")
+    args = parser.parse_args()
+
+    if args.command == "install":
+        install()
+        print(f"✅ {len(INDEXES)} indexes in place")
+        return 0
+    filters = {name: getattr(args, name) for name in FILTERS if getattr(args, name) is not None}
+    stats = segment_stats(**filters)
+    if stats is None:
+        print("❌ No sales in this segment")
+    else:
+        print(f"✅ {stats.count:,} sales, mean ${stats.mean:,.2f}, std ${stats.std:,.2f}, total ${stats.total:,.2f}")
+    if args.explain:
+        for line in query_plan(*segment_sql(**filters)):
+            print(f"   {line}")
+    return 0 if stats is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""Columnar, memory-mapped snapshot of the ``sales`` table for analytics agents.
+
+The snapshot is a directory of raw little-endian NumPy column files plus a
+``manifest.json`` (row count, last exported id, dtypes, category
+dictionaries). Agents open it with ``np.memmap``, so nothing is read until a
+page is touched and the OS page cache is shared between processes.
+
+- Columns: ``id``, ``day`` (days since 1970-01-01), ``amount``,
+  ``product`` / ``region`` / ``salesperson`` (dictionary codes, -1 for NULL)
+  and ``customer_id`` (-1 for NULL). Rows without a date or amount are skipped.
+- ``daily.f64``: a day-major ``(days, segments)`` matrix of daily totals for
+  the segments of ``rolling_stats`` ("all", each product / region /
+  salesperson, product x region). ``SalesSnapshot.series`` returns a
+  segment's daily series as a zero-copy (strided) view of it.
+
+``refresh`` appends only rows with an id above the last snapshot: column files
+grow by appending, and the new amounts are added to the daily matrix, which
+grows by whole days. A new segment or a date before the first day recomputes the
+matrix from the mapped columns. The daily matrix is small and is replaced
+whole (write + rename), so open readers never see a half-applied refresh.
+Updates and deletes of already exported rows need ``rebuild``.
+
+    python sales_snapshot.py refresh     # append new rows (creates the snapshot on first run)
+    python sales_snapshot.py rebuild     # re-export everything
+    python sales_snapshot.py info
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import database
+from rolling_stats import SEGMENTS, segment_key
+
+SNAPSHOT_DIR = os.getenv("SALES_SNAPSHOT_DIR", "data/sales_snapshot")
+# Rows fetched from SQLite per round trip
+FETCH_ROWS = int(os.getenv("SALES_SNAPSHOT_FETCH_ROWS", "100000"))
+
+COLUMNS = {"id": "<i8", "day": "<i4", "amount": "<f8", "product": "<i4", "region": "<i4",
+           "salesperson": "<i4", "customer_id": "<i8"}
+CATEGORIES = ("product", "region", "salesperson")
+EPOCH = date(1970, 1, 1)
+MANIFEST = "manifest.json"
+DAILY = "daily.f64"
+
+# Days since 1970-01-01 computed by SQLite, so no date strings reach Python; rows whose
+# date SQLite cannot parse (julianday() is NULL) are skipped like NULL dates
+SELECT_SQL = ("SELECT id, CAST(julianday(substr(date, 1, 10)) - 2440587.5 AS INTEGER), amount, product, region, "
+              "salesperson, customer_id FROM sales "
+              "WHERE id > :last_id AND id <= :max_id AND julianday(substr(date, 1, 10)) IS NOT NULL "
+              "AND amount IS NOT NULL ORDER BY id")
+
+
+def _empty_manifest():
+    return {"version": 1, "rows": 0, "last_id": 0, "columns": COLUMNS,
+            "dictionaries": {name: [] for name in CATEGORIES},
+            "first_day": None, "days": 0, "segments": []}
+
+
+def _read_manifest(path):
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def _write_manifest(path, manifest):
+    """Atomic replace: readers see either the old or the new snapshot."""
+    tmp_path = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+
+
+def _map(path, name, dtype, shape, mode="r"):
+    if not shape or not np.prod(shape):
+        return np.zeros(shape or (0,), dtype=dtype)
+    return np.memmap(os.path.join(path, name), dtype=dtype, mode=mode, shape=shape)
+
+
+class SalesSnapshot:
+    """Read-only, memory-mapped view of one snapshot directory."""
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        manifest = _read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"No sales snapshot in {path}; run 'python sales_snapshot.py refresh'")
+        self.path = path
+        self.manifest = manifest
+        self.rows = manifest["rows"]
+        self.last_id = manifest["last_id"]
+        self.dictionaries = manifest["dictionaries"]
+        self.segments = manifest["segments"]
+        self._segment_index = {segment: i for i, segment in enumerate(self.segments)}
+        self.first_day = date.fromisoformat(manifest["first_day"]) if manifest["first_day"] else None
+        self.columns = {name: _map(path, f"{name}.{dtype[1:]}", dtype, (self.rows,))
+                        for name, dtype in manifest["columns"].items()}
+        self.daily = _map(path, DAILY, "<f8", (manifest["days"], len(self.segments)))
+
+    @property
+    def days(self):
+        """Calendar days of the daily matrix rows, as ``datetime64[D]``."""
+        if self.first_day is None:
+            return np.array([], dtype="datetime64[D]")
+        return np.datetime64(self.first_day.isoformat()) + np.arange(len(self.daily))
+
+    def column(self, name):
+        return self.columns[name]
+
+    def series(self, product=None, region=None, salesperson=None):
+        """Daily totals of one segment (zeros on days without sales), a view into the mapped matrix."""
+        key = segment_key(product, region, salesperson)
+        if key not in self._segment_index:
+            raise KeyError(f"Segment {key!r} is not in the snapshot")
+        return self.daily[:, self._segment_index[key]]
+
+    def matrix(self, by=("product", "region", "salesperson"), last_days=None):
+        """Daily totals of every combination of ``by`` with sales in the last ``last_days`` days.
+
+        Returns ``(segments, values)``: one ``{column: value}`` dict per
+        combination and a ``(segments, days)`` array whose last column is the
+        snapshot's last day. Built with one pass over the mapped columns.
+        """
+        n_days = len(self.daily) if last_days is None else min(last_days, len(self.daily))
+        if not n_days:
+            return [], np.zeros((0, 0))
+        first = (self.first_day - EPOCH).days + len(self.daily) - n_days
+        rows = np.flatnonzero(self.columns["day"] >= first)
+        codes = [np.asarray(self.columns[name][rows]) for name in by]
+        valid = np.logical_and.reduce([code >= 0 for code in codes])
+        rows = rows[valid]
+        sizes = [len(self.dictionaries[name]) for name in by]
+        present, inverse = np.unique(np.ravel_multi_index([code[valid] for code in codes], sizes),
+                                     return_inverse=True)
+        cells = inverse.ravel() * n_days + (self.columns["day"][rows] - first)
+        values = np.bincount(cells, weights=self.columns["amount"][rows], minlength=len(present) * n_days)
+        segments = [{name: self.dictionaries[name][int(code)] for name, code in zip(by, np.unravel_index(flat, sizes))}
+                    for flat in present]
+        return segments, values.reshape(len(present), n_days)
+
+
+def open_snapshot(path=SNAPSHOT_DIR):
+    """The snapshot at ``path``, or ``None`` if it has not been exported yet."""
+    try:
+        return SalesSnapshot(path)
+    except FileNotFoundError:
+        return None
+
+
+def _fetch(last_id, max_id):
+    """Yield column arrays of the sales rows in ``(last_id, max_id]``, ``FETCH_ROWS`` at a time."""
+    cursor = database.get_connection().execute(SELECT_SQL, {"last_id": last_id, "max_id": max_id})
+    while True:
+        rows = cursor.fetchmany(FETCH_ROWS)
+        if not rows:
+            return
+        ids, days, amounts, products, regions, salespeople, customers = zip(*rows)
+        yield {
+            "id": np.array(ids, dtype=np.int64),
+            "day": np.array(days, dtype=np.int32),
+            "amount": np.array(amounts, dtype=np.float64),
+            "product": products, "region": regions, "salesperson": salespeople,
+            "customer_id": np.array([-1 if c is None else c for c in customers], dtype=np.int64),
+        }
+
+
+def _encode(values, dictionary):
+    """Dictionary codes of ``values`` (-1 for NULL), growing ``dictionary`` in place."""
+    codes = {value: i for i, value in enumerate(dictionary)}
+    for value in set(values) - codes.keys() - {None}:
+        codes[value] = len(dictionary)
+        dictionary.append(value)
+    codes[None] = -1
+    return np.fromiter(map(codes.__getitem__, values), dtype=np.int32, count=len(values))
+
+
+def _segment_columns(manifest, columns):
+    """Column of the daily matrix per row and segment set; -1 where the row has no such segment.
+
+    Returns ``None`` if a row belongs to a segment the matrix does not have yet.
+    """
+    index = {segment: i for i, segment in enumerate(manifest["segments"])}
+    dictionaries = manifest["dictionaries"]
+    out = [np.full(len(columns["amount"]), index.get("all", -1), dtype=np.int64)]
+    for names in SEGMENTS:
+        sizes = [len(dictionaries[name]) for name in names]
+        lookup = np.full(sizes, -1, dtype=np.int64)
+        for position in np.ndindex(*sizes):
+            key = segment_key(**{name: dictionaries[name][code] for name, code in zip(names, position)})
+            lookup[position] = index.get(key, -2)
+        codes = [np.asarray(columns[name]) for name in names]
+        valid = np.logical_and.reduce([code >= 0 for code in codes])
+        cols = np.full(len(valid), -1, dtype=np.int64)
+        cols[valid] = lookup[tuple(code[valid] for code in codes)]
+        out.append(cols)
+    if any((cols == -2).any() for cols in out) or (out[0] < 0).any():
+        return None
+    return out
+
+
+def _all_segments(manifest, columns):
+    """Segment keys present in ``columns``, "all" first."""
+    dictionaries = manifest["dictionaries"]
+    segments = ["all"]
+    for names in SEGMENTS:
+        sizes = [len(dictionaries[name]) for name in names]
+        codes = [np.asarray(columns[name]) for name in names]
+        valid = np.logical_and.reduce([code >= 0 for code in codes])
+        present = np.bincount(np.ravel_multi_index([code[valid] for code in codes], sizes),
+                              minlength=int(np.prod(sizes))) if valid.any() else np.zeros(0)
+        for flat in np.flatnonzero(present):
+            position = np.unravel_index(flat, sizes)
+            segments.append(segment_key(**{name: dictionaries[name][int(code)]
+                                           for name, code in zip(names, position)}))
+    return segments
+
+
+def _recompute_daily(manifest, columns):
+    """Daily matrix computed from the mapped columns (also resets the segment list)."""
+    days = columns["day"]
+    manifest["segments"] = _all_segments(manifest, columns)
+    if not len(days):
+        manifest["first_day"] = None
+        return np.zeros((0, len(manifest["segments"])))
+    first, last = int(days.min()), int(days.max())
+    n_days, n_segments = last - first + 1, len(manifest["segments"])
+    flat = np.zeros(n_days * n_segments)
+    offsets = (days - first).astype(np.int64) * n_segments
+    for cols in _segment_columns(manifest, columns):
+        rows = cols >= 0
+        flat += np.bincount(offsets[rows] + cols[rows], weights=columns["amount"][rows], minlength=len(flat))
+    manifest["first_day"] = (EPOCH + timedelta(first)).isoformat()
+    return flat.reshape(n_days, n_segments)
+
+
+def _add_daily(manifest, daily, batch):
+    """``daily`` with a batch of new rows added, or ``None`` if the matrix must be recomputed."""
+    if manifest["first_day"] is None:
+        return None
+    day_rows = batch["day"].astype(np.int64) - (date.fromisoformat(manifest["first_day"]) - EPOCH).days
+    segment_cols = _segment_columns(manifest, batch)
+    if segment_cols is None or (day_rows < 0).any():
+        return None
+    n_days = int(day_rows.max()) + 1
+    if n_days > len(daily):
+        daily = np.vstack([daily, np.zeros((n_days - len(daily), daily.shape[1]))])
+    for cols in segment_cols:
+        rows = cols >= 0
+        np.add.at(daily, (day_rows[rows], cols[rows]), batch["amount"][rows])
+    return daily
+
+
+def refresh(path=SNAPSHOT_DIR):
+    """Append sales rows newer than the snapshot; returns the number of rows appended.
+
+    Column files only grow past the rows the manifest commits, and the small
+    daily matrix is replaced whole, so readers holding the previous snapshot
+    keep a consistent view and an interrupted refresh leaves nothing behind.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest = _read_manifest(path) or _empty_manifest()
+    column_paths = {name: os.path.join(path, f"{name}.{dtype[1:]}") for name, dtype in manifest["columns"].items()}
+    # Drop bytes of an interrupted refresh that the manifest never committed
+    for name, dtype in manifest["columns"].items():
+        with open(column_paths[name], "ab") as f:
+            f.truncate(manifest["rows"] * np.dtype(dtype).itemsize)
+
+    max_id = database.scalar("SELECT MAX(id) FROM sales", default=0)
+    daily = np.array(_map(path, DAILY, "<f8", (manifest["days"], len(manifest["segments"]))))
+    appended = 0
+    for batch in _fetch(manifest["last_id"], max_id):
+        for name in CATEGORIES:
+            batch[name] = _encode(batch[name], manifest["dictionaries"][name])
+        for name, dtype in manifest["columns"].items():
+            with open(column_paths[name], "ab") as f:
+                np.asarray(batch[name], dtype=dtype).tofile(f)
+        if daily is not None:
+            daily = _add_daily(manifest, daily, batch)
+        manifest["rows"] += len(batch["id"])
+        appended += len(batch["id"])
+    if daily is None:
+        columns = {name: _map(path, os.path.basename(column_paths[name]), dtype, (manifest["rows"],))
+                   for name, dtype in manifest["columns"].items()}
+        daily = _recompute_daily(manifest, columns)
+    if appended or not os.path.exists(os.path.join(path, DAILY)):
+        tmp_path = os.path.join(path, DAILY + ".tmp")
+        daily.astype("<f8").tofile(tmp_path)
+        os.replace(tmp_path, os.path.join(path, DAILY))
+    manifest["days"] = len(daily)
+    # Rows skipped for a NULL date or amount count as exported too
+    manifest["last_id"] = max(manifest["last_id"], max_id)
+    _write_manifest(path, manifest)
+    return appended
+
+
+def rebuild(path=SNAPSHOT_DIR):
+    """Export the whole table again."""
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    return refresh(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped columnar snapshot of the sales table")
+    parser.add_argument("command", choices=["refresh", "rebuild", "info"])
+    parser.add_argument("--path", default=SNAPSHOT_DIR, help=f"Snapshot directory (default: {SNAPSHOT_DIR})")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        snapshot = open_snapshot(args.path)
+        if snapshot is None:
+            print(f"❌ No snapshot in {args.path}")
+            return 1
+        print(f"✅ {snapshot.rows:,} rows up to id {snapshot.last_id}, {len(snapshot.daily):,} days "
+              f"from {snapshot.first_day}, {len(snapshot.segments)} segments")
+        return 0
+    started = time.perf_counter()
+    appended = (rebuild if args.command == "rebuild" else refresh)(args.path)
+    print(f"✅ {appended:,} rows appended in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
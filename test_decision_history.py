@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Decision History Test - learning log compacted into indexed SQLite tables
+Runs against a throwaway SQLite file and learning log (conftest temp_database / learning_log fixtures)
+"""
+
+import os
+import json
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import database
+import decision_history
+import rolling_stats
+from agents.decision_rules import DecisionCode
+from agents.log_writer import LogWriter, segments
+
+INSERT = ("INSERT INTO sales (date, amount, product, region, salesperson) "
+          "VALUES (:date, :amount, :product, :region, :salesperson)")
+
+
+def _records(start, count, rng):
+    for i in range(count):
+        z_score = float(rng.normal(0, 2))
+        day = start + timedelta(int(i * 10 / count))
+        yield {"timestamp": datetime(day.year, day.month, day.day, 12, 0, i % 60, i).isoformat(),
+               "segment": "product=A|region=North", "latest_sales": 1000.0 + i, "anomaly": abs(z_score) > 2,
+               "z_score": z_score, "forecast_sales": 1100.0, "forecast_model": "holt",
+               "forecast_day": (day + timedelta(1)).isoformat(),
+               "decision_code": int(rng.integers(1, 13)), "decision": "..."}
+
+
+def test_compaction_ingests_each_line_once_and_rolls_up_days(temp_database, tmp_path):
+    rng = np.random.default_rng(0)
+    start = date(2026, 1, 1)
+    database.executemany(INSERT, [{"date": (start + timedelta(offset)).isoformat(), "amount": 1000.0,
+                                   "product": "A", "region": "North", "salesperson": "Ann"}
+                                  for offset in range(8)])
+    rolling_stats.install()
+
+    path = os.path.join(tmp_path, "learning_log.jsonl")
+    records = list(_records(start, 600, rng))
+    writer = LogWriter(path, max_bytes=20000, fsync="never")
+    for record in records[:400]:
+        writer.write(record)
+    writer.flush()
+    # A line in the old format (decision text only) and one that is not a record
+    with open(path, "a") as f:
+        f.write(json.dumps({"timestamp": "2026-01-05T13:00:00", "z_score": -3.5, "anomaly": True,
+                            "decision": "Critical sales decline (Z<-3). URGENT: ..."}) + "\n")
+        f.write("not json\n")
+    report = decision_history.compact(path)
+    assert report == {"records": 401, "rejected": 1, "scored": 360}
+
+    # More rotations, then a line still being written: only complete lines count
+    for record in records[400:]:
+        writer.write(record)
+    writer.close()
+    assert len([name for name in segments(path) if name.endswith(".gz")]) >= 2
+    with open(path, "a") as f:
+        f.write('{"timestamp": "2026-01-09T')
+    report = decision_history.compact(path)
+    assert (report["records"], report["rejected"]) == (200, 0)
+    with open(path, "a") as f:
+        f.write('12:00:00", "z_score": 0.1, "decision_code": 9}\n')
+    assert decision_history.compact(path)["records"] == 1
+    assert decision_history.compact(path)["records"] == 0
+    assert database.scalar("SELECT COUNT(*) FROM decision_history") == 602
+
+    # Filters use the indexes; results match the records
+    anomalous = decision_history.runs(anomaly=True, decision_code=5, limit=1000)
+    expected = [r for r in records if r["anomaly"] and r["decision_code"] == 5]
+    assert len(anomalous) == len(expected) and all(run["anomaly"] for run in anomalous)
+    assert [run["timestamp"] for run in anomalous] == sorted((r["timestamp"] for r in expected), reverse=True)
+    in_day = decision_history.runs(start="2026-01-03", end="2026-01-03", limit=1000)
+    assert len(in_day) == sum(r["timestamp"].startswith("2026-01-03") for r in records)
+    plan = " ".join(str(row) for row in database.query(
+        "EXPLAIN QUERY PLAN SELECT * FROM decision_history WHERE decision_code = 5 ORDER BY timestamp DESC"))
+    assert "history_by_code" in plan
+
+    # Daily rollup: runs, decisions and forecast error against sales_daily (1000 a day through Jan 8)
+    days = {day["day"]: day for day in decision_history.daily()}
+    assert sum(day["runs"] for day in days.values()) == 602
+    jan_3 = [r for r in records if r["timestamp"].startswith("2026-01-03")]
+    assert days["2026-01-03"]["anomalies"] == sum(r["anomaly"] for r in jan_3)
+    assert days["2026-01-03"]["decisions"][DecisionCode(jan_3[0]["decision_code"]).name] == \
+        sum(r["decision_code"] == jan_3[0]["decision_code"] for r in jan_3)
+    assert days["2026-01-05"]["decisions"]["CRITICAL_DECLINE"] >= 1
+    assert days["2026-01-03"]["forecast_mae"] == 100 and abs(days["2026-01-03"]["forecast_mape"] - 0.1) < 1e-9
+    # Forecasts for days without sales yet are not scored
+    assert days["2026-01-08"]["forecast_errors"] == 0
+    assert decision_history.daily(start="2026-01-02", end="2026-01-02", anomaly=False)[0]["anomalies"] == 0
+
+
+def test_history_endpoints(temp_database, learning_log):
+    from fastapi.testclient import TestClient
+    import app as api
+
+    with open(learning_log, "w") as f:
+        for record in _records(date(2026, 2, 1), 50, np.random.default_rng(1)):
+            f.write(json.dumps(record) + "\n")
+    decision_history.compact()
+    with open(learning_log, "a") as f:
+        for record in _records(date(2026, 2, 20), 10, np.random.default_rng(4)):
+            f.write(json.dumps(record) + "\n")
+    client = TestClient(api.app)
+    reply = client.get("/history", params={"limit": 5, "start": "2026-02-03"}).json()
+    assert reply["status"] == "success" and len(reply["runs"]) == 5
+    assert reply["runs"][0]["timestamp"] > reply["runs"][-1]["timestamp"] >= "2026-02-03"
+    reply = client.get("/history/daily", params={"end": "2026-02-02"}).json()
+    assert [day["day"] for day in reply["days"]] == ["2026-02-01", "2026-02-02"]
+    assert sum(day["runs"] for day in reply["days"]) == 10
+    # Reads never compact: the last ten lines wait for the background compactor
+    reply = client.get("/history", params={"limit": 100}).json()
+    assert len(reply["runs"]) == 50
+
+
+def test_compactor_ingests_in_the_background(temp_database, learning_log):
+    with open(learning_log, "w") as f:
+        for record in _records(date(2026, 3, 1), 20, np.random.default_rng(2)):
+            f.write(json.dumps(record) + "\n")
+    compactor = decision_history.Compactor(interval=60)
+    compactor.start()
+    with open(learning_log, "a") as f:
+        for record in _records(date(2026, 3, 10), 5, np.random.default_rng(3)):
+            f.write(json.dumps(record) + "\n")
+    # stop() runs a final pass, so nothing written before shutdown is left behind
+    compactor.stop()
+    assert compactor.stats()["records"] == 25 and compactor.stats()["errors"] == 0
+    assert len(decision_history.runs(limit=100)) == 25
+
+
+if __name__ == "__main__":
+    import pytest
+
+    # Fixtures come from conftest.py, so run through pytest
+    if pytest.main(["-q", __file__]) == 0:
+        print("✅ Decision history working")
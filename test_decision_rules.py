@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Decision Rules Test - the rule table reproduces the original agents' texts
+"""
+
+import itertools
+
+import numpy as np
+
+from agents.action_agent import action_agent
+from agents.decision_agent import decision_agent
+from agents.decision_rules import DecisionCode, action_text, code_from_text, decision_text, evaluate, evaluate_batch
+
+
+def _legacy_decision(state):
+    """The decision agent before the rule table, as the reference."""
+    anomaly = state.get("anomaly", False)
+    z_score = state.get("z_score", 0)
+    latest_sales = state.get("latest_sales", 100000)
+    sql_avg = state.get("sql_avg_sales", 100000)
+    rag_insight = state.get("rag_insight", "")
+
+    # Dynamic decision logic based on multiple factors
+    if anomaly:
+        if z_score > 3:
+            decision = "Critical sales spike detected (Z>3). Immediate action required: investigate market opportunity, optimize inventory, prepare scaling resources."
+        elif z_score > 2:
+            decision = f"Significant sales increase (+${latest_sales - sql_avg:,.0f}). Capitalize on opportunity: expand marketing budget, enhance customer support, analyze campaign drivers."
+        elif z_score > 1.5:
+            decision = "Moderate sales uplift detected. Monitor trends closely and prepare marketing campaigns to sustain momentum."
+        elif z_score < -3:
+            decision = "Critical sales decline (Z<-3). URGENT: Execute emergency retention protocol, contact top customers, review pricing strategy."
+        elif z_score < -2:
+            decision = f"Severe sales drop (-${sql_avg - latest_sales:,.0f}). Launch customer recovery campaigns, review product quality, analyze competitor activity."
+        elif z_score < -1.5:
+            decision = "Downward trend detected. Activate preventive retention strategies, increase customer engagement, conduct competitive analysis."
+        else:
+            decision = "Minor sales variance. Conduct root cause analysis to prevent further decline."
+    else:
+        # Non-anomalous but dynamic decisions based on sales level
+        if latest_sales > sql_avg * 1.3:
+            decision = "Sales performing well above average. Focus on maintaining quality while scaling operations cautiously."
+        elif latest_sales > sql_avg * 1.1:
+            decision = f"Sales performance is healthy at ${latest_sales:,.0f}. Continue current strategy with incremental optimization."
+        elif latest_sales > sql_avg * 0.9:
+            decision = "Sales near historical average. Maintain current operations while exploring new market segments."
+        elif latest_sales > sql_avg * 0.7:
+            decision = f"Sales below average by {((1 - latest_sales/sql_avg)*100):.0f}%. Implement gradual improvement plan without major disruption."
+        else:
+            decision = "Sales significantly underperforming. Review pricing, product fit, and marketing effectiveness."
+
+    state["decision"] = decision
+    return state
+
+
+def _legacy_action(state):
+    """The action agent before the rule table, as the reference."""
+    decision = state.get("decision", "")
+    forecast = state.get("forecast_sales", 0)
+    latest_sales = state.get("latest_sales", 0)
+    z_score = state.get("z_score", 0)
+
+    # Parse decision keywords and generate targeted actions
+    decision_lower = decision.lower()
+
+    if "critical sales spike" in decision_lower or "immediate action required" in decision_lower:
+        action = f"[URGENT] Market Opportunity Response: 1) Temporarily increase production by 40%, 2) Launch premium tier marketing campaign, 3) Expected revenue: ${forecast:,.0f}, 4) Assign team to analyze campaign drivers"
+    elif "significant sales increase" in decision_lower or "capitalize on opportunity" in decision_lower:
+        action = f"[HIGH PRIORITY] Growth Acceleration: 1) Scale marketing spend by 25%, 2) Hire additional sales team (4-6 reps), 3) Optimize fulfillment, 4) Target revenue: ${forecast:,.0f}"
+    elif "moderate sales uplift" in decision_lower:
+        action = f"Sustained Growth Plan: 1) Increase marketing by 15%, 2) Launch email nurture campaigns, 3) Monitor conversion metrics, 4) Projected Q1 revenue: ${forecast:,.0f}"
+    elif "critical sales decline" in decision_lower or "urgent: execute emergency" in decision_lower:
+        action = f"[EMERGENCY] Crisis Management: 1) Contact top 50 customers within 24hrs, 2) Offer loyalty incentives, 3) Review pricing/features, 4) Activate backup vendors, 5) Recovery target: ${forecast:,.0f}"
+    elif "severe sales drop" in decision_lower:
+        action = f"[HIGH PRIORITY] Recovery Protocol: 1) Customer retention campaign (personalized offers), 2) Product quality review, 3) Competitive analysis, 4) Expected recovery: ${forecast:,.0f}"
+    elif "downward trend" in decision_lower or "activate preventive" in decision_lower:
+        action = f"Retention & Stabilization: 1) Increase customer touchpoints by 50%, 2) Run re-engagement campaigns, 3) Launch referral incentives, 4) Stabilize at ${forecast:,.0f}"
+    elif "minor sales variance" in decision_lower or "conduct root cause" in decision_lower:
+        action = "Analysis & Monitoring: 1) Deep-dive into recent changes, 2) Review customer feedback, 3) Analyze traffic sources, 4) Prepare contingency plans"
+    elif "performing well above average" in decision_lower:
+        action = f"Quality Scaling: 1) Maintain service levels while growing carefully, 2) Expand to adjacent markets (10% budget), 3) Build strategic partnerships, 4) Target sustained revenue: ${forecast:,.0f}"
+    elif "healthy" in decision_lower and "continue" in decision_lower:
+        action = f"Steady State Operations: 1) Optimize margins by 5%, 2) Launch customer satisfaction survey, 3) Test new channels (5% budget), 4) Maintain revenue at ${forecast:,.0f}"
+    elif "near historical average" in decision_lower:
+        action = f"Growth Exploration: 1) Identify underutilized market segments, 2) Run A/B tests for new messaging, 3) Develop adjacent product features, 4) Target growth to ${forecast:,.0f}"
+    elif "below average" in decision_lower:
+        action = f"Improvement Plan: 1) Analyze 5 recent lost deals, 2) Adjust pricing strategically, 3) Enhance value proposition, 4) Recovery timeline: 2-3 months, Target: ${forecast:,.0f}"
+    elif "significantly underperforming" in decision_lower:
+        action = f"Strategic Overhaul: 1) Complete market assessment, 2) Revise product positioning, 3) Restructure sales approach, 4) 90-day turnaround target: ${forecast:,.0f}"
+    else:
+        action = f"Monitor & Adapt: Closely track performance metrics. Target: ${forecast:,.0f}"
+
+    state["action"] = action
+    return state
+
+
+def _states():
+    averages = (95000, 100000.0, 1, 0, -50000)
+    z_scores = (-8.33, -3, -2.5, -2, -1.7, -1.5, 0, 0.33, 1.5, 1.7, 2, 2.5, 3, 8.33)
+    for anomaly, z_score, sql_avg in itertools.product((True, False), z_scores, averages):
+        ratios = (2.0, 1.3, 1.2, 1.1, 1.0, 0.9, 0.8, 0.7, 0.5, 0)
+        for latest_sales in {sql_avg * ratio for ratio in ratios} | {350000, 25000, 110000}:
+            yield {"anomaly": anomaly, "z_score": z_score, "latest_sales": latest_sales, "sql_avg_sales": sql_avg,
+                   "forecast_sales": latest_sales * 1.05}
+
+
+def test_rules_reproduce_the_original_texts():
+    codes = set()
+    for state in _states():
+        expected = _legacy_action(_legacy_decision(dict(state)))
+        result = action_agent(decision_agent(dict(state)))
+        assert (result["decision"], result["action"]) == (expected["decision"], expected["action"]), state
+        codes.add(result["decision_code"])
+        # Decision texts without a code (other callers) map to the same action
+        assert action_agent({"decision": result["decision"], "forecast_sales": 5})["action"] == \
+            _legacy_action({"decision": result["decision"], "forecast_sales": 5})["action"]
+    assert codes == set(DecisionCode)
+    assert action_agent({"decision": "", "forecast_sales": 10})["action"] == \
+        "Monitor & Adapt: Closely track performance metrics. Target: $10"
+    assert code_from_text("Sales performance is healthy at $5. Continue.") == DecisionCode.HEALTHY
+    assert code_from_text("no rule here") is None
+
+
+def test_batch_evaluation_matches_single_states():
+    states = list(_states())
+    columns = {name: np.array([state[name] for state in states])
+               for name in ("anomaly", "z_score", "latest_sales", "sql_avg_sales")}
+    codes = evaluate_batch(**columns)
+    assert codes.dtype == np.int8 and len(codes) == len(states)
+    for code, state in zip(codes, states):
+        assert code == evaluate(state["anomaly"], state["z_score"], state["latest_sales"], state["sql_avg_sales"])
+        expected = _legacy_decision(dict(state))["decision"]
+        assert decision_text(code, state["latest_sales"], state["sql_avg_sales"]) == expected
+    assert action_text(DecisionCode.SEVERE_DROP, 1234.5).endswith("Expected recovery: $1,234")
+
+
+if __name__ == "__main__":
+    test_rules_reproduce_the_original_texts()
+    test_batch_evaluation_matches_single_states()
+    print("✅ Decision rules working")
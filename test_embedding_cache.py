@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Embedding Cache Test - Verifies the memory-mapped embedding store
+Chunks embedded once are served from disk, cold entries are evicted first
+"""
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agents.embedding_cache import CachedEmbeddings, EmbeddingStore, text_key
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    model: str = "fake-16"
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_store_persists_and_evicts_lru(tmp_path):
+    store = EmbeddingStore(tmp_path, max_entries=10)
+    keys = [text_key(f"chunk {i}") for i in range(10)]
+    vectors = np.arange(40, dtype=np.float32).reshape(10, 4)
+    store.put_many(keys, vectors)
+    assert len(store) == 10
+
+    # Touch the first half so the second half is the coldest
+    store.get_many(keys[:5])
+    store.put_many([text_key("chunk 10")], np.ones((1, 4), dtype=np.float32))
+    assert len(store) == 10
+    assert store.evictions == 1
+    assert all(v is not None for v in store.get_many(keys[:5]))
+    assert sum(v is None for v in store.get_many(keys[5:])) == 1
+
+    reopened = EmbeddingStore(tmp_path, max_entries=10)
+    assert len(reopened) == 10
+    assert np.array_equal(reopened.get_many(keys[:1])[0], vectors[0])
+
+
+def test_cached_embeddings_only_embed_unseen_chunks(tmp_path):
+    backend = CountingEmbeddings(size=16)
+    embeddings = CachedEmbeddings(backend, EmbeddingStore(tmp_path))
+    first = embeddings.embed_documents(["alpha", "beta", "alpha"])
+    assert backend.calls == 2
+
+    again = CachedEmbeddings(backend, EmbeddingStore(tmp_path)).embed_documents(["beta", "gamma", "alpha"])
+    assert backend.calls == 3
+    assert np.allclose(again[0], first[1]) and np.allclose(again[2], first[0])
+
+
+if __name__ == "__main__":
+    import pytest
+
+    # Tests take pytest fixtures (tmp_path, monkeypatch), so run through pytest
+    if pytest.main(["-q", __file__]) == 0:
+        print("✅ Embedding cache working")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Forecasting Test - exponential smoothing models fitted to many series at once
+Runs against a throwaway SQLite file (conftest temp_database fixture)
+"""
+
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+import database
+import rolling_stats
+from agents import forecast_models
+from agents.forecast_cache import ForecastCache
+from agents.forecasting_agent import forecasting_agent
+
+INSERT = ("INSERT INTO sales (date, amount, product, region, salesperson) "
+          "VALUES (:date, :amount, :product, :region, :salesperson)")
+
+
+def _series(days, rng):
+    t = np.arange(days)
+    return np.vstack([
+        1000 + rng.normal(0, 20, days),                                   # level
+        1000 + 5 * t + rng.normal(0, 20, days),                           # trend
+        1000 + 2 * t + 300 * (t % 7 == 5) + rng.normal(0, 10, days),      # trend + weekly peak
+        np.tile([100.0, 200, 300, 400, 500, 600, 700], days // 7 + 1)[:days],  # exact weekly cycle
+    ])
+
+
+def test_fit_picks_a_model_per_series():
+    rng = np.random.default_rng(0)
+    series = _series(140, rng)
+    fitted = forecast_models.fit(series)
+    assert fitted.model_names == ["ses", "holt", "holt_winters", "seasonal_naive"]
+
+    point, lower, upper = fitted.forecast(14)
+    assert point.shape == (4, 14)
+    assert np.all(lower <= point) and np.all(point <= upper)
+    # Uncertainty grows with the horizon; the exact cycle repeats with none
+    assert np.all(np.diff(upper - lower, axis=1)[:3] >= 0)
+    assert np.allclose(point[3], np.tile([100.0, 200, 300, 400, 500, 600, 700], 2))
+    assert np.allclose(upper[3], point[3])
+    assert abs(point[1, 0] - (1000 + 5 * 140)) < 60
+    peak = (5 - 140) % 7
+    assert point[2, peak] - np.delete(point[2, :7], peak).mean() > 200
+
+    # Fitting series together gives what fitting each alone does
+    for row in range(len(series)):
+        alone = forecast_models.fit(series[row:row + 1])
+        assert alone.model_names == [fitted.model_names[row]]
+        assert np.allclose(alone.forecast(14)[0][0], point[row])
+    chunked = forecast_models.fit(series, chunk=3)
+    assert np.allclose(chunked.forecast(14)[0], point)
+
+
+def test_update_continues_the_fit_in_constant_time():
+    rng = np.random.default_rng(1)
+    series = _series(141, rng)
+    fitted = forecast_models.fit(series[:, :-1])
+    errors = fitted.update(series[:, -1])
+    refit = forecast_models.fit(series)
+    same = (refit.model == fitted.model) & (refit.alpha == fitted.alpha) & (refit.beta == fitted.beta) \
+        & (refit.gamma == fitted.gamma)
+    assert same.sum() >= 3
+    for name in ("level", "trend", "season", "recent", "phase", "sse", "n"):
+        assert np.allclose(getattr(fitted, name)[same], getattr(refit, name)[same]), name
+    assert errors.shape == (4,) and abs(errors[3]) < 1e-9
+
+
+def _days(start, offsets, level, rng):
+    return [{"date": (start + timedelta(offset)).isoformat(),
+             "amount": float(level * (1 + 0.3 * (offset % 7 == 4)) + rng.normal(0, 20)),
+             "product": "A", "region": "North", "salesperson": "Ann"} for offset in offsets]
+
+
+def test_forecasting_agent_fits_segment_history(temp_database):
+    start = date(2024, 1, 1)
+    rows = [{"date": (start + timedelta(offset)).isoformat(),
+             "amount": 1000.0 + 500 * (offset % 7 == 4) + 3 * offset,
+             "product": "A", "region": "North", "salesperson": "Ann"}
+            for offset in range(84) if offset % 7 != 6]
+    database.executemany(INSERT, rows)
+    rolling_stats.install()
+
+    first_day, history = rolling_stats.daily_totals(rolling_stats.segment_key("A", "North"), 30)
+    assert len(history) == 30 and first_day == start + timedelta(53) and history.count(0.0) == 4
+
+    result = forecasting_agent({"latest_sales": 1200, "product": "A", "region": "North", "anomaly": False})
+    assert result["forecast_model"] != "heuristic"
+    assert result["forecast_lower"] <= result["forecast_sales"] <= result["forecast_upper"]
+    path = result["forecast_path"]
+    assert len(path) == forecast_models.HORIZON and path[0]["day"] == (start + timedelta(83)).isoformat()
+    # Sundays have no sales, Fridays peak
+    by_day = {date.fromisoformat(step["day"]).weekday(): step["forecast"] for step in path}
+    assert by_day[6] < 100 and by_day[4] > by_day[3] + 300
+
+    # Unknown segment: the old heuristic
+    result = forecasting_agent({"latest_sales": 1000, "product": "Z", "anomaly": False})
+    assert result["forecast_model"] == "heuristic" and result["forecast_sales"] == 1050
+    assert result["forecast_lower"] == result["forecast_upper"] == 1050.0 and result["forecast_path"] == []
+
+
+def test_forecast_cache_updates_state_and_refits_on_schedule_or_drift(temp_database):
+    rng = np.random.default_rng(2)
+    start = date(2024, 1, 1)
+    database.executemany(INSERT, _days(start, range(60), 1000, rng))
+    rolling_stats.install()
+    segment = rolling_stats.segment_key("A", "North")
+
+    cache = ForecastCache(maxsize=1, refit_days=7)
+    first = cache.forecast(segment)
+    assert first["last_day"] == start + timedelta(59) and cache.stats()["fits"] == 1
+
+    # Three new days: the previously latest day and two more settle, no refit
+    database.executemany(INSERT, _days(start, range(60, 63), 1000, rng))
+    second = cache.forecast(segment)
+    stats = cache.stats()
+    assert second["last_day"] == start + timedelta(62)
+    assert (stats["hits"], stats["fits"], stats["updates"]) == (1, 1, 3)
+    assert abs(second["point"][0] - 1000) < 150
+
+    # Persisted: a new process loads the state instead of fitting
+    reloaded = ForecastCache()
+    assert np.allclose(reloaded.forecast(segment)["point"], second["point"])
+    assert (reloaded.stats()["loads"], reloaded.stats()["fits"]) == (1, 0)
+
+    # LRU of one: another segment evicts this one, which then comes back from the table
+    cache.forecast("product=A")
+    cache.forecast(segment)
+    stats = cache.stats()
+    assert stats["evictions"] == 2 and stats["loads"] == 1
+
+    # Seven settled days since the fit: scheduled refit
+    database.executemany(INSERT, _days(start, range(63, 68), 1000, rng))
+    cache.forecast(segment)
+    assert cache.stats()["refits"] == 1
+
+    # A level shift the fit never saw: refit on drift
+    database.executemany(INSERT, _days(start, range(68, 70), 5000, rng))
+    cache.forecast(segment)
+    assert cache.stats()["drift_refits"] == 1 and cache.stats()["refits"] == 1
+
+
+def test_forecast_cache_fits_a_segment_once_without_blocking_others(temp_database, monkeypatch):
+    rng = np.random.default_rng(3)
+    start = date(2024, 1, 1)
+    database.executemany(INSERT, _days(start, range(60), 1000, rng)
+                         + [dict(row, product="B", region="South") for row in _days(start, range(60), 800, rng)])
+    rolling_stats.install()
+    segment, other = rolling_stats.segment_key("A", "North"), rolling_stats.segment_key("B", "South")
+    cache = ForecastCache()
+    execute, locked = database.execute, []
+
+    def recording_execute(sql, params=None):
+        locked.append(cache._lock.locked())
+        return execute(sql, params)
+
+    monkeypatch.setattr(database, "execute", recording_execute)
+    cache.forecast(other)
+    # The schema DDL of a newly seen database runs without the cache lock
+    assert locked == [False]
+
+    fitting, release = threading.Event(), threading.Event()
+    fit = cache._fit
+
+    def slow_fit(key):
+        if key == segment:
+            fitting.set()
+            release.wait(10)
+        return fit(key)
+
+    monkeypatch.setattr(cache, "_fit", slow_fit)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.forecast(segment))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert fitting.wait(10)
+    # Served while the first segment is being fitted
+    served = threading.Thread(target=cache.forecast, args=(other,))
+    served.start()
+    served.join(10)
+    assert not served.is_alive()
+    release.set()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert (stats["fits"], stats["hits"]) == (2, 4)
+    assert len(results) == 4 and all(np.array_equal(result["point"], results[0]["point"]) for result in results)
+
+
+if __name__ == "__main__":
+    import pytest
+
+    # Fixtures come from conftest.py, so run through pytest
+    if pytest.main(["-q", __file__]) == 0:
+        print("✅ Forecasting working")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Log Writer Test - background JSON-lines writer for the learning logs
+Writes into a throwaway directory
+"""
+
+import os
+import gzip
+import json
+import threading
+
+import agents.learning_agent as learning
+from agents.log_writer import LogWriter, get_writer, segments
+
+
+def _read(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_writer_batches_records_from_many_threads(tmp_path):
+    path = os.path.join(tmp_path, "logs", "learning_log.jsonl")
+    writer = LogWriter(path, fsync="always", max_bytes=0)
+
+    def produce(thread):
+        for i in range(500):
+            writer.write({"thread": thread, "i": i})
+
+    threads = [threading.Thread(target=produce, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert writer.flush(timeout=10)
+    records = _read(path)
+    assert len(records) == 2000
+    for thread in range(4):
+        assert [record["i"] for record in records if record["thread"] == thread] == list(range(500))
+    stats = writer.stats()
+    assert stats["written"] == 2000 and stats["dropped"] == 0 and stats["errors"] == 0
+    assert stats["batches"] < 2000 and stats["fsyncs"] >= 1
+    writer.close()
+
+
+def test_writer_rotates_compresses_and_drops_when_full(tmp_path):
+    path = os.path.join(tmp_path, "learning_log.jsonl")
+    writer = LogWriter(path, max_bytes=2000, fsync="never")
+    for i in range(300):
+        writer.write({"i": i, "note": "x" * 20})
+        if i % 50 == 0:
+            writer.flush()
+    writer.close()
+    files = segments(path)
+    assert writer.stats()["rotations"] >= 3
+    assert all(name.endswith(".jsonl.gz") for name in files if name != path)
+    assert [record["i"] for name in files for record in _read(name)] == list(range(300))
+
+    # A record that stalls encoding holds the writer thread; the queue fills and drops
+    release = threading.Event()
+
+    class Stall:
+        def __str__(self):
+            release.wait(10)
+            return "stalled"
+
+    writer = LogWriter(os.path.join(tmp_path, "small.jsonl"), queue_size=2)
+    writer.write({"value": Stall()})
+    accepted = [writer.write({"i": i}) for i in range(10)]
+    release.set()
+    writer.close()
+    assert accepted.count(False) == writer.stats()["dropped"] >= 7
+    assert _read(os.path.join(tmp_path, "small.jsonl"))[0] == {"value": "stalled"}
+
+
+def test_learning_agent_only_queues_the_entry(learning_log):
+    state = {"latest_sales": 1000, "anomaly": True, "z_score": 3.5, "forecast_sales": 1100.0,
+             "forecast_model": "holt", "decision": "Critical sales spike detected (Z>3)."}
+    assert learning.learning_agent(state) is state
+    get_writer(learning_log).flush()
+    (entry,) = _read(learning_log)
+    assert entry["forecast_model"] == "holt" and entry["z_score"] == 3.5 and "timestamp" in entry
+    assert learning.learning_log_stats()["written"] == 1
+
+
+if __name__ == "__main__":
+    import pytest
+
+    # Fixtures come from conftest.py, so run through pytest
+    if pytest.main(["-q", __file__]) == 0:
+        print("✅ Log writer working")
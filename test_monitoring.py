@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Monitoring Test - rolling-window baselines for the monitor agent
+Runs against a throwaway SQLite file (conftest temp_database fixture)
+"""
+
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+import database
+import rolling_stats
+import sales_snapshot
+from agents.batch_monitor import RESULT_DTYPE, run_batch, score_series, snapshot_series
+from agents.monitor_agent import monitor_agent
+from agents.stream_monitor import SegmentState, StreamMonitor
+
+INSERT = ("INSERT INTO sales (date, amount, product, region, salesperson) "
+          "VALUES (:date, :amount, :product, :region, :salesperson)")
+
+
+def _sales(start, days, rng):
+    rows = []
+    for offset in range(days):
+        for _ in range(rng.integers(0, 4)):
+            rows.append({"date": (start + timedelta(offset)).isoformat(), "amount": float(rng.uniform(5000, 50000)),
+                         "product": str(rng.choice(["A", "B"])), "region": str(rng.choice(["North", "South"])),
+                         "salesperson": "Ann"})
+    return rows
+
+
+def test_rolling_windows_match_recomputation(temp_database):
+    rng = np.random.default_rng(0)
+    start = date(2024, 1, 1)
+    database.executemany(INSERT, _sales(start, 120, rng))
+    rolling_stats.install()
+    assert rolling_stats.check() == []
+
+    # New days slide the windows, late sales and edits change counted days
+    database.executemany(INSERT, _sales(start + timedelta(120), 10, rng))
+    database.executemany(INSERT, _sales(start + timedelta(100), 5, rng))
+    database.execute("UPDATE sales SET amount = amount * 2 WHERE id % 9 = 0")
+    database.execute("DELETE FROM sales WHERE id % 13 = 0")
+    rolling_stats.refresh()
+    assert rolling_stats.check() == []
+
+    daily = dict(database.query("SELECT date, SUM(amount) FROM sales WHERE product = 'A' AND region = 'North' "
+                                "GROUP BY date"))
+    first = min(daily)
+    end = database.scalar("SELECT MAX(date) FROM sales")
+    days = [(date.fromisoformat(end) - timedelta(offset)).isoformat() for offset in range(30)]
+    values = np.array([daily.get(day, 0.0) for day in days if day >= first])
+    baseline = rolling_stats.baseline(rolling_stats.segment_key("A", "North"), 30)
+    assert np.isclose(baseline.mean, values.mean()) and np.isclose(baseline.std, values.std(ddof=1))
+
+
+def test_monitor_uses_segment_baseline(temp_database):
+    state = monitor_agent({"latest_sales": 250000})
+    assert state["baseline_segment"] == "default" and state["anomaly"]
+
+    rng = np.random.default_rng(1)
+    database.executemany(INSERT, _sales(date(2024, 1, 1), 60, rng))
+    rolling_stats.install()
+    baseline = rolling_stats.baseline("region=North", 30)
+
+    steady = monitor_agent({"latest_sales": baseline.mean, "region": "North"})
+    assert steady["baseline_segment"] == "region=North:30d"
+    assert not steady["anomaly"] and abs(steady["z_score"]) < 1e-9
+
+    spike = monitor_agent({"latest_sales": baseline.mean + 3 * baseline.std, "region": "North"})
+    assert spike["anomaly"] and np.isclose(spike["z_score"], 3.0)
+    relaxed = monitor_agent({"latest_sales": baseline.mean + 3 * baseline.std, "region": "North",
+                             "anomaly_threshold": 4.0})
+    assert not relaxed["anomaly"]
+
+
+def test_batch_scores_match_per_series_and_flag_spikes():
+    rng = np.random.default_rng(2)
+    series = rng.normal(1000, 50, size=(5000, 31))
+    series[10, -1] = 1400                       # spike
+    series[20, -1] = 600                        # drop
+    series[30, 5] = 1e6                         # baseline outlier inflates std...
+    series[30, -1] = 1400                       # ...so only the robust score sees this
+    series[40, :] = 0
+    series[40, [3, 11, 19]] = 100
+    series[40, -1] = 500                        # sparse series: MAD of 0
+    result = score_series(series, window=30, z_threshold=3.0)
+    assert result.dtype == RESULT_DTYPE and len(result) == 5000
+    flagged = set(result["series"][result["anomaly"]])
+    assert {10, 20, 30, 40} <= flagged and len(flagged) < 100
+    assert result["anomaly"].sum() > score_series(series, window=30, z_threshold=4.0)["anomaly"].sum()
+    assert abs(result["z"][30]) < 1 and result["mad_score"][30] > 3.5
+
+    history = series[7, :-1]
+    assert np.isclose(result["z"][7], (series[7, -1] - history.mean()) / history.std(ddof=1), rtol=1e-5)
+    mad = 1.4826 * np.median(np.abs(history - np.median(history)))
+    assert np.isclose(result["mad_score"][7], (series[7, -1] - np.median(history)) / mad, rtol=1e-5)
+
+    # Only flagged series reach the workflow, and the monitor keeps their baseline
+    segments = [{"product": f"P{i}"} for i in range(len(series))]
+    result, outputs = run_batch(series, segments, window=30, invoke=monitor_agent)
+    assert len(outputs) == result["anomaly"].sum()
+    spike = next(output for output in outputs if output["product"] == "P10")
+    assert spike["baseline_segment"] == "product=P10:30d" and spike["anomaly"]
+    assert np.isclose(spike["z_score"], result["z"][10], rtol=1e-5)
+
+
+def test_batch_monitor_reads_snapshot_series(temp_database, tmp_path):
+    rng = np.random.default_rng(3)
+    database.executemany(INSERT, _sales(date(2024, 1, 1), 60, rng))
+    snapshot_path = os.path.join(tmp_path, "snapshot")
+    sales_snapshot.refresh(snapshot_path)
+    snapshot = sales_snapshot.SalesSnapshot(snapshot_path)
+
+    segments, values = snapshot_series(snapshot, window=30)
+    assert values.shape == (len(segments), 31)
+    end = database.scalar("SELECT MAX(date) FROM sales")
+    days = [(date.fromisoformat(end) - timedelta(offset)).isoformat() for offset in range(30, -1, -1)]
+    for segment, row in zip(segments, values):
+        daily = dict(database.query("SELECT date, SUM(amount) FROM sales WHERE product = :product "
+                                    "AND region = :region AND salesperson = :salesperson GROUP BY date", segment))
+        assert np.allclose(row, [daily.get(day, 0.0) for day in days])
+
+    segments, values = snapshot_series(snapshot, window=30, by=None)
+    assert segments[0] == {} and {"product": "A", "region": "North"} in segments
+    assert np.allclose(values[0], snapshot.series()[-31:])
+
+
+def test_stream_monitor_tracks_segments_online():
+    rng = np.random.default_rng(4)
+    values = rng.normal(1000, 100, 500)
+    state = SegmentState()
+    for value in values:
+        state.update(value, alpha=0.1)
+    assert state.n == 500 and np.isclose(state.mean, values.mean()) and np.isclose(state.std, values.std(ddof=1))
+    weights = 0.1 * 0.9 ** np.arange(499)[::-1]
+    assert np.isclose(state.ewma, values[0] * 0.9 ** 499 + (weights * values[1:]).sum())
+
+    monitor = StreamMonitor(alpha=0.1, threshold=5.0, warmup=20)
+    for value in values[:200]:
+        assert monitor.observe({"amount": value, "product": "A", "region": "North"}) == []
+    crossed = monitor.observe({"amount": 5000, "product": "A", "region": "North", "salesperson": "Ann"})
+    segments = {state["baseline_segment"] for state in crossed}
+    # The new salesperson segment is still warming up
+    assert segments == {"stream:all", "stream:product=A", "stream:region=North", "stream:product=A|region=North"}
+    regional = next(state for state in crossed if state["baseline_segment"] == "stream:product=A|region=North")
+    assert regional["product"] == "A" and regional["region"] == "North" and regional["latest_sales"] == 5000
+    assert monitor_agent(regional)["anomaly"]
+    # Still anomalous: no second alert until the segment has re-armed
+    assert monitor.observe({"amount": 9000, "product": "A", "region": "North"}) == []
+    assert monitor.observe({"amount": "n/a"}) == []
+    assert monitor.stats() == {"events": 202, "rejected": 1, "segments": 5, "triggers": 4, "alerting": 4}
+
+
+def test_stream_endpoint_runs_workflow_on_crossings(temp_database, learning_log):
+    from fastapi.testclient import TestClient
+    import app as api
+
+    api.stream_monitor = StreamMonitor(threshold=5.0, warmup=20)
+    rng = np.random.default_rng(5)
+    # Entered, so the app's shutdown closes the async database pool
+    with TestClient(api.app) as client:
+        with client.websocket_connect("/ws/sales") as websocket:
+            websocket.send_json([{"amount": float(value), "region": "South"} for value in rng.normal(1000, 50, 100)])
+            websocket.send_text("not json")
+            assert websocket.receive_json()["type"] == "error"
+            websocket.send_json({"amount": 10000, "region": "South"})
+            replies = [websocket.receive_json(), websocket.receive_json()]
+        assert {reply["segment"] for reply in replies} == {"stream:all", "stream:region=South"}
+        assert all(reply["result"]["anomaly"] and reply["result"]["decision"] for reply in replies)
+        assert client.get("/metrics").json()["stream"]["triggers"] == 2
+
+
+if __name__ == "__main__":
+    import pytest
+
+    # Fixtures come from conftest.py, so run through pytest
+    if pytest.main(["-q", __file__]) == 0:
+        print("✅ Rolling baselines working")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+"""
+RAG Test - Local embedding backend (no OpenAI API needed)
+Verifies the offline hashing embedder, NumPy top-k search and incremental re-indexing
+"""
+
+import os
+import json
+import shutil
+
+import numpy as np
+
+from agents.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+from agents import faiss_index, rag_index
+from agents.embedders import HashingEmbeddings
+from agents.ingestion import batched, iter_chunk_ids, iter_chunks, iter_pieces
+from agents.matrix_store import MatrixVectorStore
+from agents.rag_agent import build_query, normalize_query, retrieve
+from agents.rag_index import build_index, get_keyword_index, update_index
+from agents.retrieval_cache import TTLCache
+
+DOCS_PATH = "data/knowledge_docs"
+
+
+def test_local_embeddings_are_normalized():
+    embeddings = HashingEmbeddings(dim=256)
+    matrix = embeddings.embed_array(["sales decline reasons", "customer retention strategies", ""])
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(matrix[:2], axis=1), 1.0)
+    assert not matrix[2].any()
+    assert np.array_equal(matrix, embeddings.embed_array(["sales decline reasons", "customer retention strategies", ""]))
+
+
+def test_matrix_topk_matches_full_sort():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    store = MatrixVectorStore(HashingEmbeddings(dim=32))
+    store.add_vectors(vectors, [str(i) for i in range(500)])
+
+    query = vectors[7]
+    rows, scores = store.search_vector(query, k=10)
+    expected = np.argsort(-(vectors @ query))[:10]
+    assert list(rows) == list(expected)
+    assert np.all(np.diff(scores) <= 0)
+
+    store.delete(["7", "0"])
+    rows, _ = store.search_vector(query, k=10)
+    assert "7" not in {store._ids[row] for row in rows}
+    assert len(store) == 498
+
+
+def test_local_index_incremental_update(tmp_path):
+    docs = os.path.join(tmp_path, "docs")
+    index = os.path.join(tmp_path, "index")
+    shutil.copytree(DOCS_PATH, docs)
+    embeddings = HashingEmbeddings()
+
+    db, update = update_index(embeddings, docs, index)
+    assert isinstance(db, MatrixVectorStore)
+    assert update.chunks_embedded == len(db) > 0
+
+    results = {
+        query: db.similarity_search(query, k=1)[0].page_content
+        for query in ["sales decline reasons", "customer retention strategies", "churn rate reduction"]
+    }
+    assert len(set(results.values())) > 1
+
+    with open(os.path.join(docs, "pricing_policy.txt"), "w") as f:
+        f.write("Policy PX-42: discounts above 15% need regional director approval.")
+    db, update = update_index(embeddings, docs, index)
+    assert update.added == ["pricing_policy.txt"] and update.chunks_embedded == 1
+    assert "PX-42" in db.similarity_search("PX-42 discount policy", k=1)[0].page_content
+    keywords = get_keyword_index(index)
+    assert len(keywords) == len(db)
+    assert keywords.search("px-42", k=1)[0][0] == db.similarity_search("PX-42", k=1)[0].id
+    hits = retrieve(db, "PX-42", k=3, keywords=keywords, mode="hybrid")
+    assert "PX-42" in hits[0][0].page_content
+
+    os.remove(os.path.join(docs, "pricing_policy.txt"))
+    db, update = update_index(embeddings, docs, index)
+    assert update.removed == ["pricing_policy.txt"] and update.chunks_deleted == 1
+    assert update.chunks_embedded == 0
+
+
+def test_parallel_build_matches_sequential(tmp_path):
+    embeddings = HashingEmbeddings(dim=256)
+    sequential, _ = update_index(embeddings, DOCS_PATH, os.path.join(tmp_path, "seq"), full=True)
+    parallel, update = build_index(embeddings, DOCS_PATH, os.path.join(tmp_path, "par"), workers=2)
+    assert update.added == sorted(os.listdir(DOCS_PATH))
+    assert parallel._ids == sequential._ids
+    assert np.allclose(parallel.vectors, sequential.vectors)
+    assert (get_keyword_index(os.path.join(tmp_path, "par")).search("customer churn")
+            == get_keyword_index(os.path.join(tmp_path, "seq")).search("customer churn"))
+
+    # The incremental path accepts the parallel build as-is
+    _, update = update_index(embeddings, DOCS_PATH, os.path.join(tmp_path, "par"))
+    assert not update.dirty and update.chunks_embedded == 0
+
+
+def test_approximate_index_converts_and_deletes(monkeypatch):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((2000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(i) for i in range(2000)]
+    monkeypatch.setattr(faiss_index, "MIN_VECTORS", 1000)
+    for kind in ("ivf", "hnsw"):
+        store = faiss_index.ApproximateFAISS(
+            HashingEmbeddings(dim=32), faiss_index.faiss.IndexFlatL2(32), InMemoryDocstore(), {})
+        store.index_type = kind
+        store.add_embeddings(zip(ids, vectors), ids=ids)
+        assert store.maybe_convert() and not isinstance(store.index, faiss_index.faiss.IndexFlat)
+
+        store.delete(ids[:10])
+        assert store.index.ntotal == 1990
+        hits = store.similarity_search_with_score_by_vector(vectors[0], k=3)
+        assert "0" not in [doc.id for doc, _ in hits]
+        assert store.similarity_search_by_vector(vectors[500], k=1)[0].id == "500"
+
+
+def test_bm25_incremental_and_persisted(tmp_path):
+    index = BM25Index()
+    index.add(["a", "b", "c"], [
+        "Region EMEA sales dropped after policy POL-7 change",
+        "Customer retention programs reduce churn",
+        "Product PX-42 launch in region APAC",
+    ])
+    assert "pol-7" in tokenize("see POL-7") and "the" not in tokenize("the policy")
+    assert index.search("PX-42", k=1)[0][0] == "c"
+    assert index.search("emea", k=3)[0][0] == "a"
+
+    index.delete(["c"])
+    assert index.search("PX-42") == []
+    index.add(["c"], ["Product PX-42 relaunch"])
+    assert index.search("relaunch")[0][0] == "c"
+
+    index.save(tmp_path)
+    loaded = BM25Index.load(tmp_path)
+    assert len(loaded) == 3
+    assert loaded.search("churn retention") == index.search("churn retention")
+
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["z", "x"]])
+    assert [doc_id for doc_id, _ in fused] == ["x", "z", "y"]
+
+
+def test_streaming_chunks_match_splitter(tmp_path):
+    from langchain_text_splitters import CharacterTextSplitter
+
+    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    for name in os.listdir(DOCS_PATH):
+        path = os.path.join(DOCS_PATH, name)
+        with open(path, encoding="utf-8") as f:
+            assert list(iter_chunks(path, 500, 50)) == splitter.split_text(f.read())
+
+    with open(os.path.join(tmp_path, "targets.csv"), "w") as f:
+        f.write("region,target\nEMEA,100\n")
+    with open(os.path.join(tmp_path, "faq.html"), "w") as f:
+        f.write("<h1>Policy POL-9</h1><script>x()</script><p>Refunds within 30 days.</p>")
+    assert list(iter_pieces(os.path.join(tmp_path, "targets.csv"))) == ["region: EMEA; target: 100"]
+    assert list(iter_pieces(os.path.join(tmp_path, "faq.html"))) == ["Policy POL-9", "Refunds within 30 days."]
+    assert [len(batch) for batch in batched(range(10), 4)] == [4, 4, 2]
+
+
+def test_query_follows_state():
+    decline = build_query({"anomaly": True, "z_score": -3.4, "product": "Product A", "region": "North"})
+    spike = build_query({"anomaly": True, "z_score": 2.4})
+    steady = build_query({"anomaly": False, "z_score": 0.3})
+    assert decline.startswith("critical sales decline") and decline.endswith("product Product A region North")
+    assert spike.startswith("significant sales increase")
+    assert "decline" not in steady and "increase" not in steady
+    assert normalize_query("  Sales   DECLINE ") == "sales decline"
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self, dim=256):
+        super().__init__(dim)
+        self.embedded = []
+
+    def embed_array(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_array(texts)
+
+
+def _manifest(index):
+    with open(os.path.join(index, rag_index.MANIFEST_FILE)) as f:
+        return json.load(f)["documents"]
+
+
+def test_vector_store_reembeds_only_the_edited_doc(tmp_path, monkeypatch, request):
+    docs = os.path.join(tmp_path, "docs")
+    index = os.path.join(tmp_path, "index")
+    shutil.copytree(DOCS_PATH, docs)
+    monkeypatch.setattr(rag_index, "CHECK_INTERVAL", 0)
+    rag_index.reset_cache()
+    request.addfinalizer(rag_index.reset_cache)
+    embeddings = CountingEmbeddings()
+
+    db = rag_index.get_vector_store(embeddings, docs, index)
+    before = _manifest(index)
+    assert len(db) == sum(len(record["chunk_ids"]) for record in before.values())
+    assert rag_index.get_vector_store(embeddings, docs, index) is db
+
+    edited = os.path.join(docs, "customer_retention.txt")
+    with open(edited, "a") as f:
+        f.write("\n\nLoyalty tier PX-7 gives returning customers free shipping for a year.\n")
+    embeddings.embedded.clear()
+    assert rag_index.get_vector_store(embeddings, docs, index) is db
+    after = _manifest(index)
+    new_ids = set(after["customer_retention.txt"]["chunk_ids"]) - set(before["customer_retention.txt"]["chunk_ids"])
+    chunks = dict(iter_chunk_ids("customer_retention.txt",
+                                 iter_chunks(edited, rag_index.CHUNK_SIZE, rag_index.CHUNK_OVERLAP)))
+    # Only the edited doc's new chunks were embedded, and only its manifest record changed
+    assert new_ids and sorted(embeddings.embedded) == sorted(chunks[chunk_id] for chunk_id in new_ids)
+    assert len(new_ids) < len(chunks)
+    assert after["customer_retention.txt"]["sha256"] != before["customer_retention.txt"]["sha256"]
+    assert after["sales_analysis.txt"] == before["sales_analysis.txt"]
+    assert "PX-7" in db.similarity_search("PX-7 loyalty tier", k=1)[0].page_content
+
+    # Another index directory or embedding model never reuses the cached store
+    other_index = rag_index.get_vector_store(embeddings, docs, os.path.join(tmp_path, "other"))
+    assert other_index is not db and len(other_index) == len(db)
+    other_model = rag_index.get_vector_store(HashingEmbeddings(dim=64), docs, index)
+    assert other_model.vectors.shape[1] == 64
+    assert _manifest(index)["sales_analysis.txt"]["chunk_ids"] == before["sales_analysis.txt"]["chunk_ids"]
+
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None and cache.get("c") == 3
+    now[0] = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2 and stats["expired"] == 1 and stats["evictions"] == 1
+
+
+if __name__ == "__main__":
+    import pytest
+
+    # Tests take pytest fixtures (tmp_path, monkeypatch), so run through pytest
+    if pytest.main(["-q", __file__]) == 0:
+        print("✅ Local RAG backend working")
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+Sales DB Test - shared data-access layer
+Runs against a throwaway SQLite file (conftest temp_database fixture)
+"""
+
+import os
+import asyncio
+import threading
+
+import numpy as np
+
+import database
+import load_sales
+import rolling_stats
+import sales_aggregates
+import sales_queries
+import sales_snapshot
+from agents.sql_agent import asql_agent, sql_agent
+
+
+def test_connections_are_reused_per_thread(temp_database):
+    conn = database.get_connection()
+    assert database.get_connection() is conn
+    assert database.scalar("PRAGMA journal_mode") == "wal"
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(database.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_transactions_nest_and_roll_back(temp_database):
+    insert = "INSERT INTO sales (date, amount) VALUES (:date, :amount)"
+    with database.transaction() as conn:
+        conn.execute(insert, {"date": "2024-01-01", "amount": 100.0})
+        database.executemany(insert, [{"date": "2024-01-02", "amount": 300.0}])
+    try:
+        with database.transaction() as conn:
+            conn.execute(insert, {"date": "2024-01-03", "amount": 999.0})
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert database.scalar("SELECT COUNT(*) FROM sales") == 2
+    assert sql_agent({})["sql_avg_sales"] == 200.0
+    assert database.query("SELECT date FROM sales WHERE amount > :min", {"min": 150}) == [("2024-01-02",)]
+
+
+def test_async_reads_share_a_pool_closed_with_the_loop(temp_database):
+    database.executemany("INSERT INTO sales (date, amount) VALUES (:date, :amount)",
+                         [{"date": f"2024-01-{day:02d}", "amount": day * 10.0} for day in range(1, 21)])
+    sql = "SELECT date, amount FROM sales WHERE amount > :min ORDER BY id"
+
+    async def reads():
+        results = await asyncio.gather(*(database.aquery(sql, {"min": m * 20}) for m in range(10)))
+        pool = database._async_pools[asyncio.get_running_loop()]
+        count = await database.ascalar("SELECT COUNT(*) FROM sales")
+        await database.aclose()
+        # Closed pools are dropped; the next read opens a fresh one
+        assert await database.aquery_one("SELECT MAX(amount) FROM sales") == (200.0,)
+        await database.aclose()
+        return results, pool, count
+
+    results, pool, count = asyncio.run(reads())
+    assert results == [database.query(sql, {"min": m * 20}) for m in range(10)]
+    assert count == 20
+    assert 1 <= pool.opened <= database.ASYNC_POOL_SIZE
+    assert pool.closed and pool.idle.empty()
+
+
+def test_aggregates_follow_inserts_updates_deletes(temp_database):
+    insert = ("INSERT INTO sales (date, amount, product, region, salesperson) "
+              "VALUES (:date, :amount, :product, :region, :salesperson)")
+    rng = np.random.default_rng(0)
+    rows = [{"date": f"2024-01-{day:02d}", "amount": float(amount), "product": f"P{day % 3}",
+             "region": f"R{day % 2}", "salesperson": "Ann"}
+            for day, amount in zip(rng.integers(1, 28, 200), rng.uniform(5000, 50000, 200))]
+    database.executemany(insert, rows[:100])
+    sales_aggregates.install()  # backfills the existing rows
+    database.executemany(insert, rows[100:])
+    database.execute("UPDATE sales SET amount = amount * 2, region = 'R9' WHERE id % 7 = 0")
+    database.execute("DELETE FROM sales WHERE id % 5 = 0")
+    database.execute("INSERT INTO sales (date, amount) VALUES ('2024-02-01', NULL)")
+    assert sales_aggregates.check() == []
+
+    amounts = np.array([row[0] for row in database.query("SELECT amount FROM sales WHERE amount IS NOT NULL")])
+    state = sql_agent({})
+    assert state["sql_sales_count"] == len(amounts)
+    assert np.isclose(state["sql_avg_sales"], amounts.mean())
+    assert np.isclose(state["sql_std_sales"], amounts.std(ddof=1))
+    region = np.array([row[0] for row in database.query("SELECT amount FROM sales WHERE region = 'R9'")])
+    assert np.isclose(sales_aggregates.segment_stats("region", "R9").mean, region.mean())
+
+    database.execute("UPDATE sales_agg SET total = total + 1 WHERE dimension = 'all'")
+    assert [segment for segment, _, _ in sales_aggregates.check()] == [("all", "")]
+    sales_aggregates.rebuild()
+    assert sales_aggregates.check() == []
+
+
+def test_bulk_load_updates_aggregates_in_the_same_pass(temp_database, tmp_path):
+    sales_aggregates.install()
+    rolling_stats.install()
+    csv_path = os.path.join(tmp_path, "sales.csv")
+    with open(csv_path, "w") as f:
+        f.write("date,amount,product,region,salesperson\n")
+        for i in range(500):
+            f.write(f"2024-01-{i % 28 + 1:02d},{1000 + i},P{i % 3},R{i % 2},Ann\n")
+        f.write("2024-01-05,not-a-number,P1,R1,Ann\n")
+    jsonl_path = os.path.join(tmp_path, "sales.jsonl")
+    with open(jsonl_path, "w") as f:
+        f.write('{"date": "2024-02-01T09:30:00", "amount": 2500, "product": "P1"}\n')
+
+    report = load_sales.load_file(csv_path, batch_size=64, commit_rows=200)
+    assert (report.rows, report.rejected, report.transactions) == (500, 1, 3)
+    assert load_sales.load_file(jsonl_path).rows == 1
+    # Triggers are back after the load
+    database.execute("INSERT INTO sales (date, amount, product) VALUES ('2024-02-01', 500, 'P2')")
+    rolling_stats.refresh()
+
+    assert database.scalar("SELECT COUNT(*) FROM sales") == 502
+    assert database.scalar("SELECT date FROM sales WHERE amount = 2500") == "2024-02-01"
+    assert sales_aggregates.is_installed() and rolling_stats.is_installed()
+    assert sales_aggregates.check() == []
+    assert rolling_stats.check() == []
+
+
+def test_bulk_load_skips_malformed_dates(temp_database):
+    sales_aggregates.install()
+    rolling_stats.install()
+    rows = [(f"2024-03-{day:02d}", 100.0 * day, "P1", "R1", "Ann", None) for day in range(1, 11)]
+    rows[3] = ("2024-13-40", 999.0, "P1", "R1", "Ann", None)
+    rows[6] = ("n/a", 999.0, "P1", "R1", "Ann", None)
+    report = load_sales.load_records(rows)
+    assert (report.rows, report.rejected) == (8, 2)
+    assert database.scalar("SELECT COUNT(*) FROM sales WHERE julianday(date) IS NULL") == 0
+    assert sales_aggregates.check() == [] and rolling_stats.check() == []
+    # Later loads still refresh the windows
+    assert load_sales.load_records([("2024-03-11", 50.0, "P1", "R1", "Ann", None)]).rows == 1
+    assert rolling_stats.check() == []
+
+
+def test_bulk_endpoint_takes_format_from_query_or_content_type(temp_database):
+    import io
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from fastapi.testclient import TestClient
+    import app as api
+
+    client = TestClient(api.app)
+    body = "date,amount,region\n" + "".join(f"2024-03-{day:02d},{day * 100},North\n" for day in range(1, 11))
+    reply = client.post("/sales/bulk", params={"format": "csv"}, content=body).json()
+    assert (reply["status"], reply["rows"], reply["rejected"]) == ("success", 10, 0)
+    reply = client.post("/sales/bulk", content='{"date": "2024-03-11", "amount": 50}\n',
+                        headers={"Content-Type": "application/x-ndjson"}).json()
+    assert reply["rows"] == 1
+    parquet = io.BytesIO()
+    pq.write_table(pa.table({"date": ["2024-03-12", "2024-03-13"], "amount": [1.0, 2.0]}), parquet)
+    reply = client.post("/sales/bulk", params={"format": "parquet"}, content=parquet.getvalue()).json()
+    assert reply["rows"] == 2
+    reply = client.post("/sales/bulk", params={"format": "xml"}, content="<sales/>").json()
+    assert reply["status"] == "error" and "xml" in reply["message"]
+    assert database.scalar("SELECT COUNT(*) FROM sales") == 13
+
+
+def test_segment_queries_use_covering_indexes(temp_database):
+    database.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, industry TEXT)")
+    database.executemany("INSERT INTO customers (id, name, industry) VALUES (:id, :name, :industry)",
+                         [{"id": i, "name": f"C{i}", "industry": ["Finance", "Retail"][i % 2]} for i in range(1, 11)])
+    rng = np.random.default_rng(1)
+    load_sales.load_records(
+        (f"2024-{month:02d}-{day:02d}", float(amount), f"P{i % 4}", f"R{i % 3}", f"S{i % 5}", i % 10 + 1)
+        for i, (month, day, amount) in enumerate(zip(rng.integers(1, 13, 2000), rng.integers(1, 29, 2000),
+                                                     rng.uniform(100, 1000, 2000))))
+    sales_queries.install()
+    indexes = database.query("SELECT name FROM sqlite_master WHERE type = 'index' ORDER BY name")
+    report = load_sales.load_records([("2024-12-31", 500.0, "P1", "R1", "S1", 2)] * 10, defer_indexes=True)
+    assert report.rows == 10
+    assert database.query("SELECT name FROM sqlite_master WHERE type = 'index' ORDER BY name") == indexes
+    rows = database.query("SELECT s.date, s.amount, s.product, s.region, s.salesperson, c.industry "
+                          "FROM sales AS s JOIN customers AS c ON c.id = s.customer_id")
+
+    segments = [
+        {"start": "2024-03-01", "end": "2024-03-31"},
+        {"product": "P1"},
+        {"region": "R2", "start": "2024-06-01"},
+        {"salesperson": "S3", "end": "2024-02-15"},
+        {"product": "P2", "region": "R0", "start": "2024-01-01", "end": "2024-06-30"},
+        {"industry": "Finance", "start": "2024-05-01"},
+        {"industry": "Finance", "product": "P3"},
+    ]
+    for filters in segments:
+        plan = sales_queries.query_plan(*sales_queries.segment_sql(**filters))
+        assert not any(line.startswith("SCAN") for line in plan), (filters, plan)
+        sales_plan = [line for line in plan if line.startswith("SEARCH s ")]
+        assert sales_plan and ("COVERING INDEX" in sales_plan[0] or "industry" in filters), (filters, plan)
+
+        amounts = np.array([amount for day, amount, product, region, salesperson, industry in rows
+                            if filters.get("start", day) <= day <= filters.get("end", day)
+                            and filters.get("product", product) == product
+                            and filters.get("region", region) == region
+                            and filters.get("salesperson", salesperson) == salesperson
+                            and filters.get("industry", industry) == industry])
+        stats = sales_queries.segment_stats(**filters)
+        assert stats.count == len(amounts)
+        assert np.isclose(stats.mean, amounts.mean()) and np.isclose(stats.std, amounts.std(ddof=1))
+
+    state = sql_agent({"product": "P1", "history_start": "2024-07-01"})
+    assert state["sql_segment"]["filters"] == {"start": "2024-07-01", "product": "P1"}
+    assert state["sql_segment"]["count"] == sales_queries.segment_stats(product="P1", start="2024-07-01").count
+    assert "sql_segment" not in sql_agent({})
+    # Async variant (aiosqlite, or worker threads without it) reads the same
+    async def async_reads():
+        try:
+            return (await asql_agent({"product": "P1", "history_start": "2024-07-01"}),
+                    await database.ascalar("SELECT COUNT(*) FROM sales"))
+        finally:
+            await database.aclose()
+
+    assert asyncio.run(async_reads()) == (state, database.scalar("SELECT COUNT(*) FROM sales"))
+
+
+def _daily_from_sql(snapshot, where="1"):
+    totals = dict(database.query(f"SELECT date, SUM(amount) FROM sales WHERE amount IS NOT NULL AND {where} "
+                                 f"GROUP BY date"))
+    return np.array([totals.get(str(day), 0.0) for day in snapshot.days])
+
+
+def test_snapshot_appends_incrementally_and_maps_series(temp_database, tmp_path):
+    path = os.path.join(tmp_path, "snapshot")
+    rows = [(f"2024-01-{i % 20 + 5:02d}", 100.0 + i, f"P{i % 2}", f"R{i % 3}", "Ann", None) for i in range(300)]
+    load_sales.load_records(rows)
+    assert sales_snapshot.refresh(path) == 300
+    first = sales_snapshot.open_snapshot(path)
+    assert (first.rows, str(first.first_day), len(first.days)) == (300, "2024-01-05", 20)
+    series = first.series(product="P1", region="R2")
+    assert isinstance(series.base, np.memmap) and np.shares_memory(series, first.daily)
+    assert np.allclose(series, _daily_from_sql(first, "product = 'P1' AND region = 'R2'"))
+
+    # Same segments, later days: added in place; new product and an earlier day: recomputed
+    load_sales.load_records([("2024-02-03", 50.0, "P0", "R1", "Ann", 1), ("2024-01-27", 20.0, None, None, None, 2)])
+    database.execute("INSERT INTO sales (date, amount) VALUES (NULL, 10)")
+    assert sales_snapshot.refresh(path) == 2
+    assert sales_snapshot.refresh(path) == 0
+    load_sales.load_records([("2024-01-01", 70.0, "P9", "R0", "Bob", None)])
+    assert sales_snapshot.refresh(path) == 1
+
+    snapshot = sales_snapshot.SalesSnapshot(path)
+    assert snapshot.rows == 303 and snapshot.last_id == database.scalar("SELECT MAX(id) FROM sales")
+    assert str(snapshot.days[0]) == "2024-01-01" and str(snapshot.days[-1]) == "2024-02-03"
+    assert np.allclose(snapshot.series(), _daily_from_sql(snapshot))
+    assert np.allclose(snapshot.series(product="P0"), _daily_from_sql(snapshot, "product = 'P0'"))
+    assert np.allclose(snapshot.series(salesperson="Bob"), _daily_from_sql(snapshot, "salesperson = 'Bob'"))
+    assert list(snapshot.column("customer_id")[-3:]) == [1, 2, -1]
+    # Readers of the previous snapshot keep their consistent view
+    assert first.rows == 300 and np.allclose(first.series(product="P1", region="R2"), series)
+
+
+def test_snapshot_skips_rows_with_unparseable_dates(temp_database, tmp_path):
+    path = os.path.join(tmp_path, "snapshot")
+    load_sales.load_records([("2024-01-05", 100.0, "P0", "R0", "Ann", None)])
+    # Written around load_sales, which would have rejected it
+    database.execute("INSERT INTO sales (date, amount) VALUES ('n/a', 5)")
+    assert sales_snapshot.refresh(path) == 1
+    load_sales.load_records([("2024-01-06", 40.0, "P0", "R0", "Ann", None)])
+    # The bad row is behind last_id, so later refreshes move on
+    assert sales_snapshot.refresh(path) == 1
+    snapshot = sales_snapshot.SalesSnapshot(path)
+    assert snapshot.rows == 2 and snapshot.last_id == database.scalar("SELECT MAX(id) FROM sales")
+    assert list(snapshot.series()) == [100.0, 40.0]
+
+
+if __name__ == "__main__":
+    import pytest
+
+    # Fixtures come from conftest.py, so run through pytest
+    if pytest.main(["-q", __file__]) == 0:
+        print("✅ Sales DB layer working")
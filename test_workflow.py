@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Workflow Test - fan-out / fan-in, path routing and async nodes of the LangGraph agent graph
+Learning log goes to a throwaway directory (conftest learning_log fixture)
+"""
+
+import asyncio
+import threading
+
+import database
+import agents.learning_agent as learning
+from agents.log_writer import get_writer
+import workflow
+
+
+def _meet(barrier, agent):
+    # Passes only if every node sharing the barrier runs at the same time
+    def run(state):
+        barrier.wait()
+        return agent(state)
+    return run
+
+
+async def _ainvoke(graph, state):
+    try:
+        return await graph.ainvoke(state)
+    finally:
+        await database.aclose()
+
+
+def test_independent_nodes_run_concurrently(learning_log):
+    first, second = threading.Barrier(2, timeout=10), threading.Barrier(3, timeout=10)
+    agents = dict(workflow.AGENTS)
+    for name in ("monitor", "sql"):
+        agents[name] = _meet(first, agents[name])
+    for name in ("rag", "forecast", "decision"):
+        agents[name] = _meet(second, agents[name])
+    graph = workflow.build_workflow(agents)
+
+    result = graph.invoke({"latest_sales": 250000, "product": "Laptop", "region": "North"})
+    assert set(result["timings"]) == set(workflow.AGENTS)
+    for key in ("anomaly", "z_score", "sql_avg_sales", "rag_insight", "forecast_sales",
+                "decision_code", "decision", "action"):
+        assert key in result
+    assert result["action"].startswith("[URGENT]") and result["anomaly"]
+    assert result["workflow_path"] == "full"
+    get_writer(learning_log).flush()
+    assert learning.learning_log_stats()["written"] == 1
+
+
+def test_steady_runs_skip_rag_unless_requested(learning_log, monkeypatch):
+    calls = []
+    agents = dict(workflow.AGENTS, rag=lambda state: calls.append(state) or state)
+    graph = workflow.build_workflow(agents)
+    before = workflow.route_stats()
+    steady = {"latest_sales": 100000, "baseline_mean": 100000, "baseline_std": 20000, "sql_avg_sales": 100000}
+    result = graph.invoke(dict(steady))
+    assert result["workflow_path"] == "fast" and not calls
+    assert "rag" not in result["timings"] and result["action"]
+
+    assert graph.invoke(dict(steady, workflow_path="full"))["workflow_path"] == "full" and len(calls) == 1
+    # Not flagged (threshold 3) but in the moderate band: full path
+    assert graph.invoke(dict(steady, latest_sales=135000, anomaly_threshold=3))["workflow_path"] == "full"
+    assert len(calls) == 2
+
+    monkeypatch.setattr(workflow, "ROUTING", "full")
+    assert graph.invoke(dict(steady))["workflow_path"] == "full" and len(calls) == 3
+
+    after = workflow.route_stats()
+    assert after["paths"]["fast"] - before["paths"]["fast"] == 1
+    assert after["paths"]["full"] - before["paths"]["full"] == 3
+    for reason in ("steady", "requested", "z_band", "policy"):
+        assert after["reasons"][reason] - before["reasons"].get(reason, 0) == 1
+    get_writer(learning_log).flush()
+    assert learning.learning_log_stats()["written"] == 4
+
+
+def test_async_workflow_matches_invoke_without_worker_threads(learning_log):
+    awaited, threads = [], set()
+
+    def on_loop(agent):
+        # Records the thread of every inline agent; must be the event loop's
+        def run(state):
+            threads.add(threading.get_ident())
+            return agent(state)
+        return run
+
+    def counted(name, aagent):
+        async def run(state):
+            awaited.append(name)
+            threads.add(threading.get_ident())
+            return await aagent(state)
+        return run
+
+    agents = dict(workflow.AGENTS)
+    for name in workflow.INLINE_AGENTS:
+        agents[name] = on_loop(agents[name])
+    async_agents = {name: counted(name, aagent) for name, aagent in workflow.ASYNC_AGENTS.items()}
+    graph = workflow.build_workflow(agents, asynchronous=True, async_agents=async_agents)
+    for state in ({"latest_sales": 250000, "product": "Laptop", "region": "North"},
+                  {"latest_sales": 100000, "baseline_mean": 100000, "baseline_std": 20000}):
+        expected = workflow.app_workflow.invoke(dict(state))
+        result = asyncio.run(_ainvoke(graph, dict(state)))
+        assert set(result) == set(expected)
+        assert {key: value for key, value in result.items() if key != "timings"} == \
+               {key: value for key, value in expected.items() if key != "timings"}
+    assert sorted(awaited) == ["monitor", "monitor", "rag", "sql", "sql"]
+    assert len(threads) == 1
+
+
+def test_nodes_return_only_what_they_set():
+    update = workflow.node("decision", workflow.AGENTS["decision"])(
+        {"latest_sales": 1000, "anomaly": False, "z_score": 0.1, "sql_avg_sales": 1000, "action": "keep"})
+    assert set(update) == {"decision_code", "decision", "timings"}
+    assert set(update["timings"]) == {"decision"}
+
+
+if __name__ == "__main__":
+    import pytest
+
+    # Fixtures come from conftest.py, so run through pytest
+    if pytest.main(["-q", __file__]) == 0:
+        print("✅ Workflow fan-out, routing and async nodes working")
@@ -1,17 +1,22 @@
 import os
+import time
+import asyncio
+import operator
+import threading
+from collections import Counter
 from dotenv import load_dotenv
-from typing import TypedDict
+from typing import Annotated, TypedDict
 # ========== LANGGRAPH ==========
 # LANGGRAPH: Framework for orchestrating multi-agent workflows
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 # ==============================
 
 # Load environment variables early
 load_dotenv()
 
-from agents.monitor_agent import monitor_agent
-from agents.sql_agent import sql_agent
-from agents.rag_agent import rag_agent
+from agents.monitor_agent import amonitor_agent, monitor_agent, z_score_band
+from agents.sql_agent import asql_agent, sql_agent
+from agents.rag_agent import arag_agent, rag_agent
 from agents.forecasting_agent import forecasting_agent
 from agents.decision_agent import decision_agent
 from agents.action_agent import action_agent
@@ -22,39 +27,203 @@ from agents.learning_agent import learning_agent
 # LANGGRAPH: TypedDict defines state schema shared between all agents
 class AgentState(TypedDict):
     latest_sales: float
+    product: str
+    region: str
+    salesperson: str
+    industry: str
+    history_start: str
+    history_end: str
+    anomaly_threshold: float
+    baseline_window: int
     anomaly: bool
     z_score: float
+    baseline_mean: float
+    baseline_std: float
+    baseline_segment: str
     sql_avg_sales: float
+    sql_std_sales: float
+    sql_sales_count: int
+    sql_segment: dict
     rag_insight: str
+    rag_query: str
+    rag_results: list
     forecast_sales: float
+    forecast_lower: float
+    forecast_upper: float
+    forecast_model: str
+    forecast_path: list
+    decision_code: int
     decision: str
     action: str
+    # "full" or "fast"; set by the caller to request a path, else by the monitor node
+    workflow_path: str
+    # Milliseconds per node; parallel nodes each add their own entry (dict merge)
+    timings: Annotated[dict, operator.or_]
 # ==============================
 
-workflow = StateGraph(AgentState)
+# "auto": full path for anomalies and non-normal z bands, fast path (no RAG)
+# otherwise; "full" / "fast" force one path for every run
+ROUTING = os.getenv("WORKFLOW_ROUTING", "auto")
+# Z-score bands that take the full path even when not flagged as anomaly
+FULL_PATH_BANDS = tuple(band.strip() for band in
+                        os.getenv("WORKFLOW_FULL_PATH_BANDS", "critical,significant,moderate").split(",") if band.strip())
+PATHS = ("full", "fast")
 
-# ========== LANGGRAPH ==========
-# LANGGRAPH: Add all 7 agent nodes to the graph
-workflow.add_node("monitor", monitor_agent)
-workflow.add_node("sql", sql_agent)
-workflow.add_node("rag", rag_agent)
-workflow.add_node("forecast", forecasting_agent)
-workflow.add_node("decision", decision_agent)
-workflow.add_node("action", action_agent)
-workflow.add_node("learning", learning_agent)
-
-# LANGGRAPH: Set starting node
-workflow.set_entry_point("monitor")
-
-# LANGGRAPH: Define sequential execution flow/edges between agents
-workflow.add_edge("monitor", "sql")
-workflow.add_edge("sql", "rag")
-workflow.add_edge("rag", "forecast")
-workflow.add_edge("forecast", "decision")
-workflow.add_edge("decision", "action")
-workflow.add_edge("action", "learning")
-workflow.add_edge("learning", END)
-
-# LANGGRAPH: Compile the workflow into executable form
-app_workflow = workflow.compile()
-# ==============================
\ No newline at end of file
+_route_lock = threading.Lock()
+_route_paths = Counter()
+_route_reasons = Counter()
+
+
+def choose_path(state):
+    """``(path, reason)`` of a run: the requested path, the forced policy, or the monitor output."""
+    requested = state.get("workflow_path")
+    if requested in PATHS:
+        return requested, "requested"
+    if ROUTING in PATHS:
+        return ROUTING, "policy"
+    if state.get("anomaly"):
+        return "full", "anomaly"
+    if z_score_band(state.get("z_score")) in FULL_PATH_BANDS:
+        return "full", "z_band"
+    return "fast", "steady"
+
+
+def route_agent(state):
+    """Router of the monitor node: records the path in the state and counts it for ``/metrics``."""
+    path, reason = choose_path(state)
+    with _route_lock:
+        _route_paths[path] += 1
+        _route_reasons[reason] += 1
+    state["workflow_path"] = path
+    return state
+
+
+def route_stats():
+    """Runs per path and per routing reason since start."""
+    with _route_lock:
+        return {"policy": ROUTING, "paths": {path: _route_paths[path] for path in PATHS},
+                "reasons": dict(_route_reasons)}
+
+
+AGENTS = {
+    "monitor": monitor_agent,
+    "sql": sql_agent,
+    "rag": rag_agent,
+    "forecast": forecasting_agent,
+    "decision": decision_agent,
+    "action": action_agent,
+    "learning": learning_agent,
+}
+
+# Coroutine variants used by async_workflow (async /run-workflow): database
+# reads and the query embedding are awaited instead of holding a thread
+ASYNC_AGENTS = {
+    "monitor": amonitor_agent,
+    "sql": asql_agent,
+    "rag": arag_agent,
+}
+# No I/O (the learning log is queued to its writer thread): run on the event
+# loop in async_workflow. Agents in neither table (forecast: model cache reads
+# and fits) run in the loop's default worker threads
+INLINE_AGENTS = ("decision", "action", "learning")
+
+# (sources, target): target runs once every source finished. monitor and
+# sql only read the input; forecast (heuristic fallback) and decision need
+# monitor and sql; action needs forecast and decision. rag (a branch of
+# monitor, see BRANCHES) runs alongside forecast and decision and is done
+# before learning starts (LangGraph finishes a step before the next)
+EDGES = (
+    ((START,), "monitor"),
+    ((START,), "sql"),
+    (("monitor", "sql"), "forecast"),
+    (("monitor", "sql"), "decision"),
+    (("forecast", "decision"), "action"),
+    (("rag",), END),
+    (("action",), "learning"),
+    (("learning",), END),
+)
+
+# source: (router, state key, {value: target}); the router runs inside the
+# source node after its agent and sets the key. The fast path skips rag
+# (embedding calls)
+BRANCHES = {
+    "monitor": (route_agent, "workflow_path", {"full": "rag", "fast": END}),
+}
+
+
+def _changes(name, router, state, updated, started):
+    if router is not None:
+        updated = router(updated)
+    changes = {key: value for key, value in updated.items()
+               if key != "timings" and (key not in state or state[key] != value)}
+    changes["timings"] = {name: round((time.perf_counter() - started) * 1000, 3)}
+    return changes
+
+
+def node(name, agent, router=None):
+    """Graph node running ``agent`` (then ``router``) on a copy of the state and returning only the keys set.
+
+    Nodes of one step run concurrently; returning the whole state would make
+    every branch write every key and LangGraph rejects concurrent writes to
+    the same plain key.
+    """
+    def run(state):
+        started = time.perf_counter()
+        return _changes(name, router, state, agent(dict(state)), started)
+    return run
+
+
+def anode(name, agent, router=None, aagent=None, inline=False):
+    """Coroutine version of ``node`` for ``async_workflow``.
+
+    Awaits ``aagent`` when given, calls ``agent`` directly when ``inline``,
+    and otherwise runs it in a worker thread.
+    """
+    async def run(state):
+        started = time.perf_counter()
+        if aagent is not None:
+            updated = await aagent(dict(state))
+        elif inline:
+            updated = agent(dict(state))
+        else:
+            updated = await asyncio.to_thread(agent, dict(state))
+        return _changes(name, router, state, updated, started)
+    return run
+
+
+def branch(key):
+    """Conditional-edge function returning the value of ``key``."""
+    def pick(state):
+        return state[key]
+    return pick
+
+
+def build_workflow(agents=AGENTS, edges=EDGES, branches=BRANCHES, asynchronous=False,
+                   async_agents=ASYNC_AGENTS, inline=INLINE_AGENTS):
+    """Compiled graph; ``asynchronous`` builds coroutine nodes, which only run under ``ainvoke``."""
+    workflow = StateGraph(AgentState)
+    # ========== LANGGRAPH ==========
+    # LANGGRAPH: Add all 7 agent nodes to the graph
+    for name, agent in agents.items():
+        router = branches[name][0] if name in branches else None
+        if asynchronous:
+            workflow.add_node(name, anode(name, agent, router, async_agents.get(name), name in inline))
+        else:
+            workflow.add_node(name, node(name, agent, router))
+
+    # LANGGRAPH: Fan out from START, fan in where a node needs several branches
+    for sources, target in edges:
+        workflow.add_edge(sources[0] if len(sources) == 1 else list(sources), target)
+
+    # LANGGRAPH: Conditional edges pick the next node from a state key
+    for source, (_, key, targets) in branches.items():
+        workflow.add_conditional_edges(source, branch(key), targets)
+
+    # LANGGRAPH: Compile the workflow into executable form
+    return workflow.compile()
+    # ==============================
+
+
+# invoke() (dashboard, batch monitor, CLI); /run-workflow awaits async_workflow
+app_workflow = build_workflow()
+async_workflow = build_workflow(asynchronous=True)